@@ -0,0 +1,27 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.4;
+
+/// @title Storage placeholder for ERC721EnumerableUpgradeable
+/// @author Andrei Toma
+/// @notice Keeps the storage slots used by ERC721EnumerableUpgradeable(OpenZeppelin 4.5) before V3,
+/// so that contracts which stopped inheriting it keep the same storage layout behind the proxy.
+/// @dev Must take the place of ERC721EnumerableUpgradeable in the inheritance list. The slots are
+/// no longer written: _allTokens.length stays at the amount of tokens minted before the upgrade
+/// and the per owner enumeration goes stale. Nothing has to be migrated for the upgrade, but
+/// downgrading to an implementation that inherits ERC721EnumerableUpgradeable again (MetarenasV2)
+/// is unsafe: it would read and update the stale slots and corrupt the enumeration.
+abstract contract ERC721EnumerableLegacyStorage {
+    // Mapping from owner to list of owned token IDs
+    mapping(address => mapping(uint256 => uint256)) private _ownedTokens;
+
+    // Mapping from token ID to index of the owner tokens list
+    mapping(uint256 => uint256) private _ownedTokensIndex;
+
+    // Array with all token ids, used for enumeration
+    uint256[] internal _allTokens;
+
+    // Mapping from token id to position in the allTokens array
+    mapping(uint256 => uint256) private _allTokensIndex;
+
+    uint256[46] private __gap;
+}
@@ -2,13 +2,16 @@
 pragma solidity ^0.8.4;
 
 import "@upopenzeppelin/contracts-upgradeable/contracts/token/ERC721/ERC721Upgradeable.sol";
-import "@upopenzeppelin/contracts-upgradeable/contracts/token/ERC721/extensions/ERC721EnumerableUpgradeable.sol";
 import "@upopenzeppelin/contracts-upgradeable/contracts/access/OwnableUpgradeable.sol";
 import "@upopenzeppelin/contracts-upgradeable/contracts/proxy/utils/Initializable.sol";
 import "@upopenzeppelin/contracts-upgradeable/contracts/security/ReentrancyGuardUpgradeable.sol";
+import "@upopenzeppelin/contracts-upgradeable/contracts/utils/math/SafeCastUpgradeable.sol";
+import "@upopenzeppelin/contracts-upgradeable/contracts/utils/cryptography/MerkleProofUpgradeable.sol";
+import "@upopenzeppelin/contracts-upgradeable/contracts/utils/cryptography/ECDSAUpgradeable.sol";
 import "@openzeppelin/contracts/token/ERC1155/IERC1155.sol";
 import "@openzeppelin/contracts/token/ERC20/IERC20.sol";
 import "../interfaces/IArenas.sol";
+import "./ERC721EnumerableLegacyStorage.sol";
 
 /// @title Metarena Upgradable Smart Contract with non-custodial staking.
 /// @author Andrei Toma
@@ -17,7 +20,7 @@ contract Metarenas is
     Initializable,
     ERC721Upgradeable,
     OwnableUpgradeable,
-    ERC721EnumerableUpgradeable,
+    ERC721EnumerableLegacyStorage,
     ReentrancyGuardUpgradeable
 {
     using StringsUpgradeable for uint256;
@@ -99,7 +102,67 @@ contract Metarenas is
     // Mapping of rewards per day to Arena Rarity
     mapping(uint256 => uint256) public rarityRewardsPerDay;
 
-    // Arena info
+    // Arena info, stored in this layout before V3
+    struct LegacyArena {
+        // Staked state
+        bool staked;
+        // Tier of the arena
+        uint256 tier;
+        // Level of the arena
+        uint256 level;
+        // Rarity of the Arena(0: Common, 1: Uncommon, 2: Rare, 3: Epic, 4: Legendary)
+        uint256 rarity;
+        // The time Arena was staked at
+        uint256 timeOfStake;
+        // Last time of update for this Arena
+        uint256 timeOfLastRewardUpdate;
+        // Calculated, but unclaimed rewards for the Arena
+        uint256 unclaimedRewardsArena;
+        uint256 unclaimedRewardsByte;
+    }
+
+    // Mapping of Arena Token ID to Arena info struct in the layout used before V3
+    mapping(uint256 => LegacyArena) private legacyArenas;
+
+    // Mapping of staked Token ID to its position in userArenasStaked, offset by one(0: not indexed)
+    mapping(uint256 => uint256) private stakedArenaIndex;
+
+    // Arena info packed into two storage slots
+    struct PackedArena {
+        // Staked state
+        bool staked;
+        // True once the Arena was written in this layout
+        bool migrated;
+        // Tier of the arena
+        uint8 tier;
+        // Rarity of the Arena(0: Common, 1: Uncommon, 2: Rare, 3: Epic, 4: Legendary)
+        uint8 rarity;
+        // Level of the arena
+        uint32 level;
+        // The time Arena was staked at
+        uint40 timeOfStake;
+        // Last time of update for this Arena
+        uint40 timeOfLastRewardUpdate;
+        // Calculated, but unclaimed rewards for the Arena
+        uint96 unclaimedRewardsArena;
+        uint96 unclaimedRewardsByte;
+        // Rewards index of the Arena's rarity and tier at the last update
+        uint128 rewardIndex;
+        // False if the Arena was last updated before the rewards index was added
+        bool rewardIndexed;
+        // True once the rarity was set by the Owner or proven against rarityMerkleRoot
+        bool raritySet;
+        // True once the Arena is counted in the rewards of its owner's wallet
+        bool walletIndexed;
+    }
+
+    // Mapping of Arena Token ID to packed Arena info struct
+    mapping(uint256 => PackedArena) private packedArenas;
+
+    // True once every Arena in the legacy layout was moved to packedArenas
+    bool public arenaStorageMigrated;
+
+    // Arena info, used as the in-memory working copy of the stored Arena
     struct Arena {
         // Staked state
         bool staked;
@@ -116,15 +179,145 @@ contract Metarenas is
         // Calculated, but unclaimed rewards for the Arena
         uint256 unclaimedRewardsArena;
         uint256 unclaimedRewardsByte;
+        // Rewards index of the Arena's rarity and tier at the last update
+        uint256 rewardIndex;
+        // False if the Arena was last updated before the rewards index was added
+        bool rewardIndexed;
+        // True once the rarity was set by the Owner or proven against rarityMerkleRoot
+        bool raritySet;
+    }
+
+    // Cumulative rewards of one rarity and tier combination
+    struct RewardIndex {
+        // Rewards accumulated by one staked Arena since the epoch, multiplied by 864000
+        uint256 index;
+        // Last time the index was checkpointed(0: never, the index grew at the current rate since the epoch)
+        uint256 lastUpdate;
+        // The rate the index grew at before its first checkpoint
+        uint256 originRate;
+    }
+
+    // Mapping of Arena rarity to Arena tier to rewards index
+    mapping(uint256 => mapping(uint256 => RewardIndex)) private rewardIndexes;
+
+    // Amount of tiers with a rewards multiplier, set through setTierMultiplier()
+    uint256 private rewardTiers;
+
+    // Merkle root of the rarities, leaves are keccak256(bytes.concat(keccak256(abi.encode(tokenId, rarity))))
+    bytes32 public rarityMerkleRoot;
+
+    // Amount of tokens minted since ERC721EnumerableUpgradeable was dropped
+    uint256 private mintedSinceLegacyEnumeration;
+
+    // Unclaimed rewards of the Arenas owned by a wallet, summed
+    struct WalletRewards {
+        uint128 unclaimedRewardsArena;
+        uint128 unclaimedRewardsByte;
+    }
+
+    // Mapping of wallet to the unclaimed rewards of its Arenas
+    mapping(address => WalletRewards) private walletUnclaimedRewards;
+
+    // Staked Arenas of a wallet in one rarity and tier combination
+    struct WalletStake {
+        // Amount of staked Arenas
+        uint64 staked;
+        // Sum of the rewards indexes of the Arenas at their last update, each divided by 864000
+        uint192 rewardIndexes;
+    }
+
+    // Mapping of wallet to Arena rarity to Arena tier to staked Arenas
+    mapping(address => mapping(uint256 => mapping(uint256 => WalletStake)))
+        private walletStakes;
+
+    // Level boosts signed off-chain by the Level Booster, redeemable once by anyone
+    struct LevelVoucher {
+        uint256[] arenaTokenIds;
+        uint256[] levels;
+        // Unique per voucher, marks the voucher redeemed in levelVoucherNonces
+        uint256 nonce;
+        // Last timestamp the voucher can be redeemed at
+        uint256 deadline;
     }
 
-    // Mapping of Arena Token ID to Arena info struct
-    mapping(uint256 => Arena) public arenas;
+    // Bitmap of redeemed voucher nonces, 256 nonces per word
+    mapping(uint256 => uint256) private levelVoucherNonces;
+
+    // Unclaimed rewards of every Arena counted in the wallet rewards, summed
+    WalletRewards private totalUnclaimedRewards;
+
+    // Mapping of Arena rarity to Arena tier to the staked Arenas of every wallet
+    mapping(uint256 => mapping(uint256 => WalletStake)) private totalStakes;
+
+    // Amount of staked Arenas counted in totalStakes, of any tier
+    uint256 private stakedArenaCount;
+
+    // EIP-712 type hashes, the domain separator is computed on the fly so the proxy keeps no extra storage
+    bytes32 private constant EIP712_DOMAIN_TYPEHASH =
+        keccak256(
+            "EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)"
+        );
+    bytes32 private constant LEVEL_VOUCHER_TYPEHASH =
+        keccak256(
+            "LevelVoucher(uint256[] arenaTokenIds,uint256[] levels,uint256 nonce,uint256 deadline)"
+        );
+
+    event Staked(address indexed _user, uint256 indexed _arenaId);
+    event Unstaked(
+        address indexed _user,
+        uint256 indexed _arenaId,
+        uint256 _level
+    );
+    event RewardsClaimed(
+        address indexed _user,
+        uint256 indexed _arenaId,
+        uint256 _arenaRewards,
+        uint256 _byteRewards
+    );
+    event LevelIncreased(uint256 indexed _arenaId, uint256 _levelsIncreased);
+    event LevelVoucherRedeemed(uint256 indexed _nonce);
+    event TierUpgraded(uint256 indexed _tier, uint256 indexed _arenaId);
+    event RaritySet(uint256 indexed _arenaId, uint256 _rarity);
+    event RarityRewardsUpdated(uint256 indexed _rarity, uint256 _rewards);
+    event TierMultiplierUpdated(uint256 indexed _tier, uint256 _multiplier);
+    event ByteEnabledUpdated(bool _enabled);
 
     constructor() initializer {}
 
     /// @notice function used in the OpenZeppelin Upgradable Contracts to initialize values in Transparent Proxy Contract
     function initialize() public initializer {
+        __Metarenas_init();
+    }
+
+    /// @notice initializes a fresh deployment and configures it in the same transaction as the proxy deployment
+    /// @param _oldArenas the address for the old Arenas Contract
+    /// @param _passes the address for the Metapasses Contract
+    /// @param _arenaToken the address for the $ARENA Token Contract
+    /// @param _admin the address of the Admin, address(0) for none
+    /// @param _startTokenId the token ID of the first rarity
+    /// @param _rarities one byte per token ID, starting at _startTokenId, same as setRarityPacked()
+    /// @dev a fresh deployment has no Arenas in the layout used before V3, so the storage migration is completed
+    function initializeWithConfig(
+        IArenas _oldArenas,
+        IERC1155 _passes,
+        IERC20 _arenaToken,
+        address _admin,
+        uint256 _startTokenId,
+        bytes calldata _rarities
+    ) external initializer {
+        __Metarenas_init();
+        oldArenas = _oldArenas;
+        passes = _passes;
+        arenaToken = _arenaToken;
+        admin = _admin;
+        arenaStorageMigrated = true;
+        for (uint256 i; i < _rarities.length; ++i) {
+            _setArenaRarity(_startTokenId + i, uint8(_rarities[i]));
+        }
+    }
+
+    /// @notice sets the initial values shared by initialize() and initializeWithConfig()
+    function __Metarenas_init() internal onlyInitializing {
         __ERC721_init("Metarenas", "ARENA");
         __Ownable_init();
         __ReentrancyGuard_init();
@@ -183,10 +376,37 @@ contract Metarenas is
     /// @param _tokenId the token ID for the arena to be burned from the old Arena Contract
     /// @dev approve() function should be already called with the address of this Contract and the same token ID
     function migrateArena(uint256 _tokenId) external {
+        require(
+            oldArenas.ownerOf(_tokenId) == msg.sender,
+            "You don't own this arena!"
+        );
         oldArenas.burn(_tokenId);
         _safeMint(msg.sender, _tokenId + 1);
     }
 
+    /// @notice function for migrating multiple Arena NFTs from the old collection in one transaction
+    /// @param _tokenIds the token IDs for the arenas to be burned from the old Arena Contract
+    /// @dev setApprovalForAll() function should be already called with the address of this Contract
+    function migrateArenas(uint256[] calldata _tokenIds) external {
+        require(_tokenIds.length > 0, "No arenas to migrate");
+        for (uint256 i; i < _tokenIds.length; ++i) {
+            require(
+                oldArenas.ownerOf(_tokenIds[i]) == msg.sender,
+                "You don't own this arena!"
+            );
+            oldArenas.burn(_tokenIds[i]);
+            _mint(msg.sender, _tokenIds[i] + 1);
+        }
+        if (AddressUpgradeable.isContract(msg.sender)) {
+            for (uint256 i; i < _tokenIds.length; ++i) {
+                require(
+                    _checkOnERC721ReceivedMint(msg.sender, _tokenIds[i] + 1),
+                    "ERC721: transfer to non ERC721Receiver implementer"
+                );
+            }
+        }
+    }
+
     /// @notice mint function with 3 stages with access and prices based on Metapasses ownership
     /// @param _amount the amount of Metarenas to mint
     /// @dev need to approve ARENA token transfer before calling this function
@@ -238,72 +458,109 @@ contract Metarenas is
     /// @notice function called to stake Metarenas
     /// @param _arenaTokenId the token Id of the Metarena to be staked
     function stakeArena(uint256 _arenaTokenId) external nonReentrant {
+        _stakeArena(_arenaTokenId);
+    }
+
+    /// @notice function called to stake multiple Metarenas in one transaction
+    /// @param _arenaTokenIds the token Ids of the Metarenas to be staked
+    function stakeArenas(uint256[] calldata _arenaTokenIds)
+        external
+        nonReentrant
+    {
+        for (uint256 i; i < _arenaTokenIds.length; ++i) {
+            _stakeArena(_arenaTokenIds[i]);
+        }
+    }
+
+    /// @notice function called to stake a Metarena, setting its rarity from a proof first
+    /// @param _arenaTokenId the token Id of the Metarena to be staked
+    /// @param _rarity the rarity of the Metarena
+    /// @param _merkleProof the proof of the rarity against rarityMerkleRoot
+    /// @dev the proof is ignored if the rarity is already set
+    function stakeArenaWithProof(
+        uint256 _arenaTokenId,
+        uint256 _rarity,
+        bytes32[] calldata _merkleProof
+    ) external nonReentrant {
+        _proveRarity(_arenaTokenId, _rarity, _merkleProof);
+        _stakeArena(_arenaTokenId);
+    }
+
+    /// @notice function called to stake multiple Metarenas in one transaction, setting their rarities from proofs first
+    /// @param _arenaTokenIds the token Ids of the Metarenas to be staked
+    /// @param _rarities the rarities of the Metarenas
+    /// @param _merkleProofs the proofs of the rarities against rarityMerkleRoot
+    function stakeArenasWithProofs(
+        uint256[] calldata _arenaTokenIds,
+        uint256[] calldata _rarities,
+        bytes32[][] calldata _merkleProofs
+    ) external nonReentrant {
         require(
-            msg.sender == ownerOf(_arenaTokenId),
-            "Can't stake a arena you don't own!"
+            _arenaTokenIds.length == _rarities.length &&
+                _arenaTokenIds.length == _merkleProofs.length
         );
-        Arena memory _arena = arenas[_arenaTokenId];
-        require(!_arena.staked, "Arena already staked!");
-        _arena.timeOfStake = block.timestamp;
-        _arena.staked = true;
-        _arena.timeOfLastRewardUpdate = block.timestamp;
-        arenas[_arenaTokenId] = _arena;
-        userArenasStaked[msg.sender].push(_arenaTokenId);
+        for (uint256 i; i < _arenaTokenIds.length; ++i) {
+            _proveRarity(_arenaTokenIds[i], _rarities[i], _merkleProofs[i]);
+            _stakeArena(_arenaTokenIds[i]);
+        }
     }
 
     /// @notice function called to unstake Metarenas
     /// @param _arenaTokenId the token Id of the Metarena to be unstaked
     function unstakeArena(uint256 _arenaTokenId) external nonReentrant {
-        require(
-            msg.sender == ownerOf(_arenaTokenId),
-            "You are not the owner of this Arena!"
-        );
-        Arena memory _arena = arenas[_arenaTokenId];
-        require(_arena.staked, "Arena is not staked!");
-        uint256 arenaRewards = calculateRewardsArena(_arenaTokenId);
-        _arena.unclaimedRewardsArena += arenaRewards;
-        uint256 byteRewards = calculateRewardsByte(_arenaTokenId);
-        _arena.unclaimedRewardsByte += byteRewards;
-        _arena.staked = false;
-        _arena.level = calculateArenaLevel(_arenaTokenId);
-        _arena.timeOfStake = 0;
-        _arena.timeOfLastRewardUpdate = block.timestamp;
-        arenas[_arenaTokenId] = _arena;
-        uint256[] memory _userArenasStaked = userArenasStaked[msg.sender];
-        for (uint256 i; i < _userArenasStaked.length; ++i) {
-            if (_userArenasStaked[i] == _arenaTokenId) {
-                _userArenasStaked[i] = _userArenasStaked[
-                    _userArenasStaked.length - 1
-                ];
-            }
+        _unstakeArena(_arenaTokenId);
+    }
+
+    /// @notice function called to unstake multiple Metarenas in one transaction
+    /// @param _arenaTokenIds the token Ids of the Metarenas to be unstaked
+    function unstakeArenas(uint256[] calldata _arenaTokenIds)
+        external
+        nonReentrant
+    {
+        for (uint256 i; i < _arenaTokenIds.length; ++i) {
+            _unstakeArena(_arenaTokenIds[i]);
         }
-        userArenasStaked[msg.sender] = _userArenasStaked;
-        userArenasStaked[msg.sender].pop();
     }
 
     /// @notice function used to claim the rewards accumulated for a Metarena
     /// @param _arenaTokenId the token ID of the Metarena selected to claim rewards from
     /// @dev Only sends $ARENA rewards if $BYTE is not enabled
     function claimRewards(uint256 _arenaTokenId) external nonReentrant {
-        require(
-            msg.sender == ownerOf(_arenaTokenId),
-            "You don't own this arena!"
+        (uint256 arenaRewards, uint256 byteRewards) = _claimRewards(
+            _arenaTokenId
         );
-        uint256 arenaRewards = calculateRewardsArena(_arenaTokenId) +
-            arenas[_arenaTokenId].unclaimedRewardsArena;
         require(arenaRewards > 0, "You have no rewards to claim");
         if (byteEndabled) {
-            uint256 byteRewards = calculateRewardsByte(_arenaTokenId) +
-                arenas[_arenaTokenId].unclaimedRewardsByte;
             require(byteRewards > 0, "You have no rewards to claim");
-            arenas[_arenaTokenId].unclaimedRewardsByte = 0;
             byteToken.transfer(msg.sender, byteRewards);
         }
-        arenas[_arenaTokenId].timeOfLastRewardUpdate = block.timestamp;
-        arenas[_arenaTokenId].unclaimedRewardsArena = 0;
         arenaToken.transfer(msg.sender, arenaRewards);
     }
 
+    /// @notice function used to claim the rewards accumulated for multiple Metarenas with one transfer per token
+    /// @param _arenaTokenIds the token IDs of the Metarenas selected to claim rewards from
+    /// @dev Only sends $ARENA rewards if $BYTE is not enabled
+    function claimAllRewards(uint256[] calldata _arenaTokenIds)
+        external
+        nonReentrant
+    {
+        uint256 _totalRewardsArena;
+        uint256 _totalRewardsByte;
+        for (uint256 i; i < _arenaTokenIds.length; ++i) {
+            (uint256 arenaRewards, uint256 byteRewards) = _claimRewards(
+                _arenaTokenIds[i]
+            );
+            _totalRewardsArena += arenaRewards;
+            _totalRewardsByte += byteRewards;
+        }
+        require(_totalRewardsArena > 0, "You have no rewards to claim");
+        if (byteEndabled) {
+            require(_totalRewardsByte > 0, "You have no rewards to claim");
+            byteToken.transfer(msg.sender, _totalRewardsByte);
+        }
+        arenaToken.transfer(msg.sender, _totalRewardsArena);
+    }
+
     /// @notice function called by the Level Booster address to increase the level of an Metarena
     /// @param _arenaTokenId the token ID of the Metarena to be boosted
     /// @param _levelsToIncrease the amount of levels to add to the Metarena
@@ -314,39 +571,100 @@ contract Metarenas is
             msg.sender == levelBooster,
             "You are not authorised to call this function!"
         );
-        arenas[_arenaTokenId].level += _levelsToIncrease;
+        _increaseLevel(_arenaTokenId, _levelsToIncrease);
     }
 
-    /// @notice upgrades the tier of the Metarena when user has required levels
-    /// @param _arenaTokenId the token ID of the Metarena to be upgraded
-    function upgradeArenaTier(uint256 _arenaTokenId) external nonReentrant {
+    /// @notice function called by the Level Booster address to increase the levels of multiple Metarenas in one transaction
+    /// @param _arenaTokenIds the token IDs of the Metarenas to be boosted
+    /// @param _levelsToIncrease the amount of levels to add to each Metarena
+    function increaseLevels(
+        uint256[] calldata _arenaTokenIds,
+        uint256[] calldata _levelsToIncrease
+    ) external {
         require(
-            ownerOf(_arenaTokenId) == msg.sender,
-            "Can't upgrade tier for tokens you don't own!"
+            msg.sender == levelBooster,
+            "You are not authorised to call this function!"
         );
-        Arena memory _arena = arenas[_arenaTokenId];
-        uint256 _level = calculateArenaLevel(_arenaTokenId);
+        require(_arenaTokenIds.length == _levelsToIncrease.length);
+        for (uint256 i; i < _arenaTokenIds.length; ++i) {
+            _increaseLevel(_arenaTokenIds[i], _levelsToIncrease[i]);
+        }
+    }
+
+    /// @notice applies the level boosts of a voucher signed by the Level Booster
+    /// @param _voucher the level boosts, nonce and deadline
+    /// @param _signature the Level Booster's EIP-712 signature of the voucher
+    function redeemLevelVoucher(
+        LevelVoucher calldata _voucher,
+        bytes calldata _signature
+    ) external {
         require(
-            _level >= levelsToUpgrade[_arena.tier],
-            "Not high enough level to upgrade"
-        );
-        arenaToken.transferFrom(
-            msg.sender,
-            address(this),
-            arenaPriceForUpgrade * _arena.tier
+            _redeemLevelVoucher(_voucher, _signature),
+            "Voucher already redeemed"
         );
-        _arena.unclaimedRewardsArena += calculateRewardsArena(_arenaTokenId);
-        if (byteEndabled) {
-            byteToken.transferFrom(
-                msg.sender,
-                address(this),
-                bytePriceForUpgrade * _arena.tier
-            );
-            _arena.unclaimedRewardsByte += calculateRewardsByte(_arenaTokenId);
+    }
+
+    /// @notice function called to stake multiple Metarenas, redeeming a level voucher first
+    /// @param _arenaTokenIds the token Ids of the Metarenas to be staked
+    /// @param _voucher the level boosts, nonce and deadline
+    /// @param _signature the Level Booster's EIP-712 signature of the voucher
+    /// @dev the voucher is ignored if it was already redeemed
+    function stakeArenasWithVoucher(
+        uint256[] calldata _arenaTokenIds,
+        LevelVoucher calldata _voucher,
+        bytes calldata _signature
+    ) external nonReentrant {
+        _redeemLevelVoucher(_voucher, _signature);
+        for (uint256 i; i < _arenaTokenIds.length; ++i) {
+            _stakeArena(_arenaTokenIds[i]);
         }
-        _arena.timeOfLastRewardUpdate = block.timestamp;
-        _arena.tier += 1;
-        arenas[_arenaTokenId] = _arena;
+    }
+
+    /// @notice upgrades the tier of the Metarena when user has required levels
+    /// @param _arenaTokenId the token ID of the Metarena to be upgraded
+    function upgradeArenaTier(uint256 _arenaTokenId) external nonReentrant {
+        _upgradeArenaTier(_arenaTokenId);
+    }
+
+    /// @notice upgrades the tier of the Metarena, setting its rarity from a proof first
+    /// @param _arenaTokenId the token ID of the Metarena to be upgraded
+    /// @param _rarity the rarity of the Metarena
+    /// @param _merkleProof the proof of the rarity against rarityMerkleRoot
+    /// @dev the proof is ignored if the rarity is already set
+    function upgradeArenaTierWithProof(
+        uint256 _arenaTokenId,
+        uint256 _rarity,
+        bytes32[] calldata _merkleProof
+    ) external nonReentrant {
+        _proveRarity(_arenaTokenId, _rarity, _merkleProof);
+        _upgradeArenaTier(_arenaTokenId);
+    }
+
+    /// @notice upgrades the tier of the Metarena, redeeming a level voucher first
+    /// @param _arenaTokenId the token ID of the Metarena to be upgraded
+    /// @param _voucher the level boosts, nonce and deadline
+    /// @param _signature the Level Booster's EIP-712 signature of the voucher
+    /// @dev the voucher is ignored if it was already redeemed
+    function upgradeArenaTierWithVoucher(
+        uint256 _arenaTokenId,
+        LevelVoucher calldata _voucher,
+        bytes calldata _signature
+    ) external nonReentrant {
+        _redeemLevelVoucher(_voucher, _signature);
+        _upgradeArenaTier(_arenaTokenId);
+    }
+
+    /// @notice sets the rarity of a Metarena from a proof against rarityMerkleRoot
+    /// @param _arenaTokenId the token ID of the Metarena
+    /// @param _rarity the rarity of the Metarena
+    /// @param _merkleProof the proof of the rarity
+    /// @dev can be called by anyone, the proof is ignored if the rarity is already set
+    function proveRarity(
+        uint256 _arenaTokenId,
+        uint256 _rarity,
+        bytes32[] calldata _merkleProof
+    ) external {
+        _proveRarity(_arenaTokenId, _rarity, _merkleProof);
     }
 
     /// @notice sets the addresses of the other Contracts in the ecosystem
@@ -379,6 +697,7 @@ contract Metarenas is
     /// @param _bool the state of $BYTE usability
     function setByteEnabled(bool _bool) external onlyOwnerOrAdmin {
         byteEndabled = _bool;
+        emit ByteEnabledUpdated(_bool);
     }
 
     /// @notice sets the prices for Tier upgrade
@@ -466,8 +785,80 @@ contract Metarenas is
     {
         require(_tokenIds.length == _rarity.length);
         for (uint256 i; i < _tokenIds.length; ++i) {
-            require(_rarity[i] < 5);
-            arenas[_tokenIds[i]].rarity = _rarity[i];
+            _setArenaRarity(_tokenIds[i], _rarity[i]);
+        }
+    }
+
+    /// @notice add onchain metadata for Arena Rarity for consecutive token IDs
+    /// @param _startTokenId the token ID of the first rarity
+    /// @param _rarities one byte per token ID, starting at _startTokenId(0: Common, 1: Uncommon, 2: Rare, 3: Epic, 4: Legendary)
+    /// @dev costs one byte of calldata per token instead of two 32 bytes words with setRarity()
+    function setRarityPacked(uint256 _startTokenId, bytes calldata _rarities)
+        external
+        onlyOwnerOrAdmin
+    {
+        for (uint256 i; i < _rarities.length; ++i) {
+            _setArenaRarity(_startTokenId + i, uint8(_rarities[i]));
+        }
+    }
+
+    /// @notice set the Merkle root of the Arena rarities, used instead of writing them with setRarity()
+    /// @param _rarityMerkleRoot the root of a tree with keccak256(bytes.concat(keccak256(abi.encode(tokenId, rarity)))) leaves
+    /// @dev rarities already set by the Owner or proven before are not changed by later proofs
+    function setRarityMerkleRoot(bytes32 _rarityMerkleRoot)
+        external
+        onlyOwnerOrAdmin
+    {
+        rarityMerkleRoot = _rarityMerkleRoot;
+    }
+
+    /// @notice moves Arenas from the layout used before V3 to the packed layout
+    /// @param _arenaTokenIds the token IDs to migrate
+    /// @dev Arenas that are not migrated are read from the old layout until completeArenaStorageMigration() is called
+    function migrateArenaStorage(uint256[] calldata _arenaTokenIds)
+        external
+        onlyOwnerOrAdmin
+    {
+        require(!arenaStorageMigrated, "Arena storage already migrated");
+        for (uint256 i; i < _arenaTokenIds.length; ++i) {
+            if (!packedArenas[_arenaTokenIds[i]].migrated) {
+                _setArena(_arenaTokenIds[i], _arenaOf(_arenaTokenIds[i]));
+            }
+        }
+    }
+
+    /// @notice stops reading Arenas from the layout used before V3
+    /// @dev call after every Arena with data in the old layout was migrated, or right after a fresh deployment
+    function completeArenaStorageMigration() external onlyOwnerOrAdmin {
+        arenaStorageMigrated = true;
+    }
+
+    /// @notice indexes the staked Arenas of wallets that staked before the position index was added
+    /// @param _users the wallets to index
+    /// @dev unindexed Arenas still unstake correctly, but pay for a linear search
+    function indexStakedArenas(address[] calldata _users)
+        external
+        onlyOwnerOrAdmin
+    {
+        for (uint256 i; i < _users.length; ++i) {
+            uint256[] storage _userArenasStaked = userArenasStaked[_users[i]];
+            for (uint256 j; j < _userArenasStaked.length; ++j) {
+                stakedArenaIndex[_userArenasStaked[j]] = j + 1;
+            }
+        }
+    }
+
+    /// @notice counts Arenas last updated before wallet rewards were added in the rewards of their owners and in the totals
+    /// @param _arenaTokenIds the token IDs to index
+    /// @dev walletRewards() and the total views leave out the Arenas that are not indexed, every Arena is indexed on its next update
+    function indexWalletRewards(uint256[] calldata _arenaTokenIds)
+        external
+        onlyOwnerOrAdmin
+    {
+        for (uint256 i; i < _arenaTokenIds.length; ++i) {
+            if (!packedArenas[_arenaTokenIds[i]].walletIndexed) {
+                _setArena(_arenaTokenIds[i], _arenaOf(_arenaTokenIds[i]));
+            }
         }
     }
 
@@ -478,7 +869,12 @@ contract Metarenas is
         external
         onlyOwnerOrAdmin
     {
+        uint256 _rewardTiers = rewardTiers > 4 ? rewardTiers : 4;
+        for (uint256 _tier; _tier < _rewardTiers; ++_tier) {
+            _checkpointRewardIndex(_rarity, _tier);
+        }
         rarityRewardsPerDay[_rarity] = _rewards;
+        emit RarityRewardsUpdated(_rarity, _rewards);
     }
 
     /// @notice set the rewards multiplier for Arena tier
@@ -489,7 +885,37 @@ contract Metarenas is
         external
         onlyOwnerOrAdmin
     {
+        for (uint256 _rarity; _rarity < 5; ++_rarity) {
+            _checkpointRewardIndex(_rarity, _tier);
+        }
         tierRewardsMultiplier[_tier] = _multiplier;
+        if (_tier >= rewardTiers) {
+            rewardTiers = _tier + 1;
+        }
+        emit TierMultiplierUpdated(_tier, _multiplier);
+    }
+
+    /// @notice returns the rewards index of a rarity and tier combination
+    /// @param _rarity the Arena rarity
+    /// @param _tier the Arena tier
+    /// @return index_ the current index, multiplied by 864000
+    /// @return lastUpdate_ the last time the index was checkpointed
+    /// @return originRate_ the rate the index grew at before its first checkpoint
+    function rewardIndex(uint256 _rarity, uint256 _tier)
+        external
+        view
+        returns (
+            uint256 index_,
+            uint256 lastUpdate_,
+            uint256 originRate_
+        )
+    {
+        RewardIndex storage _index = rewardIndexes[_rarity][_tier];
+        return (
+            _currentRewardIndex(_rarity, _tier),
+            _index.lastUpdate,
+            _index.originRate
+        );
     }
 
     /// @notice withdraw function for owner
@@ -526,19 +952,120 @@ contract Metarenas is
         view
         returns (uint256, uint256)
     {
-        uint256 _rewardsArena = arenas[_arenaTokenId].unclaimedRewardsArena +
-            calculateRewardsArena(_arenaTokenId);
+        Arena memory _arena = _arenaOf(_arenaTokenId);
+        uint256 _rewards = _pendingRewards(_arena);
+        uint256 _rewardsArena = _arena.unclaimedRewardsArena + _rewards;
         uint256 _rewardsByte;
         if (byteEndabled) {
-            _rewardsByte =
-                arenas[_arenaTokenId].unclaimedRewardsByte +
-                calculateRewardsByte(_arenaTokenId);
+            _rewardsByte = _arena.unclaimedRewardsByte + _rewards;
         } else {
             _rewardsByte = 0;
         }
         return (_rewardsArena, _rewardsByte);
     }
 
+    /// @notice returns rewards available to claim for all the Metarenas of a wallet, same as the sum of availableRewards()
+    /// @param _wallet the address to query for
+    /// @dev reads one slot per rarity and tier combination, however many Metarenas the wallet owns
+    function walletRewards(address _wallet)
+        external
+        view
+        returns (uint256, uint256)
+    {
+        return
+            _rewardSums(
+                walletUnclaimedRewards[_wallet],
+                walletStakes[_wallet]
+            );
+    }
+
+    /// @notice returns the amount of staked Metarenas of a rarity and tier combination
+    /// @param _rarity the Arena rarity
+    /// @param _tier the Arena tier
+    function stakedArenas(uint256 _rarity, uint256 _tier)
+        external
+        view
+        returns (uint256)
+    {
+        return totalStakes[_rarity][_tier].staked;
+    }
+
+    /// @notice returns the amount of staked Metarenas
+    function totalStakedArenas() external view returns (uint256) {
+        return stakedArenaCount;
+    }
+
+    /// @notice returns the rewards emitted per second to all the staked Metarenas, in $ARENA and in $BYTE if enabled
+    /// @dev rounded down, solvencyRunway() uses the exact rate
+    function emissionRate() external view returns (uint256) {
+        return _emissionRate() / 864000;
+    }
+
+    /// @notice returns the rewards available to claim for all the Metarenas, same as the sum of availableRewards()
+    function outstandingRewards() public view returns (uint256, uint256) {
+        return _rewardSums(totalUnclaimedRewards, totalStakes);
+    }
+
+    /// @notice returns the seconds of emissions the balance of the Contract covers after the outstanding rewards
+    /// @dev 0 if the balance doesn't cover the outstanding rewards, type(uint256).max if nothing is emitted.
+    /// $BYTE is only checked when enabled
+    function solvencyRunway() external view returns (uint256) {
+        (uint256 _owedArena, uint256 _owedByte) = outstandingRewards();
+        uint256 _balanceArena = arenaToken.balanceOf(address(this));
+        if (_balanceArena <= _owedArena) {
+            return 0;
+        }
+        uint256 _balance = _balanceArena - _owedArena;
+        if (byteEndabled) {
+            uint256 _balanceByte = byteToken.balanceOf(address(this));
+            if (_balanceByte <= _owedByte) {
+                return 0;
+            }
+            if (_balanceByte - _owedByte < _balance) {
+                _balance = _balanceByte - _owedByte;
+            }
+        }
+        uint256 _rate = _emissionRate();
+        if (_rate == 0) {
+            return type(uint256).max;
+        }
+        return (_balance * 864000) / _rate;
+    }
+
+    /// @notice returns true if the level voucher with this nonce was redeemed
+    /// @param _nonce the voucher nonce
+    function levelVoucherRedeemed(uint256 _nonce) external view returns (bool) {
+        return levelVoucherNonces[_nonce >> 8] & (1 << (_nonce & 255)) != 0;
+    }
+
+    /// @notice returns the EIP-712 digest the Level Booster signs for a voucher
+    /// @param _voucher the level boosts, nonce and deadline
+    function levelVoucherDigest(LevelVoucher calldata _voucher)
+        public
+        view
+        returns (bytes32)
+    {
+        bytes32 _domainSeparator = keccak256(
+            abi.encode(
+                EIP712_DOMAIN_TYPEHASH,
+                keccak256("Metarenas"),
+                keccak256("1"),
+                block.chainid,
+                address(this)
+            )
+        );
+        bytes32 _structHash = keccak256(
+            abi.encode(
+                LEVEL_VOUCHER_TYPEHASH,
+                keccak256(abi.encodePacked(_voucher.arenaTokenIds)),
+                keccak256(abi.encodePacked(_voucher.levels)),
+                _voucher.nonce,
+                _voucher.deadline
+            )
+        );
+        return ECDSAUpgradeable.toTypedDataHash(_domainSeparator, _structHash);
+    }
+
     /// @notice returns arena detalis for Metarena
     /// @param _arenaTokenId the token ID to query for
     function arenaDetails(uint256 _arenaTokenId)
@@ -553,19 +1080,59 @@ contract Metarenas is
             uint256 timeOfStake_
         )
     {
-        bool _canUpgrade = arenas[_arenaTokenId].level >=
-            levelsToUpgrade[arenas[_arenaTokenId].tier];
-        uint256 _arenaLevel = calculateArenaLevel(_arenaTokenId);
+        Arena memory _arena = _arenaOf(_arenaTokenId);
+        bool _canUpgrade = _arena.level >= levelsToUpgrade[_arena.tier];
         return (
-            arenas[_arenaTokenId].tier,
-            _arenaLevel,
-            arenas[_arenaTokenId].rarity,
-            arenas[_arenaTokenId].staked,
+            _arena.tier,
+            _arenaLevel(_arena),
+            _arena.rarity,
+            _arena.staked,
             _canUpgrade,
-            arenas[_arenaTokenId].timeOfStake
+            _arena.timeOfStake
         );
     }
 
+    /// @notice returns the stored Arena info for a Metarena
+    /// @param _arenaTokenId the token ID to query for
+    /// @dev same values as the public getter of the mapping used before V3
+    function arenas(uint256 _arenaTokenId)
+        external
+        view
+        returns (
+            bool staked,
+            uint256 tier,
+            uint256 level,
+            uint256 rarity,
+            uint256 timeOfStake,
+            uint256 timeOfLastRewardUpdate,
+            uint256 unclaimedRewardsArena,
+            uint256 unclaimedRewardsByte
+        )
+    {
+        Arena memory _arena = _arenaOf(_arenaTokenId);
+        return (
+            _arena.staked,
+            _arena.tier,
+            _arena.level,
+            _arena.rarity,
+            _arena.timeOfStake,
+            _arena.timeOfLastRewardUpdate,
+            _arena.unclaimedRewardsArena,
+            _arena.unclaimedRewardsByte
+        );
+    }
+
+    /// @notice returns every field of the Arena info for a Metarena, including its rewards checkpoint
+    /// @param _arenaTokenId the token ID to query for
+    /// @dev the inputs of arenaDetails() and availableRewards() besides the rewards index and block.timestamp
+    function arenaInfo(uint256 _arenaTokenId)
+        external
+        view
+        returns (Arena memory arena_)
+    {
+        return _arenaOf(_arenaTokenId);
+    }
+
     /// @notice returns the Token Id for Tokens owned by the specified address
     /// @param _owner the address to query for
     function tokensOfOwner(address _owner)
@@ -575,12 +1142,30 @@ contract Metarenas is
     {
         uint256 ownerTokenCount = balanceOf(_owner);
         uint256[] memory ownedTokenIds = new uint256[](ownerTokenCount);
-        for (uint256 i; i < ownerTokenCount; ++i) {
-            ownedTokenIds[i] = tokenOfOwnerByIndex(_owner, i);
+        uint256 currentTokenId = 1;
+        uint256 ownedTokenIndex = 0;
+
+        while (ownedTokenIndex < ownerTokenCount && currentTokenId <= supply) {
+            if (
+                _exists(currentTokenId) && ownerOf(currentTokenId) == _owner
+            ) {
+                ownedTokenIds[ownedTokenIndex] = currentTokenId;
+
+                ownedTokenIndex++;
+            }
+
+            currentTokenId++;
         }
+
         return ownedTokenIds;
     }
 
+    /// @notice returns the amount of Metarenas in existence
+    /// @dev tokens minted before V3 are counted by the legacy enumeration array
+    function totalSupply() public view returns (uint256) {
+        return _allTokens.length + mintedSinceLegacyEnumeration;
+    }
+
     /// @notice returns the Token URI with Metadata
     /// @param _tokenId the token ID to return Metadata for
     function tokenURI(uint256 _tokenId)
@@ -615,81 +1200,598 @@ contract Metarenas is
     /// @notice loop for minting multiple NFTs in one transaction
     /// @param _receiver the address to mint to
     /// @param _mintAmount the amount of tokens to mint
+    /// @dev supply is written once and the receiver is checked after every token is minted, once per token for contracts
     function _mintLoop(address _receiver, uint256 _mintAmount) internal {
-        for (uint256 i = 0; i < _mintAmount; i++) {
-            supply++;
-            _safeMint(_receiver, supply);
+        uint256 _supply = supply;
+        uint256 _firstTokenId = _supply + 1;
+        for (uint256 i; i < _mintAmount; ++i) {
+            _mint(_receiver, ++_supply);
+        }
+        supply = _supply;
+        require(
+            _checkOnERC721ReceivedBatch(_receiver, _firstTokenId, _mintAmount),
+            "ERC721: transfer to non ERC721Receiver implementer"
+        );
+    }
+
+    /// @notice calls onERC721Received() for every token of a minted batch if the receiver is a contract
+    /// @param _receiver the address the tokens were minted to
+    /// @param _firstTokenId the first token ID of the batch
+    /// @param _amount the amount of consecutive token IDs minted
+    /// @return true if the receiver is not a contract or accepted every token
+    function _checkOnERC721ReceivedBatch(
+        address _receiver,
+        uint256 _firstTokenId,
+        uint256 _amount
+    ) internal returns (bool) {
+        if (!AddressUpgradeable.isContract(_receiver)) {
+            return true;
         }
+        for (uint256 i; i < _amount; ++i) {
+            if (!_checkOnERC721ReceivedMint(_receiver, _firstTokenId + i)) {
+                return false;
+            }
+        }
+        return true;
     }
 
-    /// @notice calculate the $BYTE rewards accumulated by the Metarena since the last update
+    /// @notice calls onERC721Received() on a contract receiver for one minted token
+    /// @param _receiver the contract the token was minted to
+    /// @param _tokenId the token ID passed to onERC721Received()
+    /// @return true if the receiver accepted the token
+    function _checkOnERC721ReceivedMint(address _receiver, uint256 _tokenId)
+        internal
+        returns (bool)
+    {
+        try
+            IERC721ReceiverUpgradeable(_receiver).onERC721Received(
+                _msgSender(),
+                address(0),
+                _tokenId,
+                ""
+            )
+        returns (bytes4 retval) {
+            return
+                retval == IERC721ReceiverUpgradeable.onERC721Received.selector;
+        } catch (bytes memory reason) {
+            if (reason.length == 0) {
+                revert("ERC721: transfer to non ERC721Receiver implementer");
+            }
+            assembly {
+                revert(add(32, reason), mload(reason))
+            }
+        }
+    }
+
+    /// @notice stakes a Metarena owned by the caller
+    /// @param _arenaTokenId the token Id of the Metarena to be staked
+    function _stakeArena(uint256 _arenaTokenId) internal {
+        require(
+            msg.sender == ownerOf(_arenaTokenId),
+            "Can't stake a arena you don't own!"
+        );
+        Arena memory _arena = _arenaOf(_arenaTokenId);
+        require(!_arena.staked, "Arena already staked!");
+        _arena.timeOfStake = block.timestamp;
+        _arena.staked = true;
+        _checkpointArena(_arena);
+        _setArena(_arenaTokenId, _arena);
+        userArenasStaked[msg.sender].push(_arenaTokenId);
+        stakedArenaIndex[_arenaTokenId] = userArenasStaked[msg.sender].length;
+
+        emit Staked(msg.sender, _arenaTokenId);
+    }
+
+    /// @notice unstakes a Metarena owned by the caller and stores its rewards as unclaimed
+    /// @param _arenaTokenId the token Id of the Metarena to be unstaked
+    function _unstakeArena(uint256 _arenaTokenId) internal {
+        require(
+            msg.sender == ownerOf(_arenaTokenId),
+            "You are not the owner of this Arena!"
+        );
+        Arena memory _arena = _arenaOf(_arenaTokenId);
+        require(_arena.staked, "Arena is not staked!");
+        uint256 _rewards = _pendingRewards(_arena);
+        _arena.unclaimedRewardsArena += _rewards;
+        _arena.unclaimedRewardsByte += _rewards;
+        _arena.level = _arenaLevel(_arena);
+        _arena.staked = false;
+        _arena.timeOfStake = 0;
+        _checkpointArena(_arena);
+        _setArena(_arenaTokenId, _arena);
+        _removeStakedArena(msg.sender, _arenaTokenId);
+
+        emit Unstaked(msg.sender, _arenaTokenId, _arena.level);
+    }
+
+    /// @notice settles the rewards of a Metarena owned by the caller without transferring them
+    /// @param _arenaTokenId the token ID of the Metarena selected to claim rewards from
+    /// @return arenaRewards_ the $ARENA rewards to send to the caller
+    /// @return byteRewards_ the $BYTE rewards to send to the caller, 0 if $BYTE is not enabled
+    function _claimRewards(uint256 _arenaTokenId)
+        internal
+        returns (uint256 arenaRewards_, uint256 byteRewards_)
+    {
+        require(
+            msg.sender == ownerOf(_arenaTokenId),
+            "You don't own this arena!"
+        );
+        Arena memory _arena = _arenaOf(_arenaTokenId);
+        uint256 _rewards = _pendingRewards(_arena);
+        arenaRewards_ = _rewards + _arena.unclaimedRewardsArena;
+        if (byteEndabled) {
+            byteRewards_ = _rewards + _arena.unclaimedRewardsByte;
+            _arena.unclaimedRewardsByte = 0;
+        }
+        _checkpointArena(_arena);
+        _arena.unclaimedRewardsArena = 0;
+        _setArena(_arenaTokenId, _arena);
+
+        emit RewardsClaimed(
+            msg.sender,
+            _arenaTokenId,
+            arenaRewards_,
+            byteRewards_
+        );
+    }
+
+    /// @notice adds levels to a Metarena
+    /// @param _arenaTokenId the token ID of the Metarena to be boosted
+    /// @param _levelsToIncrease the amount of levels to add to the Metarena
+    function _increaseLevel(uint256 _arenaTokenId, uint256 _levelsToIncrease)
+        internal
+    {
+        Arena memory _arena = _arenaOf(_arenaTokenId);
+        _arena.level += _levelsToIncrease;
+        _setArena(_arenaTokenId, _arena);
+
+        emit LevelIncreased(_arenaTokenId, _levelsToIncrease);
+    }
+
+    /// @notice applies the level boosts of a voucher signed by the Level Booster, unless it was already redeemed
+    /// @param _voucher the level boosts, nonce and deadline
+    /// @param _signature the Level Booster's EIP-712 signature of the voucher
+    /// @return false if the voucher was already redeemed
+    function _redeemLevelVoucher(
+        LevelVoucher calldata _voucher,
+        bytes calldata _signature
+    ) internal returns (bool) {
+        uint256 _word = _voucher.nonce >> 8;
+        uint256 _bit = 1 << (_voucher.nonce & 255);
+        uint256 _redeemed = levelVoucherNonces[_word];
+        if (_redeemed & _bit != 0) {
+            return false;
+        }
+        require(block.timestamp <= _voucher.deadline, "Voucher expired");
+        require(_voucher.arenaTokenIds.length == _voucher.levels.length);
+        require(
+            ECDSAUpgradeable.recover(levelVoucherDigest(_voucher), _signature) ==
+                levelBooster,
+            "Invalid voucher signature"
+        );
+        levelVoucherNonces[_word] = _redeemed | _bit;
+        for (uint256 i; i < _voucher.arenaTokenIds.length; ++i) {
+            _increaseLevel(_voucher.arenaTokenIds[i], _voucher.levels[i]);
+        }
+        emit LevelVoucherRedeemed(_voucher.nonce);
+        return true;
+    }
+
+    /// @notice upgrades the tier of a Metarena owned by the caller when it has the required levels
+    /// @param _arenaTokenId the token ID of the Metarena to be upgraded
+    function _upgradeArenaTier(uint256 _arenaTokenId) internal {
+        require(
+            ownerOf(_arenaTokenId) == msg.sender,
+            "Can't upgrade tier for tokens you don't own!"
+        );
+        Arena memory _arena = _arenaOf(_arenaTokenId);
+        uint256 _level = _arenaLevel(_arena);
+        require(
+            _level >= levelsToUpgrade[_arena.tier],
+            "Not high enough level to upgrade"
+        );
+        arenaToken.transferFrom(
+            msg.sender,
+            address(this),
+            arenaPriceForUpgrade * _arena.tier
+        );
+        uint256 _rewards = _pendingRewards(_arena);
+        _arena.unclaimedRewardsArena += _rewards;
+        if (byteEndabled) {
+            byteToken.transferFrom(
+                msg.sender,
+                address(this),
+                bytePriceForUpgrade * _arena.tier
+            );
+            _arena.unclaimedRewardsByte += _rewards;
+        }
+        _arena.tier += 1;
+        _checkpointArena(_arena);
+        _setArena(_arenaTokenId, _arena);
+
+        emit TierUpgraded(_arena.tier, _arenaTokenId);
+    }
+
+    /// @notice removes a Metarena from the staked Arenas of a wallet by swapping it with the last one
+    /// @param _user the wallet that staked the Metarena
+    /// @param _arenaTokenId the token ID of the Metarena
+    function _removeStakedArena(address _user, uint256 _arenaTokenId) internal {
+        uint256[] storage _userArenasStaked = userArenasStaked[_user];
+        uint256 _index = stakedArenaIndex[_arenaTokenId];
+        if (
+            _index == 0 ||
+            _index > _userArenasStaked.length ||
+            _userArenasStaked[_index - 1] != _arenaTokenId
+        ) {
+            // Staked before the position index was added
+            for (uint256 i; i < _userArenasStaked.length; ++i) {
+                if (_userArenasStaked[i] == _arenaTokenId) {
+                    _index = i + 1;
+                    break;
+                }
+            }
+        }
+        uint256 _lastArenaTokenId = _userArenasStaked[
+            _userArenasStaked.length - 1
+        ];
+        if (_lastArenaTokenId != _arenaTokenId) {
+            _userArenasStaked[_index - 1] = _lastArenaTokenId;
+            stakedArenaIndex[_lastArenaTokenId] = _index;
+        }
+        _userArenasStaked.pop();
+        delete stakedArenaIndex[_arenaTokenId];
+    }
+
+    /// @notice returns the Arena info of a Metarena from the packed layout, or from the layout used before V3 if not migrated yet
     /// @param _arenaTokenId the token ID of the Metarena
-    function calculateRewardsByte(uint256 _arenaTokenId)
+    function _arenaOf(uint256 _arenaTokenId)
         internal
         view
-        returns (uint256 _rewards)
+        returns (Arena memory _arena)
     {
-        if (arenas[_arenaTokenId].staked) {
-            return ((((block.timestamp -
-                arenas[_arenaTokenId].timeOfLastRewardUpdate) *
-                tierRewardsMultiplier[arenas[_arenaTokenId].tier]) *
-                (rarityRewardsPerDay[arenas[_arenaTokenId].rarity])) / 864000);
+        PackedArena storage _packed = packedArenas[_arenaTokenId];
+        if (!arenaStorageMigrated && !_packed.migrated) {
+            LegacyArena storage _legacy = legacyArenas[_arenaTokenId];
+            _arena.staked = _legacy.staked;
+            _arena.tier = _legacy.tier;
+            _arena.level = _legacy.level;
+            _arena.rarity = _legacy.rarity;
+            _arena.timeOfStake = _legacy.timeOfStake;
+            _arena.timeOfLastRewardUpdate = _legacy.timeOfLastRewardUpdate;
+            _arena.unclaimedRewardsArena = _legacy.unclaimedRewardsArena;
+            _arena.unclaimedRewardsByte = _legacy.unclaimedRewardsByte;
+            return _arena;
+        }
+        _arena.staked = _packed.staked;
+        _arena.tier = _packed.tier;
+        _arena.level = _packed.level;
+        _arena.rarity = _packed.rarity;
+        _arena.timeOfStake = _packed.timeOfStake;
+        _arena.timeOfLastRewardUpdate = _packed.timeOfLastRewardUpdate;
+        _arena.unclaimedRewardsArena = _packed.unclaimedRewardsArena;
+        _arena.unclaimedRewardsByte = _packed.unclaimedRewardsByte;
+        _arena.rewardIndex = _packed.rewardIndex;
+        _arena.rewardIndexed = _packed.rewardIndexed;
+        _arena.raritySet = _packed.raritySet;
+    }
+
+    /// @notice stores the Arena info of a Metarena in the packed layout
+    /// @param _arenaTokenId the token ID of the Metarena
+    /// @param _arena the Arena info to store
+    /// @dev also moves the Arena's share of its owner's wallet rewards and of the totals from the stored Arena to the new one
+    function _setArena(uint256 _arenaTokenId, Arena memory _arena) internal {
+        PackedArena storage _packed = packedArenas[_arenaTokenId];
+        Arena memory _stored;
+        if (_packed.walletIndexed) {
+            _stored = _arenaOf(_arenaTokenId);
+        }
+        if (!arenaStorageMigrated && !_packed.migrated) {
+            delete legacyArenas[_arenaTokenId];
+        }
+        _packed.staked = _arena.staked;
+        _packed.migrated = true;
+        _packed.tier = SafeCastUpgradeable.toUint8(_arena.tier);
+        _packed.rarity = SafeCastUpgradeable.toUint8(_arena.rarity);
+        _packed.level = SafeCastUpgradeable.toUint32(_arena.level);
+        _packed.timeOfStake = uint40(_arena.timeOfStake);
+        _packed.timeOfLastRewardUpdate = uint40(_arena.timeOfLastRewardUpdate);
+        _packed.unclaimedRewardsArena = SafeCastUpgradeable.toUint96(
+            _arena.unclaimedRewardsArena
+        );
+        _packed.unclaimedRewardsByte = SafeCastUpgradeable.toUint96(
+            _arena.unclaimedRewardsByte
+        );
+        _packed.rewardIndex = SafeCastUpgradeable.toUint128(_arena.rewardIndex);
+        _packed.rewardIndexed = _arena.rewardIndexed;
+        _packed.raritySet = _arena.raritySet;
+        _packed.walletIndexed = true;
+        address _owner = _exists(_arenaTokenId)
+            ? ownerOf(_arenaTokenId)
+            : address(0);
+        _updateWalletRewards(_owner, _stored, _arena);
+        _updateRewardSums(totalUnclaimedRewards, totalStakes, _stored, _arena);
+        if (_stored.staked != _arena.staked) {
+            if (_arena.staked) {
+                stakedArenaCount++;
+            } else {
+                stakedArenaCount--;
+            }
+        }
+    }
+
+    /// @notice replaces the share of an Arena in the rewards of a wallet
+    /// @param _wallet the owner of the Arena
+    /// @param _old the Arena as counted in the wallet rewards, empty if not counted
+    /// @param _new the Arena to count, empty to stop counting it
+    function _updateWalletRewards(
+        address _wallet,
+        Arena memory _old,
+        Arena memory _new
+    ) internal {
+        _updateRewardSums(
+            walletUnclaimedRewards[_wallet],
+            walletStakes[_wallet],
+            _old,
+            _new
+        );
+    }
+
+    /// @notice replaces the share of an Arena in sums of unclaimed rewards and staked Arenas
+    /// @param _unclaimed the unclaimed rewards sums
+    /// @param _stakes the staked Arenas sums per rarity and tier
+    /// @param _old the Arena as counted in the sums, empty if not counted
+    /// @param _new the Arena to count, empty to stop counting it
+    function _updateRewardSums(
+        WalletRewards storage _unclaimed,
+        mapping(uint256 => mapping(uint256 => WalletStake)) storage _stakes,
+        Arena memory _old,
+        Arena memory _new
+    ) internal {
+        if (
+            _old.unclaimedRewardsArena != _new.unclaimedRewardsArena ||
+            _old.unclaimedRewardsByte != _new.unclaimedRewardsByte
+        ) {
+            _unclaimed.unclaimedRewardsArena = SafeCastUpgradeable.toUint128(
+                _unclaimed.unclaimedRewardsArena +
+                    _new.unclaimedRewardsArena -
+                    _old.unclaimedRewardsArena
+            );
+            _unclaimed.unclaimedRewardsByte = SafeCastUpgradeable.toUint128(
+                _unclaimed.unclaimedRewardsByte +
+                    _new.unclaimedRewardsByte -
+                    _old.unclaimedRewardsByte
+            );
+        }
+        uint256 _oldIndex = _old.staked ? _arenaRewardIndex(_old) / 864000 : 0;
+        uint256 _newIndex = _new.staked ? _arenaRewardIndex(_new) / 864000 : 0;
+        if (
+            _old.staked == _new.staked &&
+            _old.rarity == _new.rarity &&
+            _old.tier == _new.tier &&
+            _oldIndex == _newIndex
+        ) {
+            return;
+        }
+        if (_old.staked) {
+            WalletStake storage _stake = _stakes[_old.rarity][_old.tier];
+            _stake.staked -= 1;
+            _stake.rewardIndexes -= uint192(_oldIndex);
+        }
+        if (_new.staked) {
+            WalletStake storage _stake = _stakes[_new.rarity][_new.tier];
+            _stake.staked += 1;
+            _stake.rewardIndexes += uint192(_newIndex);
+        }
+    }
+
+    /// @notice sets the rarity of a Metarena, settling the rewards of a staked Metarena at the old rarity first
+    /// @param _arenaTokenId the token ID of the Metarena
+    /// @param _rarity the rarity(0: Common, 1: Uncommon, 2: Rare, 3: Epic, 4: Legendary)
+    function _setArenaRarity(uint256 _arenaTokenId, uint256 _rarity) internal {
+        require(_rarity < 5);
+        Arena memory _arena = _arenaOf(_arenaTokenId);
+        if (_arena.staked) {
+            uint256 _rewards = _pendingRewards(_arena);
+            _arena.unclaimedRewardsArena += _rewards;
+            if (byteEndabled) {
+                _arena.unclaimedRewardsByte += _rewards;
+            }
+            _arena.rarity = _rarity;
+            _checkpointArena(_arena);
         } else {
-            return 0;
+            _arena.rarity = _rarity;
         }
+        _arena.raritySet = true;
+        _setArena(_arenaTokenId, _arena);
+        emit RaritySet(_arenaTokenId, _rarity);
     }
 
-    /// @notice calculate the $ARENArewards accumulated by the Metarena since the last update
+    /// @notice sets the rarity of a Metarena from a proof against rarityMerkleRoot, unless it is already set
     /// @param _arenaTokenId the token ID of the Metarena
-    function calculateRewardsArena(uint256 _arenaTokenId)
+    /// @param _rarity the rarity(0: Common, 1: Uncommon, 2: Rare, 3: Epic, 4: Legendary)
+    /// @param _merkleProof the proof of the keccak256(bytes.concat(keccak256(abi.encode(tokenId, rarity)))) leaf
+    function _proveRarity(
+        uint256 _arenaTokenId,
+        uint256 _rarity,
+        bytes32[] calldata _merkleProof
+    ) internal {
+        if (_arenaOf(_arenaTokenId).raritySet) {
+            return;
+        }
+        // Leaves are hashed twice so no leaf can pass as an inner node
+        bytes32 leaf = keccak256(
+            bytes.concat(keccak256(abi.encode(_arenaTokenId, _rarity)))
+        );
+        require(
+            MerkleProofUpgradeable.verify(_merkleProof, rarityMerkleRoot, leaf),
+            "Invalid proof"
+        );
+        _setArenaRarity(_arenaTokenId, _rarity);
+    }
+
+    /// @notice returns the rewards rate of a rarity and tier combination, per second and multiplied by 864000
+    /// @param _rarity the Arena rarity
+    /// @param _tier the Arena tier
+    function _rewardRate(uint256 _rarity, uint256 _tier)
         internal
         view
-        returns (uint256 _rewards)
+        returns (uint256)
     {
-        if (arenas[_arenaTokenId].staked) {
-            return ((((block.timestamp -
-                arenas[_arenaTokenId].timeOfLastRewardUpdate) *
-                tierRewardsMultiplier[arenas[_arenaTokenId].tier]) *
-                (rarityRewardsPerDay[arenas[_arenaTokenId].rarity])) / 864000);
-        } else {
-            return 0;
+        return tierRewardsMultiplier[_tier] * rarityRewardsPerDay[_rarity];
+    }
+
+    /// @notice returns the current rewards index of a rarity and tier combination
+    /// @param _rarity the Arena rarity
+    /// @param _tier the Arena tier
+    function _currentRewardIndex(uint256 _rarity, uint256 _tier)
+        internal
+        view
+        returns (uint256)
+    {
+        RewardIndex storage _index = rewardIndexes[_rarity][_tier];
+        return
+            _index.index +
+            (block.timestamp - _index.lastUpdate) *
+            _rewardRate(_rarity, _tier);
+    }
+
+    /// @notice returns the rewards of sums kept by _updateRewardSums(), same as the sum of availableRewards() of the Arenas counted
+    /// @param _unclaimed the unclaimed rewards sums
+    /// @param _stakes the staked Arenas sums per rarity and tier
+    function _rewardSums(
+        WalletRewards storage _unclaimed,
+        mapping(uint256 => mapping(uint256 => WalletStake)) storage _stakes
+    ) internal view returns (uint256, uint256) {
+        uint256 _rewards;
+        uint256 _rewardTiers = rewardTiers > 4 ? rewardTiers : 4;
+        for (uint256 _rarity; _rarity < 5; ++_rarity) {
+            for (uint256 _tier; _tier < _rewardTiers; ++_tier) {
+                WalletStake storage _stake = _stakes[_rarity][_tier];
+                if (_stake.staked != 0) {
+                    _rewards +=
+                        _stake.staked *
+                        (_currentRewardIndex(_rarity, _tier) / 864000) -
+                        _stake.rewardIndexes;
+                }
+            }
+        }
+        uint256 _rewardsByte;
+        if (byteEndabled) {
+            _rewardsByte = _unclaimed.unclaimedRewardsByte + _rewards;
         }
+        return (_unclaimed.unclaimedRewardsArena + _rewards, _rewardsByte);
     }
 
-    /// @notice returns arena level
-    /// @param _arenaTokenId the token ID of the Metarena
-    function calculateArenaLevel(uint256 _arenaTokenId)
+    /// @notice returns the rewards rate of all the staked Arenas, per second and multiplied by 864000
+    function _emissionRate() internal view returns (uint256 rate_) {
+        uint256 _rewardTiers = rewardTiers > 4 ? rewardTiers : 4;
+        for (uint256 _rarity; _rarity < 5; ++_rarity) {
+            for (uint256 _tier; _tier < _rewardTiers; ++_tier) {
+                uint256 _staked = totalStakes[_rarity][_tier].staked;
+                if (_staked != 0) {
+                    rate_ += _staked * _rewardRate(_rarity, _tier);
+                }
+            }
+        }
+    }
+
+    /// @notice accumulates the rewards index of a rarity and tier combination up to now, called before its rate changes
+    /// @param _rarity the Arena rarity
+    /// @param _tier the Arena tier
+    function _checkpointRewardIndex(uint256 _rarity, uint256 _tier) internal {
+        RewardIndex storage _index = rewardIndexes[_rarity][_tier];
+        uint256 _rate = _rewardRate(_rarity, _tier);
+        if (_index.lastUpdate == 0) {
+            _index.originRate = _rate;
+        }
+        _index.index += (block.timestamp - _index.lastUpdate) * _rate;
+        _index.lastUpdate = block.timestamp;
+    }
+
+    /// @notice moves the rewards checkpoint of an Arena already loaded in memory to now
+    /// @param _arena the Arena info
+    function _checkpointArena(Arena memory _arena) internal view {
+        _arena.rewardIndex = _currentRewardIndex(_arena.rarity, _arena.tier);
+        _arena.rewardIndexed = true;
+        _arena.timeOfLastRewardUpdate = block.timestamp;
+    }
+
+    /// @notice returns the rewards index at the last update of an Arena already loaded in memory
+    /// @param _arena the Arena info
+    /// @dev an Arena last updated before the rewards index was added is valued as if its
+    /// index grew at the origin rate, which was in effect until the first checkpoint
+    function _arenaRewardIndex(Arena memory _arena)
         internal
         view
         returns (uint256)
     {
-        if (arenas[_arenaTokenId].timeOfStake == 0) {
-            return (arenas[_arenaTokenId].level);
-        } else {
+        if (_arena.rewardIndexed) {
+            return _arena.rewardIndex;
+        }
+        RewardIndex storage _index = rewardIndexes[_arena.rarity][_arena.tier];
+        if (_index.lastUpdate == 0) {
             return
-                ((block.timestamp - arenas[_arenaTokenId].timeOfStake) /
-                    timeToLevelUp) + arenas[_arenaTokenId].level;
+                _arena.timeOfLastRewardUpdate *
+                _rewardRate(_arena.rarity, _arena.tier);
+        }
+        return _arena.timeOfLastRewardUpdate * _index.originRate;
+    }
+
+    /// @notice calculate the rewards accumulated since the last update for an Arena already loaded in memory
+    /// @param _arena the Arena info
+    /// @dev $ARENA and $BYTE rewards accumulate at the same rate. Both indexes are rounded down
+    /// before the difference, so the rewards of a wallet add up from per-wallet sums in walletRewards()
+    function _pendingRewards(Arena memory _arena)
+        internal
+        view
+        returns (uint256)
+    {
+        if (!_arena.staked) {
+            return 0;
         }
+        return
+            _currentRewardIndex(_arena.rarity, _arena.tier) /
+            864000 -
+            _arenaRewardIndex(_arena) /
+            864000;
     }
 
-    /// @notice override function to block token transfers when tokenId is staked and reset Metarena level on transfer
+    /// @notice returns the level of an Arena already loaded in memory
+    /// @param _arena the Arena info
+    function _arenaLevel(Arena memory _arena) internal view returns (uint256) {
+        if (_arena.timeOfStake == 0) {
+            return _arena.level;
+        }
+        return
+            ((block.timestamp - _arena.timeOfStake) / timeToLevelUp) +
+            _arena.level;
+    }
+
+    /// @notice override function to block token transfers when tokenId is staked, reset Metarena level on transfer, move unclaimed wallet rewards and count mints
     function _beforeTokenTransfer(
         address from,
         address to,
         uint256 tokenId
-    ) internal override(ERC721Upgradeable, ERC721EnumerableUpgradeable) {
-        require(!arenas[tokenId].staked, "You can't transfer staked arenas!");
-        arenas[tokenId].level = 0;
+    ) internal override {
+        Arena memory _arena = _arenaOf(tokenId);
+        require(!_arena.staked, "You can't transfer staked arenas!");
+        if (_arena.level != 0) {
+            _arena.level = 0;
+            _setArena(tokenId, _arena);
+        }
+        // Staked Arenas can't move, only the unclaimed rewards change wallet
+        if (
+            packedArenas[tokenId].walletIndexed &&
+            (_arena.unclaimedRewardsArena != 0 ||
+                _arena.unclaimedRewardsByte != 0)
+        ) {
+            Arena memory _empty;
+            _updateWalletRewards(from, _arena, _empty);
+            _updateWalletRewards(to, _empty, _arena);
+        }
+        if (from == address(0)) {
+            mintedSinceLegacyEnumeration++;
+        }
         super._beforeTokenTransfer(from, to, tokenId);
     }
-
-    /// @notice override required by Solidity
-    function supportsInterface(bytes4 interfaceId)
-        public
-        view
-        override(ERC721Upgradeable, ERC721EnumerableUpgradeable)
-        returns (bool)
-    {
-        return super.supportsInterface(interfaceId);
-    }
 }
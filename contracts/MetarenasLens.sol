@@ -0,0 +1,152 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.4;
+
+import "../interfaces/IMetarenas.sol";
+
+/// @title Batch views over a Metarenas proxy
+/// @author Andrei Toma
+/// @notice Serves the details, rewards and owners of many Metarenas in one eth_call.
+/// @dev Kept out of Metarenas so its runtime bytecode stays under the EIP-170 limit. Every value is
+/// read from the single token views, so the batch views agree with them on any implementation.
+contract MetarenasLens {
+    /// @notice returns packed details, available rewards and owners for a list of Metarenas
+    /// @param _metarenas the Metarenas proxy to read
+    /// @param _arenaTokenIds the token IDs to query for
+    /// @return details_ the packed details of every Metarena, see _packArenaDetails()
+    /// @return rewardsArena_ the $ARENA rewards available to claim for every Metarena
+    /// @return rewardsByte_ the $BYTE rewards available to claim for every Metarena
+    /// @return owners_ the owner of every Metarena, address(0) if not minted
+    function arenaDetailsBatch(
+        IMetarenas _metarenas,
+        uint256[] memory _arenaTokenIds
+    )
+        public
+        view
+        returns (
+            uint256[] memory details_,
+            uint256[] memory rewardsArena_,
+            uint256[] memory rewardsByte_,
+            address[] memory owners_
+        )
+    {
+        details_ = new uint256[](_arenaTokenIds.length);
+        rewardsArena_ = new uint256[](_arenaTokenIds.length);
+        rewardsByte_ = new uint256[](_arenaTokenIds.length);
+        owners_ = new address[](_arenaTokenIds.length);
+        for (uint256 i; i < _arenaTokenIds.length; ++i) {
+            details_[i] = _packArenaDetails(_metarenas, _arenaTokenIds[i]);
+            (rewardsArena_[i], rewardsByte_[i]) = _metarenas.availableRewards(
+                _arenaTokenIds[i]
+            );
+            owners_[i] = _ownerOf(_metarenas, _arenaTokenIds[i]);
+        }
+    }
+
+    /// @notice returns packed details, available rewards and owners for a range of Metarenas
+    /// @param _metarenas the Metarenas proxy to read
+    /// @param _fromTokenId the first token ID to query for
+    /// @param _count the amount of consecutive token IDs to query for
+    function arenaDetailsRange(
+        IMetarenas _metarenas,
+        uint256 _fromTokenId,
+        uint256 _count
+    )
+        external
+        view
+        returns (
+            uint256[] memory details_,
+            uint256[] memory rewardsArena_,
+            uint256[] memory rewardsByte_,
+            address[] memory owners_
+        )
+    {
+        uint256[] memory _arenaTokenIds = new uint256[](_count);
+        for (uint256 i; i < _count; ++i) {
+            _arenaTokenIds[i] = _fromTokenId + i;
+        }
+        return arenaDetailsBatch(_metarenas, _arenaTokenIds);
+    }
+
+    /// @notice returns rewards available to claim for a list of Metarenas
+    /// @param _metarenas the Metarenas proxy to read
+    /// @param _arenaTokenIds the token IDs to query for
+    function availableRewardsBatch(
+        IMetarenas _metarenas,
+        uint256[] memory _arenaTokenIds
+    )
+        external
+        view
+        returns (uint256[] memory rewardsArena_, uint256[] memory rewardsByte_)
+    {
+        rewardsArena_ = new uint256[](_arenaTokenIds.length);
+        rewardsByte_ = new uint256[](_arenaTokenIds.length);
+        for (uint256 i; i < _arenaTokenIds.length; ++i) {
+            (rewardsArena_[i], rewardsByte_[i]) = _metarenas.availableRewards(
+                _arenaTokenIds[i]
+            );
+        }
+    }
+
+    /// @notice packs the details of a Metarena into one word
+    /// @param _metarenas the Metarenas proxy to read
+    /// @param _arenaTokenId the token ID to query for
+    /// @dev bits 0-63: timeOfStake, 64-127: level, 128-191: tier, 192-199: rarity,
+    /// bit 200: staked, bit 201: canUpgrade, bit 202: raritySet, all as returned by arenaDetails() and arenaInfo()
+    function _packArenaDetails(IMetarenas _metarenas, uint256 _arenaTokenId)
+        internal
+        view
+        returns (uint256 packed_)
+    {
+        (
+            uint256 _tier,
+            uint256 _level,
+            uint256 _rarity,
+            bool _staked,
+            bool _canUpgrade,
+            uint256 _timeOfStake
+        ) = _metarenas.arenaDetails(_arenaTokenId);
+        packed_ =
+            uint256(uint64(_timeOfStake)) |
+            (uint256(uint64(_level)) << 64) |
+            (uint256(uint64(_tier)) << 128) |
+            (uint256(uint8(_rarity)) << 192);
+        if (_staked) {
+            packed_ |= 1 << 200;
+        }
+        if (_canUpgrade) {
+            packed_ |= 1 << 201;
+        }
+        if (_raritySet(_metarenas, _arenaTokenId)) {
+            packed_ |= 1 << 202;
+        }
+    }
+
+    /// @notice returns whether the rarity of a Metarena was set
+    /// @dev false on implementations without arenaInfo(), like MetarenasV2
+    function _raritySet(IMetarenas _metarenas, uint256 _arenaTokenId)
+        internal
+        view
+        returns (bool)
+    {
+        try _metarenas.arenaInfo(_arenaTokenId) returns (
+            IMetarenas.Arena memory _arena
+        ) {
+            return _arena.raritySet;
+        } catch {
+            return false;
+        }
+    }
+
+    /// @notice returns the owner of a Metarena, address(0) if it was not minted
+    function _ownerOf(IMetarenas _metarenas, uint256 _arenaTokenId)
+        internal
+        view
+        returns (address)
+    {
+        try _metarenas.ownerOf(_arenaTokenId) returns (address _owner) {
+            return _owner;
+        } catch {
+            return address(0);
+        }
+    }
+}
@@ -0,0 +1,63 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.4;
+
+/// @title Read-only call aggregator for the Metarenas ecosystem
+/// @author Andrei Toma
+/// @notice Bundles many view calls into a single eth_call so off-chain scripts
+/// don't need one RPC request per token.
+contract Multicall {
+    // A single view call to execute
+    struct Call {
+        // The Contract to call
+        address target;
+        // ABI encoded function call
+        bytes callData;
+    }
+
+    // The outcome of a single view call
+    struct Result {
+        // False if the call reverted
+        bool success;
+        // The raw ABI encoded return data
+        bytes returnData;
+    }
+
+    /// @notice executes all the calls and reverts if any of them fails
+    /// @param _calls the calls to execute
+    /// @return blockNumber_ the block the calls were executed at
+    /// @return returnData_ the raw return data of every call, in order
+    function aggregate(Call[] calldata _calls)
+        external
+        view
+        returns (uint256 blockNumber_, bytes[] memory returnData_)
+    {
+        blockNumber_ = block.number;
+        returnData_ = new bytes[](_calls.length);
+        for (uint256 i; i < _calls.length; ++i) {
+            (bool _success, bytes memory _data) = _calls[i].target.staticcall(
+                _calls[i].callData
+            );
+            require(_success, "Multicall: call failed");
+            returnData_[i] = _data;
+        }
+    }
+
+    /// @notice executes all the calls without reverting when one of them fails
+    /// @param _calls the calls to execute
+    /// @return blockNumber_ the block the calls were executed at
+    /// @return results_ the success flag and raw return data of every call, in order
+    function tryAggregate(Call[] calldata _calls)
+        external
+        view
+        returns (uint256 blockNumber_, Result[] memory results_)
+    {
+        blockNumber_ = block.number;
+        results_ = new Result[](_calls.length);
+        for (uint256 i; i < _calls.length; ++i) {
+            (bool _success, bytes memory _data) = _calls[i].target.staticcall(
+                _calls[i].callData
+            );
+            results_[i] = Result(_success, _data);
+        }
+    }
+}
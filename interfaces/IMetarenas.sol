@@ -0,0 +1,45 @@
+// SPDX-License-Identifier: MIT
+// Creator: andreitoma8
+pragma solidity ^0.8.4;
+
+/// @notice the single Metarena views read by MetarenasLens
+interface IMetarenas {
+    // Same fields, in the same order, as Metarenas.Arena
+    struct Arena {
+        bool staked;
+        uint256 tier;
+        uint256 level;
+        uint256 rarity;
+        uint256 timeOfStake;
+        uint256 timeOfLastRewardUpdate;
+        uint256 unclaimedRewardsArena;
+        uint256 unclaimedRewardsByte;
+        uint256 rewardIndex;
+        bool rewardIndexed;
+        bool raritySet;
+    }
+
+    function arenaDetails(uint256 _arenaTokenId)
+        external
+        view
+        returns (
+            uint256 arenaTier_,
+            uint256 arenaLevel_,
+            uint256 arenaRarity_,
+            bool staked_,
+            bool canUpgrade_,
+            uint256 timeOfStake_
+        );
+
+    function arenaInfo(uint256 _arenaTokenId)
+        external
+        view
+        returns (Arena memory arena_);
+
+    function availableRewards(uint256 _arenaTokenId)
+        external
+        view
+        returns (uint256, uint256);
+
+    function ownerOf(uint256 tokenId) external view returns (address);
+}
@@ -0,0 +1,366 @@
+from brownie import Contract, Metarenas, web3
+from collections import OrderedDict, deque
+from scripts.arena_indexer import EVENTS, arena_level, decode_log, meta_arenas_address
+from scripts.helpful_scripts import percentiles
+from scripts.rewards_model import REWARDS_DIVISOR
+from scripts.rpc_client import ArenaDetails, Rewards
+import eth_utils
+import time
+
+# Most Arenas, and separately most owners, kept in memory
+cache_size = 10000
+# Latency samples kept for hits and for misses
+latency_samples = 10000
+
+# Events that change a cached value, in the format of arena_indexer.EVENTS
+CACHE_EVENTS = dict(
+    EVENTS,
+    RaritySet=(
+        "RaritySet(uint256,uint256)",
+        [("tokenId", "uint256")],
+        ["rarity"],
+    ),
+    RarityRewardsUpdated=(
+        "RarityRewardsUpdated(uint256,uint256)",
+        [("rarity", "uint256")],
+        ["rewards"],
+    ),
+    TierMultiplierUpdated=(
+        "TierMultiplierUpdated(uint256,uint256)",
+        [("tier", "uint256")],
+        ["multiplier"],
+    ),
+    ByteEnabledUpdated=("ByteEnabledUpdated(bool)", [], ["enabled"]),
+)
+
+# Fields returned by arenaInfo(), in order
+ARENA_FIELDS = [
+    "staked",
+    "tier",
+    "level",
+    "rarity",
+    "time_of_stake",
+    "time_of_last_reward_update",
+    "unclaimed_arena",
+    "unclaimed_byte",
+    "reward_index",
+    "reward_indexed",
+    "rarity_set",
+]
+
+
+class LruCache:
+    """Dict bounded to `max_size` keys, evicting the least recently used one."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.evictions = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def keys(self):
+        return list(self._items)
+
+    def get(self, key):
+        if key not in self._items:
+            return None
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key):
+        return self._items.pop(key, None)
+
+    def clear(self):
+        self._items.clear()
+
+
+def current_reward_index(index, now):
+    """Rewards index of a rarity and tier at `now`, same as _currentRewardIndex()."""
+    return index["index"] + (now - index["timestamp"]) * index["rate"]
+
+
+def arena_reward_index(arena, index):
+    """Rewards index at the last update of an Arena, same as _arenaRewardIndex()."""
+    if arena["reward_indexed"]:
+        return arena["reward_index"]
+    if index["last_update"] == 0:
+        return arena["time_of_last_reward_update"] * index["rate"]
+    return arena["time_of_last_reward_update"] * index["origin_rate"]
+
+
+def pending_rewards(arena, index, now):
+    """Rewards of an Arena since its last update, same as _pendingRewards()."""
+    if not arena["staked"]:
+        return 0
+    return (
+        current_reward_index(index, now) // REWARDS_DIVISOR
+        - arena_reward_index(arena, index) // REWARDS_DIVISOR
+    )
+
+
+class ArenaStateCache:
+    """Caches the raw Arena info of Metarenas and derives their views locally.
+
+    Every cached value is read at the synced block. `sync()` moves that block
+    forward and drops only the Arenas, owners and rewards indexes touched by
+    the logs in between. Levels and pending rewards only depend on the
+    block timestamp otherwise, so they are computed with the formulas of
+    arenaDetails() and availableRewards() instead of being read again.
+
+    Args:
+        meta_arenas (brownie.network.contract.Contract): the Metarenas proxy.
+
+        w3 (web3.Web3, optional): the node connection. Defaults to brownie's.
+
+        max_size (int, optional): most Arenas, and most owners, kept in memory.
+
+        block (int, optional): the block to start from. Defaults to the head.
+    """
+
+    def __init__(self, meta_arenas, w3=None, max_size=cache_size, block=None):
+        self.meta_arenas = meta_arenas
+        self.w3 = w3 or web3
+        self.address = eth_utils.to_checksum_address(meta_arenas.address)
+        self.block = self.w3.eth.block_number if block is None else block
+        self.arenas = LruCache(max_size)
+        self.owners = LruCache(max_size)
+        # (rarity, tier) -> rewards index, and config values, both small
+        self.indexes = LruCache(max_size)
+        self.config = LruCache(max_size)
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+        self.latency = {
+            "hit": deque(maxlen=latency_samples),
+            "miss": deque(maxlen=latency_samples),
+        }
+        self.topics = [
+            eth_utils.to_hex(eth_utils.keccak(text=signature))
+            for signature, _, _ in CACHE_EVENTS.values()
+        ]
+        self._timestamps = LruCache(256)
+
+    def clear(self):
+        for cache in [self.arenas, self.owners, self.indexes, self.config]:
+            cache.clear()
+
+    def sync(self, to_block=None):
+        """Moves the cache to `to_block`, dropping the values changed on the way.
+
+        A chain rewound below the synced block clears the whole cache.
+
+        Returns:
+            [int]: the amount of cached values dropped.
+        """
+        to_block = self.w3.eth.block_number if to_block is None else to_block
+        if to_block < self.block:
+            dropped = len(self.arenas) + len(self.owners) + len(self.indexes)
+            self.clear()
+            self.block = to_block
+            return dropped
+        dropped = 0
+        if to_block > self.block:
+            logs = self.w3.eth.get_logs(
+                {
+                    "address": self.address,
+                    "fromBlock": self.block + 1,
+                    "toBlock": to_block,
+                    "topics": [self.topics],
+                }
+            )
+            for log in logs:
+                decoded = decode_log(log, CACHE_EVENTS)
+                if decoded is not None:
+                    dropped += self._invalidate(*decoded)
+            self.block = to_block
+        self.stats["invalidations"] += dropped
+        return dropped
+
+    def _invalidate(self, name, args):
+        dropped = []
+        if "tokenId" in args:
+            dropped.append(self.arenas.pop(args["tokenId"]))
+        if name == "Transfer":
+            dropped.append(self.owners.pop(args["from"]))
+            dropped.append(self.owners.pop(args["to"]))
+        elif name == "RarityRewardsUpdated":
+            for key in self.indexes.keys():
+                if key[0] == args["rarity"]:
+                    dropped.append(self.indexes.pop(key))
+        elif name == "TierMultiplierUpdated":
+            for key in self.indexes.keys():
+                if key[1] == args["tier"]:
+                    dropped.append(self.indexes.pop(key))
+        elif name == "ByteEnabledUpdated":
+            dropped.append(self.config.pop("byte_enabled"))
+        return sum(value is not None for value in dropped)
+
+    def _lookup(self, cache, key, fetch):
+        started = time.perf_counter()
+        value = cache.get(key)
+        if value is None:
+            value = fetch()
+            cache.put(key, value)
+            self.stats["misses"] += 1
+            self.latency["miss"].append(time.perf_counter() - started)
+        else:
+            self.stats["hits"] += 1
+            self.latency["hit"].append(time.perf_counter() - started)
+        return value
+
+    def timestamp(self, block=None):
+        """Timestamp of `block`, the synced block by default."""
+        block = self.block if block is None else block
+        timestamp = self._timestamps.get(block)
+        if timestamp is None:
+            timestamp = self.w3.eth.get_block(block)["timestamp"]
+            self._timestamps.put(block, timestamp)
+        return timestamp
+
+    def arena(self, token_id):
+        """Returns the raw Arena info of a Metarena, as a dict of `ARENA_FIELDS`."""
+
+        def fetch():
+            info = self.meta_arenas.arenaInfo(token_id, block_identifier=self.block)
+            arena = dict(zip(ARENA_FIELDS, info))
+            arena["block"] = self.block
+            return arena
+
+        return self._lookup(self.arenas, token_id, fetch)
+
+    def reward_index(self, rarity, tier):
+        """Returns the rewards index of a rarity and tier, with its rate."""
+
+        def fetch():
+            index, last_update, origin_rate = self.meta_arenas.rewardIndex(
+                rarity, tier, block_identifier=self.block
+            )
+            rate = self.meta_arenas.tierRewardsMultiplier(
+                tier, block_identifier=self.block
+            ) * self.meta_arenas.rarityRewardsPerDay(
+                rarity, block_identifier=self.block
+            )
+            return {
+                "index": index,
+                "timestamp": self.timestamp(),
+                "last_update": last_update,
+                "origin_rate": origin_rate,
+                "rate": rate,
+                "block": self.block,
+            }
+
+        return self._lookup(self.indexes, (rarity, tier), fetch)
+
+    def byte_enabled(self):
+        return self._lookup(
+            self.config,
+            "byte_enabled",
+            lambda: self.meta_arenas.byteEndabled(block_identifier=self.block),
+        )
+
+    def levels_to_upgrade(self, tier):
+        # Only set in initialize(), never invalidated
+        return self._lookup(
+            self.config,
+            ("levels_to_upgrade", tier),
+            lambda: self.meta_arenas.levelsToUpgrade(tier, block_identifier=self.block),
+        )
+
+    def arena_details(self, token_id, now=None):
+        """Same values as arenaDetails() at the synced block, or at `now`.
+
+        Args:
+            token_id (int): the Metarena.
+
+            now (int, optional): a timestamp at or after the synced block,
+            assuming no new logs. Defaults to the synced block's timestamp.
+
+        Returns:
+            [ArenaDetails]: the details of the Metarena.
+        """
+        now = self.timestamp() if now is None else now
+        arena = self.arena(token_id)
+        level = arena_level(arena, now)
+        return ArenaDetails(
+            arena["tier"],
+            level,
+            arena["rarity"],
+            arena["staked"],
+            level >= self.levels_to_upgrade(arena["tier"]),
+            arena["time_of_stake"],
+        )
+
+    def available_rewards(self, token_id, now=None):
+        """Same values as availableRewards() at the synced block, or at `now`.
+
+        Returns:
+            [Rewards]: the $ARENA and $BYTE rewards available to claim.
+        """
+        now = self.timestamp() if now is None else now
+        arena = self.arena(token_id)
+        pending = 0
+        if arena["staked"]:
+            index = self.reward_index(arena["rarity"], arena["tier"])
+            pending = pending_rewards(arena, index, now)
+        byte_rewards = arena["unclaimed_byte"] + pending if self.byte_enabled() else 0
+        return Rewards(arena["unclaimed_arena"] + pending, byte_rewards)
+
+    def tokens_of_owner(self, owner):
+        """Same token IDs as tokensOfOwner() at the synced block."""
+        owner = eth_utils.to_checksum_address(owner)
+        return self._lookup(
+            self.owners,
+            owner,
+            lambda: list(
+                self.meta_arenas.tokensOfOwner(owner, block_identifier=self.block)
+            ),
+        )
+
+    def report(self):
+        """Returns the hit rate, evictions, invalidations and lookup latencies in ms."""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "block": self.block,
+            "hits": self.stats["hits"],
+            "misses": self.stats["misses"],
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            "invalidations": self.stats["invalidations"],
+            "evictions": sum(
+                cache.evictions
+                for cache in [self.arenas, self.owners, self.indexes, self.config]
+            ),
+            "cached_arenas": len(self.arenas),
+            "hit_ms": percentiles(self.latency["hit"]),
+            "miss_ms": percentiles(self.latency["miss"]),
+        }
+
+
+def main():
+    meta_arenas = Contract.from_abi("Metarenas", meta_arenas_address, Metarenas.abi)
+    cache = ArenaStateCache(meta_arenas)
+    token_ids = list(range(1, 1001))
+    # Read everything twice with a sync in between, the second pass only
+    # reads the Arenas touched by the new logs
+    for _ in range(2):
+        cache.sync()
+        staked = [i for i in token_ids if cache.arena_details(i).staked]
+        rewards = sum(cache.available_rewards(i).arena for i in staked)
+        print(
+            f"Block {cache.block}: {len(staked)} staked, "
+            f"{rewards / 10**18:.2f} $ARENA claimable"
+        )
+    report = cache.report()
+    print(
+        f"Hit rate {report['hit_rate']:.1%}, hits p50 {report['hit_ms']['p50']:.3f}ms, "
+        f"misses p50 {report['miss_ms']['p50']:.3f}ms"
+    )
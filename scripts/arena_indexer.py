@@ -0,0 +1,446 @@
+from brownie import web3
+import eth_utils
+import json
+import sqlite3
+
+meta_arenas_address = "0x86640CC8C305f10BB88Daa970932d2d48de39811"
+# SQLite file the indexer keeps up to date
+database_path = "metarenas.db"
+# Amount of blocks requested in one eth_getLogs call
+log_chunk_size = 2000
+# Time needed to gain one level while staked, same as timeToLevelUp in Metarenas
+time_to_level_up = 259200
+
+# Event name to signature, indexed arguments and data arguments
+EVENTS = {
+    "Transfer": (
+        "Transfer(address,address,uint256)",
+        [("from", "address"), ("to", "address"), ("tokenId", "uint256")],
+        [],
+    ),
+    "Staked": (
+        "Staked(address,uint256)",
+        [("user", "address"), ("tokenId", "uint256")],
+        [],
+    ),
+    "Unstaked": (
+        "Unstaked(address,uint256,uint256)",
+        [("user", "address"), ("tokenId", "uint256")],
+        ["level"],
+    ),
+    "RewardsClaimed": (
+        "RewardsClaimed(address,uint256,uint256,uint256)",
+        [("user", "address"), ("tokenId", "uint256")],
+        ["arenaRewards", "byteRewards"],
+    ),
+    "LevelIncreased": (
+        "LevelIncreased(uint256,uint256)",
+        [("tokenId", "uint256")],
+        ["levelsIncreased"],
+    ),
+    "TierUpgraded": (
+        "TierUpgraded(uint256,uint256)",
+        [("tier", "uint256"), ("tokenId", "uint256")],
+        [],
+    ),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS blocks (
+    number INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL,
+    timestamp INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    name TEXT NOT NULL,
+    token_id INTEGER NOT NULL,
+    args TEXT NOT NULL,
+    PRIMARY KEY (block_number, log_index)
+);
+CREATE INDEX IF NOT EXISTS events_token_id ON events (token_id);
+CREATE TABLE IF NOT EXISTS arenas (
+    token_id INTEGER PRIMARY KEY,
+    owner TEXT NOT NULL,
+    staked INTEGER NOT NULL,
+    time_of_stake INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    tier INTEGER NOT NULL,
+    claimed_arena TEXT NOT NULL,
+    claimed_byte TEXT NOT NULL,
+    last_block INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS arenas_owner ON arenas (owner);
+"""
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+def _to_bytes(value):
+    if isinstance(value, str):
+        return eth_utils.to_bytes(hexstr=value)
+    return bytes(value)
+
+
+def _to_hex(value):
+    return eth_utils.to_hex(_to_bytes(value))
+
+
+def decode_log(log, events=EVENTS):
+    """Decodes a Metarenas log into its event name and arguments.
+
+    Args:
+        log (dict): a log returned by eth_getLogs.
+
+        events (dict, optional): the events to decode, in the format of `EVENTS`.
+
+    Returns:
+        [tuple]: the event name and a dict of its arguments, or None if the
+        log is not one of the indexed events.
+    """
+    topics = [_to_bytes(topic) for topic in log["topics"]]
+    for name, (signature, indexed, data) in events.items():
+        if topics[0] != eth_utils.keccak(text=signature):
+            continue
+        if len(topics) != len(indexed) + 1:
+            # Same signature with other indexed arguments, e.g. an ERC20 Transfer
+            return None
+        args = {}
+        for (arg_name, arg_type), topic in zip(indexed, topics[1:]):
+            if arg_type == "address":
+                args[arg_name] = eth_utils.to_checksum_address(topic[12:])
+            else:
+                args[arg_name] = int.from_bytes(topic, "big")
+        log_data = _to_bytes(log["data"])
+        for n, arg_name in enumerate(data):
+            args[arg_name] = int.from_bytes(log_data[n * 32 : (n + 1) * 32], "big")
+        return name, args
+    return None
+
+
+def new_arena_state(token_id):
+    return {
+        "token_id": token_id,
+        "owner": ZERO_ADDRESS,
+        "staked": False,
+        "time_of_stake": 0,
+        "level": 0,
+        "tier": 0,
+        "claimed_arena": 0,
+        "claimed_byte": 0,
+        "last_block": 0,
+    }
+
+
+def apply_event(state, name, args, block_number, timestamp):
+    """Applies one event to the indexed state of its Arena, like Metarenas does.
+
+    Args:
+        state (dict): the Arena state, as returned by `new_arena_state()`.
+
+        name (str): the event name.
+
+        args (dict): the decoded event arguments.
+
+        block_number (int): the block the event was emitted in.
+
+        timestamp (int): the timestamp of that block.
+    """
+    if name == "Transfer":
+        # _beforeTokenTransfer() resets the level
+        state["owner"] = args["to"]
+        state["level"] = 0
+    elif name == "Staked":
+        state["staked"] = True
+        state["time_of_stake"] = timestamp
+    elif name == "Unstaked":
+        state["staked"] = False
+        state["time_of_stake"] = 0
+        state["level"] = args["level"]
+    elif name == "RewardsClaimed":
+        state["claimed_arena"] += args["arenaRewards"]
+        state["claimed_byte"] += args["byteRewards"]
+    elif name == "LevelIncreased":
+        state["level"] += args["levelsIncreased"]
+    elif name == "TierUpgraded":
+        state["tier"] = args["tier"]
+    state["last_block"] = block_number
+
+
+def arena_level(state, now, time_to_level=time_to_level_up):
+    """Level of an indexed Arena at `now`, same as arenaDetails()."""
+    if state["time_of_stake"] == 0:
+        return state["level"]
+    return (now - state["time_of_stake"]) // time_to_level + state["level"]
+
+
+class ArenaIndexer:
+    """Streams Metarenas logs into a SQLite database.
+
+    Indexing resumes from the last synced block, and blocks that are no longer
+    part of the chain are rolled back by comparing the stored block hashes.
+
+    Args:
+        db_path (str): the SQLite database file.
+
+        address (str): the Metarenas proxy address.
+
+        w3 (web3.Web3, optional): the node connection. Defaults to brownie's.
+
+        start_block (int, optional): the first block to index.
+
+        chunk_size (int, optional): blocks requested in one eth_getLogs call.
+
+        confirmations (int, optional): blocks to stay behind the chain head.
+    """
+
+    def __init__(
+        self,
+        db_path,
+        address,
+        w3=None,
+        start_block=0,
+        chunk_size=log_chunk_size,
+        confirmations=0,
+    ):
+        self.w3 = w3 or web3
+        self.address = eth_utils.to_checksum_address(address)
+        self.start_block = start_block
+        self.chunk_size = chunk_size
+        self.confirmations = confirmations
+        self.db = sqlite3.connect(db_path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        self.topics = [
+            eth_utils.to_hex(eth_utils.keccak(text=signature))
+            for signature, _, _ in EVENTS.values()
+        ]
+
+    def close(self):
+        self.db.close()
+
+    @property
+    def last_block(self):
+        row = self.db.execute(
+            "SELECT value FROM meta WHERE key = 'last_block'"
+        ).fetchone()
+        return int(row["value"]) if row else self.start_block - 1
+
+    def _set_last_block(self, block_number):
+        self.db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_block', ?)",
+            (str(block_number),),
+        )
+
+    def _node_block_hash(self, block_number):
+        try:
+            return _to_hex(self.w3.eth.get_block(block_number)["hash"])
+        except Exception:
+            # The block is past the head of the canonical chain
+            return None
+
+    def _find_fork_block(self):
+        """Returns the newest stored block that is still part of the chain."""
+        for row in self.db.execute(
+            "SELECT number, hash FROM blocks ORDER BY number DESC"
+        ).fetchall():
+            if self._node_block_hash(row["number"]) == row["hash"]:
+                return row["number"]
+        return self.start_block - 1
+
+    def rollback(self, block_number):
+        """Removes everything indexed after `block_number` and replays the touched Arenas.
+
+        Returns:
+            [list[int]]: the token IDs whose state was rebuilt.
+        """
+        token_ids = [
+            row["token_id"]
+            for row in self.db.execute(
+                "SELECT DISTINCT token_id FROM events WHERE block_number > ?",
+                (block_number,),
+            )
+        ]
+        with self.db:
+            self.db.execute("DELETE FROM events WHERE block_number > ?", (block_number,))
+            self.db.execute("DELETE FROM blocks WHERE number > ?", (block_number,))
+            for token_id in token_ids:
+                state = new_arena_state(token_id)
+                for row in self.db.execute(
+                    "SELECT events.block_number, name, args, timestamp FROM events "
+                    "JOIN blocks ON blocks.number = events.block_number "
+                    "WHERE token_id = ? ORDER BY events.block_number, log_index",
+                    (token_id,),
+                ).fetchall():
+                    apply_event(
+                        state,
+                        row["name"],
+                        json.loads(row["args"]),
+                        row["block_number"],
+                        row["timestamp"],
+                    )
+                if state["last_block"]:
+                    self._save_arena(state)
+                else:
+                    self.db.execute(
+                        "DELETE FROM arenas WHERE token_id = ?", (token_id,)
+                    )
+            self._set_last_block(block_number)
+        return token_ids
+
+    def _load_arena(self, token_id):
+        row = self.db.execute(
+            "SELECT * FROM arenas WHERE token_id = ?", (token_id,)
+        ).fetchone()
+        if row is None:
+            return new_arena_state(token_id)
+        state = dict(row)
+        state["staked"] = bool(state["staked"])
+        state["claimed_arena"] = int(state["claimed_arena"])
+        state["claimed_byte"] = int(state["claimed_byte"])
+        return state
+
+    def _save_arena(self, state):
+        self.db.execute(
+            "INSERT OR REPLACE INTO arenas (token_id, owner, staked, time_of_stake, "
+            "level, tier, claimed_arena, claimed_byte, last_block) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                state["token_id"],
+                state["owner"],
+                int(state["staked"]),
+                state["time_of_stake"],
+                state["level"],
+                state["tier"],
+                str(state["claimed_arena"]),
+                str(state["claimed_byte"]),
+                state["last_block"],
+            ),
+        )
+
+    def _index_range(self, from_block, to_block):
+        logs = self.w3.eth.get_logs(
+            {
+                "address": self.address,
+                "fromBlock": from_block,
+                "toBlock": to_block,
+                "topics": [self.topics],
+            }
+        )
+        logs = sorted(logs, key=lambda log: (log["blockNumber"], log["logIndex"]))
+        blocks = {}
+        arenas = {}
+        with self.db:
+            for log in logs:
+                decoded = decode_log(log)
+                if decoded is None:
+                    continue
+                name, args = decoded
+                block_number = log["blockNumber"]
+                if block_number not in blocks:
+                    block = self.w3.eth.get_block(block_number)
+                    blocks[block_number] = (_to_hex(block["hash"]), block["timestamp"])
+                token_id = args["tokenId"]
+                if token_id not in arenas:
+                    arenas[token_id] = self._load_arena(token_id)
+                apply_event(
+                    arenas[token_id], name, args, block_number, blocks[block_number][1]
+                )
+                self.db.execute(
+                    "INSERT INTO events (block_number, log_index, tx_hash, name, "
+                    "token_id, args) VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        block_number,
+                        log["logIndex"],
+                        _to_hex(log["transactionHash"]),
+                        name,
+                        token_id,
+                        json.dumps(args),
+                    ),
+                )
+            for state in arenas.values():
+                self._save_arena(state)
+            # Store the last block of the range to detect reorgs on the next sync
+            if to_block not in blocks:
+                block = self.w3.eth.get_block(to_block)
+                blocks[to_block] = (_to_hex(block["hash"]), block["timestamp"])
+            self.db.executemany(
+                "INSERT OR REPLACE INTO blocks (number, hash, timestamp) VALUES (?, ?, ?)",
+                [(number, *block) for number, block in blocks.items()],
+            )
+            self._set_last_block(to_block)
+        return len(logs)
+
+    def sync(self, to_block=None):
+        """Indexes every block from the last synced one up to `to_block`.
+
+        Args:
+            to_block (int, optional): the last block to index. Defaults to the
+            chain head minus `confirmations`.
+
+        Returns:
+            [dict]: the amount of indexed events and of rolled back blocks.
+        """
+        rolled_back = 0
+        last_block = self.last_block
+        if last_block >= self.start_block:
+            stored_hash = self.db.execute(
+                "SELECT hash FROM blocks WHERE number = ?", (last_block,)
+            ).fetchone()
+            if stored_hash is None or self._node_block_hash(last_block) != stored_hash["hash"]:
+                fork_block = self._find_fork_block()
+                rolled_back = last_block - fork_block
+                self.rollback(fork_block)
+                last_block = fork_block
+        if to_block is None:
+            to_block = self.w3.eth.block_number - self.confirmations
+        indexed = 0
+        for from_block in range(last_block + 1, to_block + 1, self.chunk_size):
+            indexed += self._index_range(
+                from_block, min(from_block + self.chunk_size - 1, to_block)
+            )
+        return {"events": indexed, "rolled_back": rolled_back}
+
+    def arena(self, token_id):
+        """Returns the indexed state of an Arena, or None if it has no events."""
+        row = self.db.execute(
+            "SELECT token_id FROM arenas WHERE token_id = ?", (token_id,)
+        ).fetchone()
+        return None if row is None else self._load_arena(token_id)
+
+    def staked_by_owner(self, owner):
+        return [
+            row["token_id"]
+            for row in self.db.execute(
+                "SELECT token_id FROM arenas WHERE owner = ? AND staked = 1 "
+                "ORDER BY token_id",
+                (eth_utils.to_checksum_address(owner),),
+            )
+        ]
+
+    def arenas_with_tier(self, tier):
+        return [
+            row["token_id"]
+            for row in self.db.execute(
+                "SELECT token_id FROM arenas WHERE tier >= ? ORDER BY token_id",
+                (tier,),
+            )
+        ]
+
+
+def main():
+    indexer = ArenaIndexer(database_path, meta_arenas_address)
+    result = indexer.sync()
+    print(
+        f"Indexed {result['events']} events up to block {indexer.last_block}, "
+        f"rolled back {result['rolled_back']} blocks."
+    )
+    staked = indexer.db.execute(
+        "SELECT tier, COUNT(*) AS arenas FROM arenas WHERE staked = 1 GROUP BY tier"
+    ).fetchall()
+    for row in staked:
+        print(f"Tier {row['tier']}: {row['arenas']} staked")
+    indexer.close()
@@ -0,0 +1,254 @@
+from brownie import (
+    Contract,
+    Metarenas,
+    MetarenasLens,
+    ArenasOld,
+    ArenaTokenMock,
+    MetaPasses,
+    ProxyAdmin,
+    TransparentUpgradeableProxy,
+    chain,
+    config,
+    network,
+    web3,
+)
+from scripts.helpful_scripts import (
+    LOCAL_BLOCKCHAIN_ENVIRONMENTS,
+    encode_function_data,
+    get_account,
+    read_arena_rarities,
+    upgrade,
+)
+from scripts.load_rarities import load_rarities
+from scripts.storage_layout import check_layouts, storage_layout
+import eth_utils
+import itertools
+import json
+import os
+
+# Deployed addresses and bytecode hashes, per chain ID
+manifest_path = "deployments.json"
+metadata_path = "metadata.txt"
+# Rarities written by initializeWithConfig(), the rest is loaded afterwards
+rarities_in_initializer = 300
+
+# Empty addresses are deployed from the mocks
+DEPLOYMENTS = {
+    "test": {
+        "old_arenas": "",
+        "passes": "",
+        "arena_token": "",
+        "admin": "",
+        "owner": "",
+        "arena_funding": 100000 * 10**18,
+    },
+    "final_test": {
+        "old_arenas": "0x5cC71f402CB60fcCaEfbCF06FC24b17dE57491c8",
+        "passes": "",
+        "arena_token": "",
+        "admin": "",
+        "owner": "",
+        "arena_funding": 1000000 * 10**18,
+    },
+    "mainnet": {
+        "old_arenas": "0x5726b8D291b69Cf7252785917cDD813e119eBb82",
+        "passes": "0x4867f7ACb9078d2b462442c5ca3DBa01456844B5",
+        "arena_token": "0x0110F74379F0428Bb2362823e134544DE5e79693",
+        # "deployer" stands for the deploying account
+        "admin": "deployer",
+        "owner": "0x6ff7095144c856422c09102Bf0606506Dae6f370",
+        "arena_funding": 0,
+    },
+}
+
+
+def bytecode_hash(container):
+    return eth_utils.to_hex(eth_utils.keccak(hexstr=container.bytecode))
+
+
+def has_code(address):
+    return len(web3.eth.get_code(address)) > 0
+
+
+def load_manifest(path=manifest_path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as manifest:
+        return json.load(manifest)
+
+
+def save_manifest(manifest, path=manifest_path):
+    with open(path, "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def publish_source():
+    """Whether to verify sources, from `verify` of the active network's config.
+
+    Defaults to verifying on every network but the local ones.
+    """
+    active = network.show_active()
+    return config["networks"].get(active, {}).get(
+        "verify", active not in LOCAL_BLOCKCHAIN_ENVIRONMENTS
+    )
+
+
+class DeploymentPipeline:
+    """Brings a Metarenas deployment to the wanted state, skipping what is done.
+
+    Every deployed contract is recorded in the manifest with the hash of the
+    bytecode it was deployed from. A contract whose address has code and whose
+    bytecode did not change is reused, a changed Metarenas implementation is
+    deployed again and the proxy is upgraded to it once its storage layout is
+    checked against the recorded one.
+
+    Args:
+        account (brownie.network.account.Account): the deployer.
+
+        deployment (dict): a value of `DEPLOYMENTS`.
+
+        path (str, optional): the manifest file.
+    """
+
+    def __init__(self, account, deployment, path=manifest_path):
+        self.account = account
+        self.deployment = deployment
+        self.path = path
+        self.manifest = load_manifest(path)
+        self.contracts = self.manifest.setdefault(str(chain.id), {})
+        self.transactions = []
+
+    def _send(self, tx):
+        self.transactions.append(tx)
+        return tx
+
+    def _record(self, name, contract, container):
+        self.contracts[name] = {
+            "address": contract.address,
+            "bytecode_hash": bytecode_hash(container),
+            "block": contract.tx.block_number,
+        }
+        save_manifest(self.manifest, self.path)
+
+    def contract(self, name, container, *args):
+        """Returns the recorded contract, deploying it if it is missing or changed."""
+        recorded = self.contracts.get(name)
+        if (
+            recorded
+            and recorded["bytecode_hash"] == bytecode_hash(container)
+            and has_code(recorded["address"])
+        ):
+            return container.at(recorded["address"])
+        contract = container.deploy(
+            *args, {"from": self.account}, publish_source=publish_source()
+        )
+        self._send(contract.tx)
+        self._record(name, contract, container)
+        return contract
+
+    def external(self, name, container):
+        """Returns the contract at the configured address, or the deployed mock."""
+        address = self.deployment[name]
+        if address:
+            return Contract.from_abi(name, address, container.abi)
+        return self.contract(name, container)
+
+    def initializer_calldata(self, implementation, old_arenas, passes, arena, rarities):
+        admin = self.deployment["admin"]
+        if admin == "deployer":
+            admin = self.account.address
+        start_token_id = rarities[0][0] if rarities else 0
+        return encode_function_data(
+            implementation.initializeWithConfig,
+            old_arenas.address,
+            passes.address,
+            arena.address,
+            admin or "0x0000000000000000000000000000000000000000",
+            start_token_id,
+            bytes(rarity for _, rarity in rarities),
+        )
+
+    def run(self, rarities=()):
+        """Runs every step, the state reached is saved after each deployment.
+
+        Args:
+            rarities (iterable[tuple[int, int]], optional): consecutive
+            (token ID, rarity) pairs, e.g. from `read_arena_rarities()`.
+
+        Returns:
+            [Contract]: the Metarenas proxy.
+        """
+        rarities = iter(rarities)
+        proxy_admin = self.contract("proxy_admin", ProxyAdmin)
+        old_arenas = self.external("old_arenas", ArenasOld)
+        passes = self.external("passes", MetaPasses)
+        arena = self.external("arena_token", ArenaTokenMock)
+        previous = self.contracts.get("implementation")
+        implementation = self.contract("implementation", Metarenas)
+        recorded_implementation = self.contracts["implementation"]
+        if "storage_layout" not in recorded_implementation:
+            recorded_implementation["storage_layout"] = storage_layout("Metarenas")
+            save_manifest(self.manifest, self.path)
+        recorded = self.contracts.get("proxy")
+        if recorded and has_code(recorded["address"]):
+            proxy = TransparentUpgradeableProxy.at(recorded["address"])
+            current = proxy_admin.getProxyImplementation(proxy.address)
+            if current != implementation.address:
+                if previous and "storage_layout" in previous:
+                    check_layouts(
+                        previous["storage_layout"],
+                        recorded_implementation["storage_layout"],
+                    )
+                self._send(
+                    upgrade(self.account, proxy, implementation.address, proxy_admin)
+                )
+        else:
+            # The whole configuration goes with the initializer calldata
+            initial_rarities = list(itertools.islice(rarities, rarities_in_initializer))
+            proxy = TransparentUpgradeableProxy.deploy(
+                implementation.address,
+                proxy_admin.address,
+                self.initializer_calldata(
+                    implementation, old_arenas, passes, arena, initial_rarities
+                ),
+                {"from": self.account},
+                publish_source=publish_source(),
+            )
+            self._send(proxy.tx)
+            self._record("proxy", proxy, TransparentUpgradeableProxy)
+        meta_arenas = Contract.from_abi("Metarenas", proxy.address, Metarenas.abi)
+        lens = self.contract("lens", MetarenasLens)
+        # Only the rarities that differ from the chain are written
+        result = load_rarities(meta_arenas, lens, self.account, rarities)
+        self.transactions += result["transactions"]
+        missing = self.deployment["arena_funding"] - arena.balanceOf(proxy.address)
+        if missing > 0:
+            self._send(
+                arena.transfer(meta_arenas.address, missing, {"from": self.account})
+            )
+        owner = self.deployment["owner"]
+        if owner and meta_arenas.owner() != owner:
+            self._send(meta_arenas.transferOwnership(owner, {"from": self.account}))
+        return meta_arenas
+
+
+def deploy(account, deployment, path=manifest_path, rarities_path=metadata_path):
+    """Runs the pipeline with the rarities of `rarities_path`, if the file exists.
+
+    Returns:
+        [tuple]: the Metarenas proxy and the transactions sent.
+    """
+    rarities = ()
+    if os.path.exists(rarities_path):
+        rarities = read_arena_rarities(rarities_path)
+    pipeline = DeploymentPipeline(account, deployment, path)
+    meta_arenas = pipeline.run(rarities)
+    return meta_arenas, pipeline.transactions
+
+
+def main():
+    account = get_account()
+    meta_arenas, transactions = deploy(account, DEPLOYMENTS["test"])
+    print(f"Meta Arenas address: {meta_arenas.address}")
+    print(f"{len(transactions)} transactions sent, addresses in {manifest_path}")
@@ -0,0 +1,294 @@
+from brownie import (
+    Contract,
+    Metarenas,
+    MetarenasV2,
+    ArenasOld,
+    ArenaTokenMock,
+    MetaPasses,
+    ProxyAdmin,
+    TransparentUpgradeableProxy,
+    accounts,
+    chain,
+)
+from scripts.helpful_scripts import encode_function_data, upgrade
+import csv
+import json
+import os
+
+# Folder the JSON and CSV reports are written to
+report_folder = os.path.join("reports", "gas")
+# Relative gas increase over the baseline reported as a regression
+regression_tolerance = 0.02
+# Saved JSON reports checked by `compare`
+baseline_report_path = os.path.join(report_folder, "MetarenasV2.json")
+candidate_report_path = os.path.join(report_folder, "Metarenas.json")
+
+DEFAULT_SWEEPS = {
+    # Amounts minted in one mintForAddress() call
+    "mint_amount": [1, 3, 10, 50],
+    # Metarenas already staked by the wallet when staking, claiming and unstaking
+    "staked": [1, 10, 50],
+    # Token IDs in one setRarity() or batch staking call
+    "batch_size": [1, 10, 100],
+    # Metarenas owned by the wallet queried with tokensOfOwner()
+    "owned": [1, 10, 50],
+}
+
+CSV_FIELDS = ["implementation", "function", "parameter", "value", "gas", "gas_per_item"]
+
+
+def deploy_stack(implementation_contract, owner):
+    """Deploys a Metarenas proxy initialized with Metarenas, with mock dependencies.
+
+    Any other implementation, e.g. MetarenasV2, is deployed and the fresh proxy
+    is downgraded to it right after the initializer.
+
+    Args:
+        implementation_contract (brownie.network.contract.ContractContainer):
+        the implementation to profile, e.g. `MetarenasV2`.
+
+        owner (brownie.network.account.Account): the deployer.
+
+    Returns:
+        [tuple]: the Metarenas proxy, ArenasOld and ARENA token contracts.
+    """
+    proxy_admin = ProxyAdmin.deploy({"from": owner})
+    arena = ArenaTokenMock.deploy({"from": owner})
+    passes = MetaPasses.deploy({"from": owner})
+    old_arenas = ArenasOld.deploy({"from": owner})
+    implementation = Metarenas.deploy({"from": owner})
+    encoded_initializer_function = encode_function_data(implementation.initialize)
+    proxy = TransparentUpgradeableProxy.deploy(
+        implementation.address,
+        proxy_admin.address,
+        encoded_initializer_function,
+        {"from": owner},
+    )
+    if implementation_contract != Metarenas:
+        # Implementations without initialize() are reached through an upgrade
+        upgrade(owner, proxy, implementation_contract.deploy({"from": owner}), proxy_admin)
+    meta_arenas = Contract.from_abi(
+        "MetaArenas", proxy.address, implementation_contract.abi
+    )
+    meta_arenas.setInterfaces(
+        old_arenas.address, passes.address, arena.address, {"from": owner}
+    )
+    if hasattr(meta_arenas, "completeArenaStorageMigration"):
+        meta_arenas.completeArenaStorageMigration({"from": owner})
+    meta_arenas.setLevelBooster(owner.address, {"from": owner})
+    arena.transfer(meta_arenas.address, 1000000 * 10**18, {"from": owner})
+    meta_arenas.addDistrict({"from": owner})
+    meta_arenas.setPaused(False, {"from": owner})
+    return meta_arenas, old_arenas, arena
+
+
+def profile_implementation(implementation_contract, sweeps=DEFAULT_SWEEPS):
+    """Records the gas used by every Metarenas entry point across the parameter sweeps.
+
+    Args:
+        implementation_contract (brownie.network.contract.ContractContainer):
+        the implementation to profile.
+
+        sweeps (dict, optional): the parameter values, see `DEFAULT_SWEEPS`.
+
+    Returns:
+        [list[dict]]: one row per measurement, with the fields in `CSV_FIELDS`.
+    """
+    owner = accounts[0]
+    users = accounts[1:]
+    meta_arenas, old_arenas, arena = deploy_stack(implementation_contract, owner)
+    rows = []
+    # Next token ID minted by mintForAddress() and mint()
+    next_token_id = [1001]
+
+    def record(function_name, parameter, value, gas, items=1):
+        rows.append(
+            {
+                "implementation": implementation_contract._name,
+                "function": function_name,
+                "parameter": parameter,
+                "value": value,
+                "gas": gas,
+                "gas_per_item": gas // items,
+            }
+        )
+
+    def mint_to(receiver, amount):
+        token_ids = []
+        while amount > 0:
+            batch = min(amount, 50)
+            meta_arenas.setMaxMintAmountPerTx(batch, {"from": owner})
+            meta_arenas.mintForAddress(batch, receiver.address, {"from": owner})
+            token_ids += list(range(next_token_id[0], next_token_id[0] + batch))
+            next_token_id[0] += batch
+            amount -= batch
+        return token_ids
+
+    # Minting
+    for amount in sweeps["mint_amount"]:
+        meta_arenas.setMaxMintAmountPerTx(amount, {"from": owner})
+        tx = meta_arenas.mintForAddress(amount, users[0].address, {"from": owner})
+        next_token_id[0] += amount
+        record("mintForAddress", "amount", amount, tx.gas_used, amount)
+    meta_arenas.setMaxMintAmountPerTx(3, {"from": owner})
+    meta_arenas.setMintingPeriods(0, 0, 0, chain.time() + 86400, {"from": owner})
+    arena.transfer(users[0].address, 1000 * 10**18, {"from": owner})
+    arena.approve(meta_arenas.address, 1000 * 10**18, {"from": users[0]})
+    for amount in range(1, 4):
+        tx = meta_arenas.mint(amount, {"from": users[0]})
+        next_token_id[0] += amount
+        record("mint", "amount", amount, tx.gas_used, amount)
+    # Migration from the old collection
+    old_arenas.approve(meta_arenas.address, 0, {"from": owner})
+    tx = meta_arenas.migrateArena(0, {"from": owner})
+    record("migrateArena", "amount", 1, tx.gas_used)
+    # Rarity
+    for batch_size in sweeps["batch_size"]:
+        token_ids = list(range(1001, 1001 + batch_size))
+        tx = meta_arenas.setRarity(
+            token_ids, [i % 5 for i in token_ids], {"from": owner}
+        )
+        record("setRarity", "batch_size", batch_size, tx.gas_used, batch_size)
+    # Staking, one wallet per amount of staked Metarenas
+    for user, staked in zip(users[1:], sweeps["staked"]):
+        token_ids = mint_to(user, staked)
+        for i in token_ids[:-1]:
+            meta_arenas.stakeArena(i, {"from": user})
+        tx = meta_arenas.stakeArena(token_ids[-1], {"from": user})
+        record("stakeArena", "staked", staked, tx.gas_used)
+        chain.mine(blocks=1, timedelta=86400 * 4)
+        tx = meta_arenas.claimRewards(token_ids[0], {"from": user})
+        record("claimRewards", "staked", staked, tx.gas_used)
+        meta_arenas.increaseLevel(token_ids[0], 10, {"from": owner})
+        tx = meta_arenas.upgradeArenaTier(token_ids[0], {"from": user})
+        record("upgradeArenaTier", "staked", staked, tx.gas_used)
+        # The first staked Metarena is the worst case for a linear search
+        tx = meta_arenas.unstakeArena(token_ids[0], {"from": user})
+        record("unstakeArena", "staked", staked, tx.gas_used)
+        tx = meta_arenas.transferFrom(
+            user.address, owner.address, token_ids[0], {"from": user}
+        )
+        record("transferFrom", "staked", staked, tx.gas_used)
+    # Batched staking, if the implementation has it
+    if hasattr(meta_arenas, "stakeArenas"):
+        user = users[len(sweeps["staked"]) + 1]
+        for batch_size in sweeps["batch_size"]:
+            token_ids = mint_to(user, batch_size)
+            tx = meta_arenas.stakeArenas(token_ids, {"from": user})
+            record("stakeArenas", "batch_size", batch_size, tx.gas_used, batch_size)
+            chain.mine(blocks=1, timedelta=86400)
+            tx = meta_arenas.claimAllRewards(token_ids, {"from": user})
+            record("claimAllRewards", "batch_size", batch_size, tx.gas_used, batch_size)
+            tx = meta_arenas.unstakeArenas(token_ids, {"from": user})
+            record("unstakeArenas", "batch_size", batch_size, tx.gas_used, batch_size)
+    # Views, measured with eth_estimateGas
+    for user, owned in zip(users[len(sweeps["staked"]) + 2 :], sweeps["owned"]):
+        mint_to(user, owned)
+        gas = meta_arenas.tokensOfOwner.estimate_gas(user.address)
+        record("tokensOfOwner", "owned", owned, gas, owned)
+    gas = meta_arenas.arenaDetails.estimate_gas(1001)
+    record("arenaDetails", "amount", 1, gas)
+    gas = meta_arenas.availableRewards.estimate_gas(1001)
+    record("availableRewards", "amount", 1, gas)
+    return rows
+
+
+def write_report(rows, name, folder=report_folder):
+    """Writes the rows to `<folder>/<name>.json` and `<folder>/<name>.csv`.
+
+    Returns:
+        [tuple]: the paths of the JSON and CSV reports.
+    """
+    os.makedirs(folder, exist_ok=True)
+    json_path = os.path.join(folder, f"{name}.json")
+    csv_path = os.path.join(folder, f"{name}.csv")
+    with open(json_path, "w") as json_file:
+        json.dump(rows, json_file, indent=2)
+    with open(csv_path, "w", newline="") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return json_path, csv_path
+
+
+def load_report(path):
+    with open(path) as json_file:
+        return json.load(json_file)
+
+
+def compare_reports(baseline, candidate, tolerance=regression_tolerance):
+    """Compares two reports measurement by measurement.
+
+    Args:
+        baseline (list[dict]): the rows of the reference implementation.
+
+        candidate (list[dict]): the rows of the implementation to check.
+
+        tolerance (float, optional): relative gas increase that is still accepted.
+
+    Returns:
+        [list[dict]]: one entry per measurement found in both reports, with
+        the baseline and candidate gas, the relative change and whether it
+        is a regression.
+    """
+    baseline_gas = {
+        (row["function"], row["parameter"], row["value"]): row["gas"]
+        for row in baseline
+    }
+    comparison = []
+    for row in candidate:
+        key = (row["function"], row["parameter"], row["value"])
+        if key not in baseline_gas:
+            continue
+        before = baseline_gas[key]
+        change = (row["gas"] - before) / before
+        comparison.append(
+            {
+                "function": row["function"],
+                "parameter": row["parameter"],
+                "value": row["value"],
+                "baseline": before,
+                "candidate": row["gas"],
+                "change": change,
+                "regression": change > tolerance,
+            }
+        )
+    return comparison
+
+
+def print_comparison(comparison):
+    for entry in comparison:
+        flag = "REGRESSION" if entry["regression"] else ""
+        print(
+            f"{entry['function']}({entry['parameter']}={entry['value']}): "
+            f"{entry['baseline']} -> {entry['candidate']} gas "
+            f"({entry['change']:+.1%}) {flag}"
+        )
+
+
+def compare(
+    baseline_path=baseline_report_path, candidate_path=candidate_report_path
+):
+    """Compares two saved JSON reports.
+
+    Run it with `brownie run scripts/gas_profile.py compare`, the reports are
+    read from `baseline_report_path` and `candidate_report_path`.
+    """
+    comparison = compare_reports(
+        load_report(baseline_path), load_report(candidate_path)
+    )
+    print_comparison(comparison)
+    return comparison
+
+
+def main():
+    reports = {}
+    for implementation_contract in [MetarenasV2, Metarenas]:
+        reports[implementation_contract._name] = profile_implementation(
+            implementation_contract
+        )
+        json_path, csv_path = write_report(
+            reports[implementation_contract._name], implementation_contract._name
+        )
+        print(f"Wrote {json_path} and {csv_path}")
+    print_comparison(compare_reports(reports["MetarenasV2"], reports["Metarenas"]))
@@ -1,4 +1,5 @@
-from brownie import network, accounts, config
+from brownie import Contract, MetarenasLens, Multicall, network, accounts, config
+from scripts.storage_layout import check_upgrade
 import eth_utils
 import csv
 
@@ -21,6 +22,41 @@ def get_account(number=None):
     return None
 
 
+def get_read_helper(container, address, setting):
+    """Returns the `container` contract at `address`, for batched reads.
+
+    A new one is only deployed on local networks, where it costs nothing.
+    Read-only scripts never send a transaction on a live network.
+
+    Args:
+        container (brownie.network.contract.ContractContainer): e.g. `Multicall`.
+
+        address (str): the deployed contract, empty if there is none.
+
+        setting (str): the name of the script setting holding `address`.
+
+    Raises:
+        RuntimeError: if no address is configured on a live network.
+    """
+    if address:
+        return Contract.from_abi(container._name, address, container.abi)
+    if network.show_active() in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        return container.deploy({"from": get_account()})
+    raise RuntimeError(
+        f"Set {setting} to a deployed {container._name} on {network.show_active()}"
+    )
+
+
+def get_multicall(address):
+    """Returns the Multicall at `address`, see `get_read_helper()`."""
+    return get_read_helper(Multicall, address, "multicall_address")
+
+
+def get_lens(address):
+    """Returns the MetarenasLens at `address`, see `get_read_helper()`."""
+    return get_read_helper(MetarenasLens, address, "lens_address")
+
+
 def encode_function_data(initializer=None, *args):
     """Encodes the function call so we can work with an initializer.
 
@@ -50,8 +86,22 @@ def upgrade(
     newimplementation_address,
     proxy_admin_contract=None,
     initializer=None,
-    *args
+    *args,
+    layouts=None
 ):
+    """Points the proxy to a new implementation, calling `initializer` if given.
+
+    Args:
+        layouts (tuple[str, str], optional): the names of the current and the
+        new implementation contracts, e.g. ("MetarenasV2", "Metarenas"). Their
+        storage layouts are checked before anything is sent.
+
+    Raises:
+        StorageLayoutError: if the new implementation would read stored values
+        at the wrong place.
+    """
+    if layouts:
+        check_upgrade(*layouts)
     transaction = None
     if proxy_admin_contract:
         if initializer:
@@ -77,26 +127,51 @@ def upgrade(
     return transaction
 
 
-def getArenaRarities():
-    with open("metadata.txt", newline="") as csvfile:
-        rows = csv.reader(csvfile, delimiter=",")
-        data = []
-        for row in rows:
-            data.append(row)
+RARITY_NAMES = ["Common", "Uncommon", "Rare", "Epic", "Legendary"]
 
-    arenas_rariy = []
-    for item in data:
-        if item[7] == "Common":
-            arenas_rariy.append(0)
-        if item[7] == "Uncommon":
-            arenas_rariy.append(1)
-        if item[7] == "Rare":
-            arenas_rariy.append(2)
-        if item[7] == "Epic":
-            arenas_rariy.append(3)
-        if item[7] == "Legendary":
-            arenas_rariy.append(4)
+
+def read_arena_rarities(path="metadata.txt", first_token_id=1):
+    """Streams the rarity of every Arena from the metadata file.
+
+    Args:
+        path (str, optional): the metadata CSV, with the rarity name in the 8th column.
+
+        first_token_id (int, optional): the token ID of the first row with a rarity.
+
+    Yields:
+        [tuple]: the token ID and its rarity(0: Common, ..., 4: Legendary).
+        Rows without a known rarity name, like a header, are skipped.
+    """
+    token_id = first_token_id
+    with open(path, newline="") as csvfile:
+        for row in csv.reader(csvfile, delimiter=","):
+            if len(row) > 7 and row[7] in RARITY_NAMES:
+                yield token_id, RARITY_NAMES.index(row[7])
+                token_id += 1
+
+
+def getArenaRarities():
     token_ids = []
-    for i in range(1, 1001):
-        token_ids.append(i)
+    arenas_rariy = []
+    for token_id, rarity in read_arena_rarities():
+        token_ids.append(token_id)
+        arenas_rariy.append(rarity)
     return (token_ids, arenas_rariy)
+
+
+def percentiles(samples):
+    """Median and 95th percentile of latency samples.
+
+    Args:
+        samples (iterable[float]): latencies in seconds.
+
+    Returns:
+        [dict]: `p50` and `p95` in milliseconds, zero without samples.
+    """
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0}
+    ordered = sorted(samples)
+    return {
+        "p50": ordered[len(ordered) // 2] * 1000,
+        "p95": ordered[min(len(ordered) - 1, len(ordered) * 95 // 100)] * 1000,
+    }
@@ -0,0 +1,224 @@
+"""EIP-712 level vouchers signed by the Level Booster.
+
+The game server queues the levels won by every Arena, signs them in batches
+and hands each holder the voucher covering their Arenas. Holders redeem it
+with `stakeArenasWithVoucher()` or `upgradeArenaTierWithVoucher()`, the
+relayer redeems the vouchers nobody used with `redeemLevelVoucher()`.
+"""
+
+from brownie import Contract, Metarenas, accounts, chain, config
+from collections import namedtuple
+import csv
+import eth_abi
+import eth_keys
+import eth_utils
+import json
+import os
+
+meta_arenas_address = "0x86640CC8C305f10BB88Daa970932d2d48de39811"
+# token_id,levels rows written by the game server after a tournament
+boosts_path = "level_boosts.csv"
+vouchers_path = "level_vouchers.json"
+# Level boosts per voucher and seconds a voucher can be redeemed for
+voucher_size = 200
+voucher_validity = 7 * 86400
+# Redeem every voucher from the deployer right away instead of leaving them to holders
+relay_now = False
+
+DOMAIN_NAME = "Metarenas"
+DOMAIN_VERSION = "1"
+EIP712_DOMAIN_TYPE = (
+    "EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)"
+)
+LEVEL_VOUCHER_TYPE = (
+    "LevelVoucher(uint256[] arenaTokenIds,uint256[] levels,"
+    "uint256 nonce,uint256 deadline)"
+)
+
+# Same fields as the LevelVoucher struct, in the same order
+LevelVoucher = namedtuple(
+    "LevelVoucher", ["arena_token_ids", "levels", "nonce", "deadline"]
+)
+
+
+def domain_separator(contract_address, chain_id):
+    return eth_utils.keccak(
+        eth_abi.encode(
+            ["bytes32", "bytes32", "bytes32", "uint256", "address"],
+            [
+                eth_utils.keccak(text=EIP712_DOMAIN_TYPE),
+                eth_utils.keccak(text=DOMAIN_NAME),
+                eth_utils.keccak(text=DOMAIN_VERSION),
+                chain_id,
+                contract_address,
+            ],
+        )
+    )
+
+
+def _hash_array(values):
+    return eth_utils.keccak(b"".join(value.to_bytes(32, "big") for value in values))
+
+
+def voucher_digest(voucher, contract_address, chain_id):
+    """The EIP-712 digest of a voucher, same as levelVoucherDigest()."""
+    struct_hash = eth_utils.keccak(
+        eth_abi.encode(
+            ["bytes32", "bytes32", "bytes32", "uint256", "uint256"],
+            [
+                eth_utils.keccak(text=LEVEL_VOUCHER_TYPE),
+                _hash_array(voucher.arena_token_ids),
+                _hash_array(voucher.levels),
+                voucher.nonce,
+                voucher.deadline,
+            ],
+        )
+    )
+    return eth_utils.keccak(
+        b"\x19\x01" + domain_separator(contract_address, chain_id) + struct_hash
+    )
+
+
+def sign_voucher(voucher, private_key, contract_address, chain_id):
+    """Signs a voucher with the Level Booster's key.
+
+    Returns:
+        [bytes]: the 65 bytes r, s, v signature ECDSA.recover() expects.
+    """
+    key = eth_keys.keys.PrivateKey(eth_utils.to_bytes(hexstr=str(private_key)))
+    signature = key.sign_msg_hash(voucher_digest(voucher, contract_address, chain_id))
+    return (
+        signature.r.to_bytes(32, "big")
+        + signature.s.to_bytes(32, "big")
+        + bytes([signature.v + 27])
+    )
+
+
+class VoucherRelayer:
+    """Local stand-in for the relayer service of the game server.
+
+    Level boosts are queued as tournaments end, `sign()` turns them into
+    vouchers of up to `voucher_size` boosts with consecutive nonces, and
+    `relay()` redeems the vouchers no holder redeemed in time.
+
+    Args:
+        meta_arenas (Contract): the Metarenas proxy.
+
+        private_key (str): the key of the Level Booster.
+
+        first_nonce (int, optional): the nonce of the first voucher, nonces
+        already redeemed on chain are skipped.
+
+        size (int, optional): the most level boosts in one voucher.
+
+        validity (int, optional): seconds a voucher can be redeemed for.
+    """
+
+    def __init__(
+        self,
+        meta_arenas,
+        private_key,
+        first_nonce=0,
+        size=voucher_size,
+        validity=voucher_validity,
+    ):
+        self.meta_arenas = meta_arenas
+        self.private_key = private_key
+        self.next_nonce = first_nonce
+        self.size = size
+        self.validity = validity
+        # token ID -> levels not signed yet
+        self.pending = {}
+        # (voucher, signature) pairs signed and not relayed yet
+        self.signed = []
+
+    def boost(self, token_id, levels):
+        self.pending[token_id] = self.pending.get(token_id, 0) + levels
+
+    def _take_nonce(self):
+        while self.meta_arenas.levelVoucherRedeemed(self.next_nonce):
+            self.next_nonce += 1
+        self.next_nonce += 1
+        return self.next_nonce - 1
+
+    def sign(self, now=None):
+        """Signs every queued boost.
+
+        Returns:
+            [list[tuple[LevelVoucher, bytes]]]: the new vouchers and signatures.
+        """
+        deadline = (now or chain.time()) + self.validity
+        boosts = sorted(self.pending.items())
+        self.pending = {}
+        vouchers = []
+        for start in range(0, len(boosts), self.size):
+            chunk = boosts[start : start + self.size]
+            voucher = LevelVoucher(
+                [token_id for token_id, _ in chunk],
+                [levels for _, levels in chunk],
+                self._take_nonce(),
+                deadline,
+            )
+            signature = sign_voucher(
+                voucher, self.private_key, self.meta_arenas.address, chain.id
+            )
+            vouchers.append((voucher, signature))
+        self.signed += vouchers
+        return vouchers
+
+    def voucher_for(self, token_id):
+        """The signed voucher boosting `token_id`, for its holder to redeem."""
+        for voucher, signature in self.signed:
+            if token_id in voucher.arena_token_ids:
+                return voucher, signature
+        return None
+
+    def relay(self, account):
+        """Redeems the signed vouchers no holder redeemed yet.
+
+        Returns:
+            [list[brownie.network.transaction.TransactionReceipt]]: one
+            transaction per voucher redeemed.
+        """
+        transactions = []
+        for voucher, signature in self.signed:
+            if not self.meta_arenas.levelVoucherRedeemed(voucher.nonce):
+                transactions.append(
+                    self.meta_arenas.redeemLevelVoucher(
+                        voucher, signature, {"from": account}
+                    )
+                )
+        self.signed = []
+        return transactions
+
+
+def read_boosts(path=boosts_path):
+    with open(path) as boosts_file:
+        return [(int(row[0]), int(row[1])) for row in csv.reader(boosts_file) if row]
+
+
+def write_vouchers(vouchers, path=vouchers_path):
+    """Writes every voucher with its signature, keyed by the Arenas it boosts."""
+    with open(path, "w") as vouchers_file:
+        json.dump(
+            {
+                str(token_id): [list(voucher), eth_utils.to_hex(signature)]
+                for voucher, signature in vouchers
+                for token_id in voucher.arena_token_ids
+            },
+            vouchers_file,
+            separators=(",", ":"),
+        )
+
+
+def main():
+    meta_arenas = Contract.from_abi("Metarenas", meta_arenas_address, Metarenas.abi)
+    private_key = os.getenv("LEVEL_BOOSTER_KEY", config["wallets"]["from_key"])
+    relayer = VoucherRelayer(meta_arenas, private_key)
+    for token_id, levels in read_boosts():
+        relayer.boost(token_id, levels)
+    vouchers = relayer.sign()
+    write_vouchers(vouchers)
+    print(f"{len(vouchers)} vouchers written to {vouchers_path}")
+    if relay_now:
+        relayer.relay(accounts.add(config["wallets"]["from_key"]))
@@ -0,0 +1,174 @@
+from brownie import Contract, Metarenas, accounts, config
+from brownie.exceptions import VirtualMachineError
+from scripts.helpful_scripts import get_lens, read_arena_rarities
+import itertools
+
+meta_arenas_address = "0x86640CC8C305f10BB88Daa970932d2d48de39811"
+# A deployed MetarenasLens, only left empty on local networks
+lens_address = ""
+metadata_path = "metadata.txt"
+# Gas budget of one setRarityPacked() transaction
+chunk_gas_limit = 5_000_000
+# Token IDs read from metadata and compared with the chain at a time
+read_window = 500
+# Times a failed chunk is halved and sent again
+max_retries = 3
+
+
+def onchain_rarities(meta_arenas, lens, start_token_id, count):
+    """Reads the stored rarity of `count` consecutive Metarenas with one call
+    to the MetarenasLens `lens`.
+
+    Returns:
+        [list[int]]: the rarities, in token ID order. None for a Metarena
+        whose rarity was never set, which would otherwise read as Common.
+    """
+    details = lens.arenaDetailsRange(meta_arenas, start_token_id, count)[0]
+    return [
+        (packed >> 192) & (2**8 - 1) if (packed >> 202) & 1 else None
+        for packed in details
+    ]
+
+
+def pending_chunks(rarities, stored, chunk_size):
+    """Splits consecutive rarities into the chunks that still have to be written.
+
+    Args:
+        rarities (list[tuple[int, int]]): consecutive (token ID, rarity) pairs.
+
+        stored (list[int]): the rarities stored on-chain for the same token IDs,
+        None where no rarity was set yet.
+
+        chunk_size (int): the maximum amount of rarities in one chunk.
+
+    Returns:
+        [list[tuple[int, bytes]]]: the first token ID and the packed rarities
+        of every chunk. Chunks start and end on a token whose rarity differs
+        from the stored one or was never set, tokens in between are rewritten
+        with the same value.
+    """
+    mismatches = [
+        n for n, ((_, rarity), current) in enumerate(zip(rarities, stored))
+        if rarity != current
+    ]
+    chunks = []
+    while mismatches:
+        first = mismatches[0]
+        in_chunk = [n for n in mismatches if n < first + chunk_size]
+        last = in_chunk[-1]
+        chunks.append(
+            (
+                rarities[first][0],
+                bytes(rarity for _, rarity in rarities[first : last + 1]),
+            )
+        )
+        mismatches = mismatches[len(in_chunk) :]
+    return chunks
+
+
+def estimate_chunk_size(meta_arenas, account, start_token_id, gas_limit=chunk_gas_limit):
+    """Estimates how many rarities fit in `gas_limit`, writing Legendary over Common.
+
+    Returns:
+        [int]: the chunk size, at least 1.
+    """
+    probe = 10
+    gas_one = meta_arenas.setRarityPacked.estimate_gas(
+        start_token_id, bytes([4]), {"from": account}
+    )
+    gas_probe = meta_arenas.setRarityPacked.estimate_gas(
+        start_token_id, bytes([4] * (probe + 1)), {"from": account}
+    )
+    gas_per_rarity = max((gas_probe - gas_one) // probe, 1)
+    # Keep a fifth of the budget for gas estimation errors
+    return max(int((gas_limit * 0.8 - gas_one) // gas_per_rarity) + 1, 1)
+
+
+def send_chunk(meta_arenas, account, start_token_id, packed, retries=max_retries):
+    """Sends one chunk, halving it and retrying when the transaction fails.
+
+    Returns:
+        [list]: the successful transactions.
+    """
+    try:
+        tx = meta_arenas.setRarityPacked(start_token_id, packed, {"from": account})
+        if tx.status == 1:
+            return [tx]
+    except (VirtualMachineError, ValueError) as error:
+        print(f"Chunk at {start_token_id} failed: {error}")
+    if retries == 0 or len(packed) == 1:
+        raise RuntimeError(
+            f"Could not set rarities from token ID {start_token_id}, "
+            "run the loader again to resume"
+        )
+    half = len(packed) // 2
+    return send_chunk(
+        meta_arenas, account, start_token_id, packed[:half], retries - 1
+    ) + send_chunk(
+        meta_arenas, account, start_token_id + half, packed[half:], retries - 1
+    )
+
+
+def load_rarities(
+    meta_arenas,
+    lens,
+    account,
+    rarities,
+    chunk_size=None,
+    window=read_window,
+):
+    """Writes the rarities that differ from the chain in gas bounded chunks.
+
+    The chain is the only progress record: Metarenas whose stored rarity is
+    already right are skipped, so running the loader again after a failed
+    transaction resumes where it stopped.
+
+    Args:
+        meta_arenas (brownie.network.contract.Contract): the Metarenas proxy.
+
+        lens (brownie.network.contract.Contract): a deployed MetarenasLens.
+
+        account (brownie.network.account.Account): the owner or admin.
+
+        rarities (iterable[tuple[int, int]]): consecutive (token ID, rarity)
+        pairs, e.g. from `read_arena_rarities()`.
+
+        chunk_size (int, optional): rarities per transaction. Defaults to an
+        estimate from `chunk_gas_limit`.
+
+        window (int, optional): rarities read and compared with the chain at a time.
+
+    Returns:
+        [dict]: the amount of rarities written and skipped and the transactions sent.
+    """
+    rarities = iter(rarities)
+    result = {"written": 0, "skipped": 0, "transactions": []}
+    while True:
+        batch = list(itertools.islice(rarities, window))
+        if not batch:
+            return result
+        if chunk_size is None:
+            chunk_size = estimate_chunk_size(meta_arenas, account, batch[0][0])
+        stored = onchain_rarities(meta_arenas, lens, batch[0][0], len(batch))
+        chunks = pending_chunks(batch, stored, chunk_size)
+        written = sum(len(packed) for _, packed in chunks)
+        result["written"] += written
+        result["skipped"] += len(batch) - written
+        for start_token_id, packed in chunks:
+            result["transactions"] += send_chunk(
+                meta_arenas, account, start_token_id, packed
+            )
+
+
+def main():
+    owner = accounts.add(config["wallets"]["from_key"])
+    meta_arenas = Contract.from_abi("Metarenas", meta_arenas_address, Metarenas.abi)
+    lens = get_lens(lens_address)
+    result = load_rarities(
+        meta_arenas, lens, owner, read_arena_rarities(metadata_path)
+    )
+    gas_used = sum(tx.gas_used for tx in result["transactions"])
+    print(
+        f"Wrote {result['written']} rarities in {len(result['transactions'])} "
+        f"transactions using {gas_used} gas, {result['skipped']} already set."
+    )
@@ -0,0 +1,149 @@
+"""Load test of the metadata service against a local ganache chain.
+
+Deploys the stack, mints and stakes Arenas, then sends concurrent requests
+for their documents while Arenas keep changing on chain. Popular Arenas are
+requested more often, like marketplaces do with the listed ones.
+"""
+
+from brownie import network, web3
+from scripts.deploy_pipeline import DEPLOYMENTS, deploy
+from scripts.helpful_scripts import LOCAL_BLOCKCHAIN_ENVIRONMENTS, get_account
+from scripts.metadata_service import MetadataService, start_server
+from scripts.rpc_client import RpcClient
+import aiohttp
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+# Arenas minted and staked before the test
+minted_arenas = 500
+staked_arenas = 100
+# Requests sent per round, and at the same time
+requests_per_round = 2000
+concurrency = 50
+# Rounds, with on chain changes and a sync between two rounds
+rounds = 5
+changes_per_round = 10
+
+
+async def send_requests(base_url, token_ids, requests, concurrency, seed=0):
+    """Requests the documents of `token_ids`, the first ones most often.
+
+    Returns:
+        [dict]: seconds taken, requests per second, latencies in ms and the
+        HTTP statuses received.
+    """
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(token_ids))]
+    picks = rng.choices(token_ids, weights=weights, k=requests)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+
+    async def fetch(session, token_id):
+        async with semaphore:
+            started = time.perf_counter()
+            async with session.get(f"{base_url}/{token_id}.json") as response:
+                await response.read()
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(fetch(session, token_id) for token_id in picks))
+    seconds = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "seconds": seconds,
+        "requests_per_second": requests / seconds,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[len(latencies) * 95 // 100] * 1000,
+        "statuses": statuses,
+    }
+
+
+def setup_arenas(meta_arenas, account):
+    """Mints `minted_arenas` Arenas to `account` and stakes some of them."""
+    meta_arenas.addDistrict({"from": account})
+    meta_arenas.setPaused(False, {"from": account})
+    meta_arenas.setMaxMintAmountPerTx(100, {"from": account})
+    token_ids = []
+    for minted in range(0, minted_arenas, 100):
+        tx = meta_arenas.mintForAddress(
+            min(100, minted_arenas - minted), account.address, {"from": account}
+        )
+        token_ids += [event["tokenId"] for event in tx.events["Transfer"]]
+    meta_arenas.setRarity(
+        token_ids, [n % 5 for n in range(minted_arenas)], {"from": account}
+    )
+    meta_arenas.stakeArenas(token_ids[:staked_arenas], {"from": account})
+    return token_ids
+
+
+async def load_test(
+    url,
+    meta_arenas,
+    account,
+    token_ids,
+    rounds=rounds,
+    requests=requests_per_round,
+    seed=0,
+):
+    """Runs the rounds against a service started in this event loop.
+
+    Returns:
+        [list[dict]]: the results of every round, with the service metrics.
+    """
+    rng = random.Random(seed)
+    meta_arenas.setLevelBooster(account.address, {"from": account})
+    async with RpcClient(url) as client:
+        service = MetadataService(client, meta_arenas.address, {})
+        await service.sync()
+        runner = await start_server(service, port=0)
+        host, port = runner.addresses[0][:2]
+        results = []
+        try:
+            for round_number in range(rounds):
+                result = await send_requests(
+                    f"http://{host}:{port}",
+                    token_ids,
+                    requests,
+                    concurrency,
+                    seed + round_number,
+                )
+                result["metrics"] = service.report()
+                results.append(result)
+                for token_id in rng.sample(token_ids, changes_per_round):
+                    meta_arenas.increaseLevel(token_id, 1, {"from": account})
+                result["refreshed"] = await service.sync()
+        finally:
+            await runner.cleanup()
+        return results
+
+
+def main():
+    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        raise RuntimeError("The load test deploys its own contracts, run it on ganache")
+    account = get_account()
+    with tempfile.TemporaryDirectory() as folder:
+        meta_arenas, _ = deploy(
+            account,
+            DEPLOYMENTS["test"],
+            os.path.join(folder, "deployments.json"),
+            os.path.join(folder, "metadata.txt"),
+        )
+    token_ids = setup_arenas(meta_arenas, account)
+    results = asyncio.run(
+        load_test(web3.provider.endpoint_uri, meta_arenas, account, token_ids)
+    )
+    for round_number, result in enumerate(results):
+        metrics = result["metrics"]
+        print(
+            f"Round {round_number + 1}: {result['requests_per_second']:.0f} req/s, "
+            f"p50 {result['p50_ms']:.1f}ms, p95 {result['p95_ms']:.1f}ms, "
+            f"hit rate {metrics['hit_rate']:.1%}, "
+            f"{metrics['rpc']['http_requests']} RPC requests, "
+            f"{result['refreshed']} documents refreshed"
+        )
@@ -0,0 +1,288 @@
+"""Dynamic metadata for Metarenas, served over HTTP.
+
+`GET /<token ID>.json` returns the static metadata of `metadata.txt` with the
+tier, level, rarity and staking state of the Arena read from the chain.
+Documents are cached and only read again when a log touches their Arena,
+or after `document_ttl` seconds since levels grow with time. The Arenas
+touched by the new logs are refreshed in one JSON-RPC batch on every sync.
+`GET /metrics` returns the cache hit rate and the request latencies.
+"""
+
+from aiohttp import web
+from brownie import web3
+from collections import deque
+from scripts.arena_cache import CACHE_EVENTS, LruCache
+from scripts.arena_indexer import decode_log
+from scripts.helpful_scripts import RARITY_NAMES, percentiles
+from scripts.rpc_client import MetarenasReader, RpcClient, RpcError
+import asyncio
+import csv
+import eth_utils
+import json
+import time
+
+meta_arenas_address = "0x86640CC8C305f10BB88Daa970932d2d48de39811"
+# Leave empty to use the node brownie is connected to
+rpc_url = ""
+metadata_path = "metadata.txt"
+host = "127.0.0.1"
+port = 8080
+# Most documents kept in memory
+cache_size = 10000
+# Seconds a document is served before its level is read again
+document_ttl = 300
+# Seconds between two syncs with the chain head
+sync_interval = 5
+# Request latency samples kept for the metrics
+latency_samples = 10000
+
+# Columns of the metadata file used as the top level fields of a document
+DOCUMENT_FIELDS = ["name", "description", "image", "external_url", "animation_url"]
+
+
+def read_base_metadata(path=metadata_path, first_token_id=1):
+    """Reads the static metadata of every Arena from the metadata file.
+
+    Token IDs are counted like `read_arena_rarities()` counts them, the first
+    row without a rarity names the columns.
+
+    Returns:
+        [dict]: token ID to a dict of column name to value.
+    """
+    metadata = {}
+    header = None
+    token_id = first_token_id
+    with open(path, newline="") as csvfile:
+        for row in csv.reader(csvfile, delimiter=","):
+            if len(row) > 7 and row[7] in RARITY_NAMES:
+                columns = header or [f"column_{n}" for n in range(len(row))]
+                metadata[token_id] = dict(zip(columns, row))
+                token_id += 1
+            elif header is None:
+                header = [column.strip() for column in row]
+    return metadata
+
+
+def render_metadata(token_id, base, details):
+    """Merges the static metadata of an Arena with its `ArenaDetails`.
+
+    Static columns other than `DOCUMENT_FIELDS` become attributes, the rarity
+    column is replaced by the rarity read from the chain.
+
+    Returns:
+        [dict]: the ERC721 metadata document.
+    """
+    document = {"name": base.get("name") or f"Metarena #{token_id}"}
+    for field in DOCUMENT_FIELDS[1:]:
+        if base.get(field):
+            document[field] = base[field]
+    attributes = [
+        {"trait_type": column, "value": value}
+        for column, value in base.items()
+        if column not in DOCUMENT_FIELDS and value and value not in RARITY_NAMES
+    ]
+    attributes += [
+        {"trait_type": "Rarity", "value": RARITY_NAMES[details.rarity]},
+        {"trait_type": "Tier", "value": details.tier, "display_type": "number"},
+        {"trait_type": "Level", "value": details.level, "display_type": "number"},
+        {"trait_type": "Staked", "value": "Yes" if details.staked else "No"},
+    ]
+    document["attributes"] = attributes
+    return document
+
+
+class MetadataService:
+    """Serves cached metadata documents read through a `MetarenasReader`.
+
+    Every cached document keeps the block it was read at. `sync()` moves the
+    service to the chain head, drops the documents of the Arenas touched by
+    the logs in between and reads them again together.
+
+    Args:
+        client (RpcClient): an open client.
+
+        address (str): the Metarenas proxy address.
+
+        metadata (dict): token ID to static metadata, from
+        `read_base_metadata()`.
+
+        max_size (int, optional): most documents kept in memory.
+
+        ttl (float, optional): seconds a document is served for.
+    """
+
+    def __init__(
+        self, client, address, metadata, max_size=cache_size, ttl=document_ttl
+    ):
+        self.client = client
+        self.address = eth_utils.to_checksum_address(address)
+        self.reader = MetarenasReader(client, self.address)
+        self.metadata = metadata
+        self.ttl = ttl
+        # token ID -> (block, expiry, JSON body)
+        self.documents = LruCache(max_size)
+        self.stats = {
+            "requests": 0,
+            "hits": 0,
+            "misses": 0,
+            "not_found": 0,
+            "invalidations": 0,
+            "refreshed": 0,
+        }
+        self.latency = deque(maxlen=latency_samples)
+        self.topics = [
+            eth_utils.to_hex(eth_utils.keccak(text=signature))
+            for signature, _, _ in CACHE_EVENTS.values()
+        ]
+
+    @property
+    def block(self):
+        return self.reader.block
+
+    async def sync(self):
+        """Moves to the chain head, refreshing the documents touched on the way.
+
+        A chain rewound below the synced block drops every document.
+
+        Returns:
+            [int]: the amount of documents refreshed.
+        """
+        previous = self.reader.block
+        block = await self.client.block_number()
+        if not isinstance(previous, int) or block < previous:
+            self.documents.clear()
+            self.reader.block = block
+            return 0
+        if block == previous:
+            return 0
+        logs = await self.client.request(
+            "eth_getLogs",
+            [
+                {
+                    "address": self.address,
+                    "fromBlock": hex(previous + 1),
+                    "toBlock": hex(block),
+                    "topics": [self.topics],
+                }
+            ],
+        )
+        touched = set()
+        for log in logs:
+            decoded = decode_log(log, CACHE_EVENTS)
+            if decoded is not None and "tokenId" in decoded[1]:
+                touched.add(decoded[1]["tokenId"])
+        cached = [token_id for token_id in touched if token_id in self.documents]
+        for token_id in touched:
+            self.documents.pop(token_id)
+        self.stats["invalidations"] += len(cached)
+        self.reader.block = block
+        # Concurrent reads go out as one batch request
+        await asyncio.gather(*(self._read(token_id) for token_id in cached))
+        self.stats["refreshed"] += len(cached)
+        return len(cached)
+
+    async def _read(self, token_id):
+        """Reads and caches the document of an Arena at the synced block.
+
+        Raises:
+            RpcError: if the token doesn't exist.
+        """
+        block = self.reader.block
+        details, _ = await asyncio.gather(
+            self.reader.arena_details(token_id), self.reader.owner_of(token_id)
+        )
+        document = render_metadata(
+            token_id, self.metadata.get(token_id, {}), details
+        )
+        body = json.dumps(document, separators=(",", ":")).encode()
+        self.documents.put(token_id, (block, time.monotonic() + self.ttl, body))
+        return body
+
+    async def document(self, token_id):
+        """Returns the JSON document of an Arena, from the cache if still fresh.
+
+        Returns:
+            [bytes]: the document, or None if the token doesn't exist.
+        """
+        cached = self.documents.get(token_id)
+        if cached is not None and cached[1] > time.monotonic():
+            self.stats["hits"] += 1
+            return cached[2]
+        self.stats["misses"] += 1
+        try:
+            return await self._read(token_id)
+        except RpcError:
+            self.stats["not_found"] += 1
+            return None
+
+    async def handle_document(self, request):
+        started = time.perf_counter()
+        self.stats["requests"] += 1
+        name = request.match_info["name"]
+        if not name.endswith(".json") or not name[:-5].isdigit():
+            raise web.HTTPNotFound()
+        body = await self.document(int(name[:-5]))
+        self.latency.append(time.perf_counter() - started)
+        if body is None:
+            raise web.HTTPNotFound()
+        return web.Response(body=body, content_type="application/json")
+
+    async def handle_metrics(self, _):
+        return web.json_response(self.report())
+
+    def report(self):
+        """Returns the hit rate, cache state and request latencies in ms."""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return dict(
+            self.stats,
+            block=self.block,
+            hit_rate=self.stats["hits"] / lookups if lookups else 0.0,
+            cached_documents=len(self.documents),
+            evictions=self.documents.evictions,
+            latency_ms=percentiles(self.latency),
+            rpc=dict(self.client.stats),
+        )
+
+    def application(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        app.router.add_get("/{name}", self.handle_document)
+        return app
+
+    async def sync_forever(self, interval=sync_interval):
+        while True:
+            try:
+                await self.sync()
+            except (RpcError, OSError) as error:
+                print(f"Sync failed, retrying: {error}")
+            await asyncio.sleep(interval)
+
+
+async def start_server(service, host=host, port=port):
+    """Starts serving `service` in the running event loop.
+
+    Returns:
+        [aiohttp.web.AppRunner]: the runner, `cleanup()` it to stop. The
+        bound address is in `runner.addresses`, pass port 0 for any free port.
+    """
+    runner = web.AppRunner(service.application())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def serve(url, address, metadata):
+    async with RpcClient(url) as client:
+        service = MetadataService(client, address, metadata)
+        await service.sync()
+        runner = await start_server(service)
+        print(f"Serving metadata of {address} on http://{host}:{port}/")
+        try:
+            await service.sync_forever()
+        finally:
+            await runner.cleanup()
+
+
+def main():
+    url = rpc_url or web3.provider.endpoint_uri
+    asyncio.run(serve(url, meta_arenas_address, read_base_metadata()))
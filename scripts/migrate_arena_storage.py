@@ -0,0 +1,51 @@
+from brownie import (
+    Contract,
+    Metarenas,
+    accounts,
+    config,
+)
+from scripts.helpful_scripts import get_multicall
+
+meta_arenas_address = "0x86640CC8C305f10BB88Daa970932d2d48de39811"
+# A deployed Multicall, only left empty on local networks
+multicall_address = ""
+# Amount of Arenas migrated in one transaction
+migration_batch_size = 100
+
+
+def arenas_to_migrate(meta_arenas, multicall, token_ids, batch_size=250):
+    """Returns the token IDs that still hold data in the layout used before V3.
+
+    Args:
+        meta_arenas (brownie.network.contract.Contract): the Metarenas proxy,
+        already upgraded to V3.
+
+        multicall (brownie.network.contract.Contract): a deployed Multicall.
+
+        token_ids (list[int]): the token IDs to check.
+
+    Returns:
+        [list[int]]: the token IDs with at least one non zero Arena field.
+    """
+    to_migrate = []
+    for start in range(0, len(token_ids), batch_size):
+        batch = token_ids[start : start + batch_size]
+        calls = [(meta_arenas.address, meta_arenas.arenas.encode_input(i)) for i in batch]
+        _, return_data = multicall.aggregate(calls)
+        for token_id, data in zip(batch, return_data):
+            if any(meta_arenas.arenas.decode_output(data)):
+                to_migrate.append(token_id)
+    return to_migrate
+
+
+def main():
+    owner = accounts.add(config["wallets"]["from_key"])
+    meta_arenas = Contract.from_abi("Metarenas", meta_arenas_address, Metarenas.abi)
+    multicall = get_multicall(multicall_address)
+    to_migrate = arenas_to_migrate(meta_arenas, multicall, list(range(1, 4001)))
+    print(f"{len(to_migrate)} Arenas to migrate")
+    for start in range(0, len(to_migrate), migration_batch_size):
+        meta_arenas.migrateArenaStorage(
+            to_migrate[start : start + migration_batch_size], {"from": owner}
+        )
+    meta_arenas.completeArenaStorageMigration({"from": owner})
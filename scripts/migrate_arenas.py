@@ -0,0 +1,129 @@
+from brownie import ArenasOld, Contract, Metarenas, accounts, config
+from brownie.exceptions import VirtualMachineError
+from scripts.helpful_scripts import get_multicall
+
+meta_arenas_address = "0x86640CC8C305f10BB88Daa970932d2d48de39811"
+old_arenas_address = "0xf759768014D1aF6DDe3964981f1B9F228dc9E72c"
+# A deployed Multicall, only left empty on local networks
+multicall_address = ""
+# Amount of Arenas tried in the first migrateArenas() call
+migration_batch_size = 50
+# Gas budget of one migrateArenas() transaction
+migration_gas_limit = 8_000_000
+
+
+def old_arenas_of(old_arenas, owner, multicall=None, batch_size=500):
+    """Returns the token IDs `owner` holds in the old collection.
+
+    walletOfOwner() starts counting at token ID 1, so token ID 0 is checked
+    separately. It also reverts once a token ID below the last owned one was
+    burned by a migration, in which case every minted token ID is checked
+    with ownerOf(), bundled through `multicall` when given.
+
+    Args:
+        old_arenas (brownie.network.contract.Contract): the old Arenas collection.
+
+        owner (str): the wallet to look up.
+
+        multicall (brownie.network.contract.Contract, optional): a deployed Multicall.
+
+        batch_size (int, optional): ownerOf() calls bundled in one Multicall call.
+
+    Returns:
+        [list[int]]: the owned token IDs, in ascending order.
+    """
+    try:
+        token_ids = list(old_arenas.walletOfOwner(owner))
+    except (VirtualMachineError, ValueError):
+        return scan_old_arenas(old_arenas, owner, multicall, batch_size)
+    try:
+        if old_arenas.ownerOf(0) == owner:
+            token_ids.insert(0, 0)
+    except (VirtualMachineError, ValueError):
+        # Token ID 0 was burned
+        pass
+    return token_ids
+
+
+def scan_old_arenas(old_arenas, owner, multicall=None, batch_size=500):
+    """Checks ownerOf() for every token ID minted in the old collection, skipping burned ones."""
+    minted = old_arenas.totalSupply()
+    token_ids = []
+    if multicall is None:
+        for token_id in range(minted):
+            try:
+                if old_arenas.ownerOf(token_id) == owner:
+                    token_ids.append(token_id)
+            except (VirtualMachineError, ValueError):
+                pass
+        return token_ids
+    block_number = None
+    for start in range(0, minted, batch_size):
+        batch = range(start, min(start + batch_size, minted))
+        calls = [(old_arenas.address, old_arenas.ownerOf.encode_input(i)) for i in batch]
+        block_number, results = multicall.tryAggregate(
+            calls, block_identifier=block_number
+        )
+        for token_id, (success, data) in zip(batch, results):
+            if success and old_arenas.ownerOf.decode_output(data) == owner:
+                token_ids.append(token_id)
+    return token_ids
+
+
+def migration_batches(
+    meta_arenas,
+    account,
+    token_ids,
+    batch_size=migration_batch_size,
+    gas_limit=migration_gas_limit,
+):
+    """Splits token IDs into batches whose migrateArenas() gas estimate fits in `gas_limit`.
+
+    Yields:
+        [list[int]]: the next batch, estimated against the current chain state.
+    """
+    start = 0
+    while start < len(token_ids):
+        batch = token_ids[start : start + batch_size]
+        gas = meta_arenas.migrateArenas.estimate_gas(batch, {"from": account})
+        if gas > gas_limit and batch_size > 1:
+            batch_size //= 2
+            continue
+        yield batch
+        start += len(batch)
+
+
+def migrate_arenas(meta_arenas, old_arenas, account, multicall=None, **kwargs):
+    """Migrates every old Arena of `account` with one approval for all.
+
+    The approval is revoked once every batch went through.
+
+    Returns:
+        [list]: the transactions sent, approvals included.
+    """
+    token_ids = old_arenas_of(old_arenas, account.address, multicall)
+    if not token_ids:
+        return []
+    transactions = []
+    if not old_arenas.isApprovedForAll(account.address, meta_arenas.address):
+        transactions.append(
+            old_arenas.setApprovalForAll(meta_arenas.address, True, {"from": account})
+        )
+    for batch in migration_batches(meta_arenas, account, token_ids, **kwargs):
+        transactions.append(meta_arenas.migrateArenas(batch, {"from": account}))
+    transactions.append(
+        old_arenas.setApprovalForAll(meta_arenas.address, False, {"from": account})
+    )
+    return transactions
+
+
+def main():
+    account = accounts.add(config["wallets"]["from_key"])
+    meta_arenas = Contract.from_abi("Metarenas", meta_arenas_address, Metarenas.abi)
+    old_arenas = Contract.from_abi("ArenasOld", old_arenas_address, ArenasOld.abi)
+    multicall = get_multicall(multicall_address)
+    transactions = migrate_arenas(meta_arenas, old_arenas, account, multicall)
+    print(
+        f"Migrated in {len(transactions)} transactions, "
+        f"{sum(tx.gas_used for tx in transactions)} gas"
+    )
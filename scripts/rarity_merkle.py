@@ -0,0 +1,168 @@
+from brownie import Contract, Metarenas, accounts, config
+from scripts.helpful_scripts import read_arena_rarities
+import eth_utils
+import json
+import struct
+
+meta_arenas_address = "0x86640CC8C305f10BB88Daa970932d2d48de39811"
+metadata_path = "metadata.txt"
+proofs_json_path = "rarity_proofs.json"
+proofs_binary_path = "rarity_proofs.bin"
+
+# Header of the binary file: magic, first token ID, amount of rarities, root
+BINARY_HEADER = struct.Struct(">4sII32s")
+BINARY_MAGIC = b"MRAR"
+
+
+def rarity_leaf(token_id, rarity):
+    """keccak256(bytes.concat(keccak256(abi.encode(tokenId, rarity)))), the leaf
+    Metarenas verifies. Hashing twice keeps a leaf from passing as an inner node.
+    """
+    return eth_utils.keccak(
+        eth_utils.keccak(token_id.to_bytes(32, "big") + rarity.to_bytes(32, "big"))
+    )
+
+
+def hash_pair(a, b):
+    # OpenZeppelin MerkleProof hashes every pair in sorted order
+    return eth_utils.keccak(a + b if a < b else b + a)
+
+
+class RarityMerkleTree:
+    """Merkle tree of Arena rarities, compatible with MerkleProof.verify().
+
+    Args:
+        rarities (iterable[tuple[int, int]]): (token ID, rarity) pairs, e.g.
+        from `read_arena_rarities()`.
+    """
+
+    def __init__(self, rarities):
+        self.rarities = dict(rarities)
+        self.token_ids = list(self.rarities)
+        self.positions = {token_id: n for n, token_id in enumerate(self.token_ids)}
+        self.layers = [
+            [rarity_leaf(token_id, self.rarities[token_id]) for token_id in self.token_ids]
+        ]
+        while len(self.layers[-1]) > 1:
+            layer = self.layers[-1]
+            self.layers.append(
+                [
+                    hash_pair(layer[n], layer[n + 1]) if n + 1 < len(layer) else layer[n]
+                    for n in range(0, len(layer), 2)
+                ]
+            )
+
+    @property
+    def root(self):
+        return self.layers[-1][0]
+
+    def proof(self, token_id):
+        """Returns the sibling hashes from the leaf of `token_id` up to the root."""
+        position = self.positions[token_id]
+        proof = []
+        for layer in self.layers[:-1]:
+            sibling = position ^ 1
+            if sibling < len(layer):
+                proof.append(layer[sibling])
+            position //= 2
+        return proof
+
+    def verify(self, token_id, rarity, proof):
+        computed = rarity_leaf(token_id, rarity)
+        for node in proof:
+            computed = hash_pair(computed, node)
+        return computed == self.root
+
+
+def write_proofs_json(tree, path=proofs_json_path):
+    """Writes the root and the rarity and proof of every token, for the frontend."""
+    with open(path, "w") as proofs_file:
+        json.dump(
+            {
+                "root": eth_utils.to_hex(tree.root),
+                "proofs": {
+                    str(token_id): [
+                        tree.rarities[token_id],
+                        [eth_utils.to_hex(node) for node in tree.proof(token_id)],
+                    ]
+                    for token_id in tree.token_ids
+                },
+            },
+            proofs_file,
+            separators=(",", ":"),
+        )
+
+
+def write_proofs_binary(tree, path=proofs_binary_path):
+    """Writes the tree as its root and one rarity byte per consecutive token ID.
+
+    Every proof is rebuilt from the rarities on load, which keeps the file at
+    one byte per token instead of a proof of log2(supply) hashes per token.
+    """
+    first_token_id = tree.token_ids[0]
+    assert tree.token_ids == list(
+        range(first_token_id, first_token_id + len(tree.token_ids))
+    ), "the binary format needs consecutive token IDs"
+    with open(path, "wb") as proofs_file:
+        proofs_file.write(
+            BINARY_HEADER.pack(
+                BINARY_MAGIC, first_token_id, len(tree.token_ids), tree.root
+            )
+        )
+        proofs_file.write(bytes(tree.rarities[token_id] for token_id in tree.token_ids))
+
+
+def load_proofs_binary(path=proofs_binary_path):
+    """Loads a file written by `write_proofs_binary()` and checks its root.
+
+    Returns:
+        [RarityMerkleTree]: the rebuilt tree.
+    """
+    with open(path, "rb") as proofs_file:
+        magic, first_token_id, count, root = BINARY_HEADER.unpack(
+            proofs_file.read(BINARY_HEADER.size)
+        )
+        assert magic == BINARY_MAGIC, "not a rarity proofs file"
+        rarities = proofs_file.read(count)
+    tree = RarityMerkleTree(
+        (first_token_id + n, rarity) for n, rarity in enumerate(rarities)
+    )
+    assert tree.root == root, "rarities do not match the stored root"
+    return tree
+
+
+def stake_with_proofs(meta_arenas, account, token_ids, tree):
+    """Stakes Metarenas, proving their rarities in the same transaction.
+
+    Returns:
+        [brownie.network.transaction.TransactionReceipt]: the stake transaction.
+    """
+    if len(token_ids) == 1:
+        return meta_arenas.stakeArenaWithProof(
+            token_ids[0],
+            tree.rarities[token_ids[0]],
+            tree.proof(token_ids[0]),
+            {"from": account},
+        )
+    return meta_arenas.stakeArenasWithProofs(
+        token_ids,
+        [tree.rarities[token_id] for token_id in token_ids],
+        [tree.proof(token_id) for token_id in token_ids],
+        {"from": account},
+    )
+
+
+def upgrade_tier_with_proof(meta_arenas, account, token_id, tree):
+    return meta_arenas.upgradeArenaTierWithProof(
+        token_id, tree.rarities[token_id], tree.proof(token_id), {"from": account}
+    )
+
+
+def main():
+    owner = accounts.add(config["wallets"]["from_key"])
+    tree = RarityMerkleTree(read_arena_rarities(metadata_path))
+    write_proofs_json(tree)
+    write_proofs_binary(tree)
+    print(f"Rarity root for {len(tree.token_ids)} Arenas: {eth_utils.to_hex(tree.root)}")
+    meta_arenas = Contract.from_abi("Metarenas", meta_arenas_address, Metarenas.abi)
+    meta_arenas.setRarityMerkleRoot(tree.root, {"from": owner})
@@ -0,0 +1,225 @@
+"""Pure Python reference model of the Metarenas rewards accumulator.
+
+Mirrors the integer arithmetic of `Metarenas`: every rarity and tier
+combination keeps a cumulative rewards index multiplied by 864000, and every
+staked Arena settles against the index delta since its last update. Both
+indexes are divided by 864000 before the difference, MetarenasV2 divides the
+difference instead, see `legacy_rounding`.
+"""
+
+REWARDS_DIVISOR = 864000
+TIME_TO_LEVEL_UP = 259200
+
+LEVELS_TO_UPGRADE = {0: 10, 1: 30, 2: 60, 3: 100}
+
+TIER_MULTIPLIERS = {0: 5, 1: 10, 2: 20, 3: 30}
+RARITY_REWARDS_PER_DAY = {
+    0: 24 * 10**18,
+    1: 36 * 10**18,
+    2: 48 * 10**18,
+    3: 84 * 10**18,
+    4: 120 * 10**18,
+}
+
+
+class RewardsModel:
+    """Tracks the rewards indexes and the staked Arenas of one Metarenas proxy.
+
+    Levels follow the same rules, so the model also answers arenaDetails().
+
+    Args:
+        tier_multipliers (dict, optional): tier to rewards multiplier.
+        Defaults to the values set in `initialize()`.
+
+        rarity_rewards (dict, optional): rarity to rewards per day.
+        Defaults to the values set in `initialize()`.
+
+        levels_to_upgrade (dict, optional): tier to levels needed to upgrade.
+        Defaults to the values set in `initialize()`.
+
+        legacy_rounding (bool, optional): round the rewards since the last
+        update once, like MetarenasV2.
+
+        legacy_can_upgrade (bool, optional): derive `canUpgrade_` of
+        arenaDetails() from the computed level, like MetarenasV2. Metarenas
+        derives it from the stored level.
+    """
+
+    def __init__(
+        self,
+        tier_multipliers=None,
+        rarity_rewards=None,
+        levels_to_upgrade=None,
+        legacy_rounding=False,
+        legacy_can_upgrade=False,
+    ):
+        self.tier_multipliers = dict(tier_multipliers or TIER_MULTIPLIERS)
+        self.rarity_rewards = dict(rarity_rewards or RARITY_REWARDS_PER_DAY)
+        self.levels_to_upgrade = dict(levels_to_upgrade or LEVELS_TO_UPGRADE)
+        self.legacy_rounding = legacy_rounding
+        self.legacy_can_upgrade = legacy_can_upgrade
+        self.reward_tiers = 0
+        # (rarity, tier) -> [index, last_update, origin_rate]
+        self.indexes = {}
+        # token ID -> Arena fields used by the rewards
+        self.arenas = {}
+
+    def rate(self, rarity, tier):
+        return self.tier_multipliers.get(tier, 0) * self.rarity_rewards.get(rarity, 0)
+
+    def current_index(self, rarity, tier, now):
+        index, last_update, _ = self.indexes.get((rarity, tier), (0, 0, 0))
+        return index + (now - last_update) * self.rate(rarity, tier)
+
+    def checkpoint_index(self, rarity, tier, now):
+        index, last_update, origin_rate = self.indexes.get((rarity, tier), (0, 0, 0))
+        rate = self.rate(rarity, tier)
+        if last_update == 0:
+            origin_rate = rate
+        self.indexes[(rarity, tier)] = [
+            index + (now - last_update) * rate,
+            now,
+            origin_rate,
+        ]
+
+    def set_rarity_rewards(self, rarity, rewards, now):
+        for tier in range(max(self.reward_tiers, 4)):
+            self.checkpoint_index(rarity, tier, now)
+        self.rarity_rewards[rarity] = rewards
+
+    def set_tier_multiplier(self, tier, multiplier, now):
+        for rarity in range(5):
+            self.checkpoint_index(rarity, tier, now)
+        self.tier_multipliers[tier] = multiplier
+        self.reward_tiers = max(self.reward_tiers, tier + 1)
+
+    def arena(self, token_id):
+        return self.arenas.setdefault(
+            token_id,
+            {
+                "staked": False,
+                "rarity": 0,
+                "tier": 0,
+                "level": 0,
+                "time_of_stake": 0,
+                "reward_index": 0,
+                "unclaimed_arena": 0,
+                "unclaimed_byte": 0,
+            },
+        )
+
+    def level(self, token_id, now):
+        arena = self.arena(token_id)
+        if arena["time_of_stake"] == 0:
+            return arena["level"]
+        return (now - arena["time_of_stake"]) // TIME_TO_LEVEL_UP + arena["level"]
+
+    def can_upgrade(self, token_id, now):
+        tier = self.arena(token_id)["tier"]
+        return self.level(token_id, now) >= self.levels_to_upgrade.get(tier, 0)
+
+    def details(self, token_id, now):
+        """Same values as arenaDetails()."""
+        arena = self.arena(token_id)
+        if self.legacy_can_upgrade:
+            can_upgrade = self.can_upgrade(token_id, now)
+        else:
+            can_upgrade = arena["level"] >= self.levels_to_upgrade.get(arena["tier"], 0)
+        return (
+            arena["tier"],
+            self.level(token_id, now),
+            arena["rarity"],
+            arena["staked"],
+            can_upgrade,
+            arena["time_of_stake"],
+        )
+
+    def pending(self, token_id, now):
+        arena = self.arena(token_id)
+        if not arena["staked"]:
+            return 0
+        index = self.current_index(arena["rarity"], arena["tier"], now)
+        if self.legacy_rounding:
+            return (index - arena["reward_index"]) // REWARDS_DIVISOR
+        return index // REWARDS_DIVISOR - arena["reward_index"] // REWARDS_DIVISOR
+
+    def available(self, token_id, now, byte_enabled=False):
+        arena = self.arena(token_id)
+        pending = self.pending(token_id, now)
+        byte_rewards = arena["unclaimed_byte"] + pending if byte_enabled else 0
+        return (arena["unclaimed_arena"] + pending, byte_rewards)
+
+    def _checkpoint_arena(self, arena, now):
+        arena["reward_index"] = self.current_index(arena["rarity"], arena["tier"], now)
+
+    def stake(self, token_id, now):
+        arena = self.arena(token_id)
+        arena["staked"] = True
+        arena["time_of_stake"] = now
+        self._checkpoint_arena(arena, now)
+
+    def unstake(self, token_id, now):
+        arena = self.arena(token_id)
+        pending = self.pending(token_id, now)
+        arena["unclaimed_arena"] += pending
+        arena["unclaimed_byte"] += pending
+        arena["level"] = self.level(token_id, now)
+        arena["staked"] = False
+        arena["time_of_stake"] = 0
+        self._checkpoint_arena(arena, now)
+
+    def claim(self, token_id, now, byte_enabled=False):
+        arena = self.arena(token_id)
+        claimed = self.available(token_id, now, byte_enabled)
+        arena["unclaimed_arena"] = 0
+        if byte_enabled:
+            arena["unclaimed_byte"] = 0
+        self._checkpoint_arena(arena, now)
+        return claimed
+
+    def upgrade_tier(self, token_id, now, byte_enabled=False):
+        arena = self.arena(token_id)
+        pending = self.pending(token_id, now)
+        arena["unclaimed_arena"] += pending
+        if byte_enabled:
+            arena["unclaimed_byte"] += pending
+        arena["tier"] += 1
+        self._checkpoint_arena(arena, now)
+
+    def increase_level(self, token_id, levels):
+        self.arena(token_id)["level"] += levels
+
+    def transfer(self, token_id):
+        # _beforeTokenTransfer() resets the level
+        self.arena(token_id)["level"] = 0
+
+    def set_rarity(self, token_id, rarity, now, byte_enabled=False):
+        arena = self.arena(token_id)
+        if arena["staked"]:
+            pending = self.pending(token_id, now)
+            arena["unclaimed_arena"] += pending
+            if byte_enabled:
+                arena["unclaimed_byte"] += pending
+            arena["rarity"] = rarity
+            self._checkpoint_arena(arena, now)
+        else:
+            arena["rarity"] = rarity
+
+
+def piecewise_rewards(rate_schedule, start, end):
+    """Rewards of one Arena staked from `start` to `end`, integrated exactly.
+
+    Args:
+        rate_schedule (list[tuple[int, int]]): (time, rate) pairs sorted by
+        time, each rate in effect from its time until the next one.
+
+    Returns:
+        [int]: the rewards, rounded down once at the end.
+    """
+    total = 0
+    for n, (time, rate) in enumerate(rate_schedule):
+        next_time = rate_schedule[n + 1][0] if n + 1 < len(rate_schedule) else end
+        segment_start, segment_end = max(time, start), min(next_time, end)
+        if segment_end > segment_start:
+            total += (segment_end - segment_start) * rate
+    return total // REWARDS_DIVISOR
@@ -0,0 +1,305 @@
+"""Vectorized simulator of Metarenas rewards, levels and tier upgrades.
+
+Every Arena of the collection is one row of NumPy arrays, and every action
+applies to a selection of rows at once. Rewards use object arrays of Python
+integers, so the floor divisions match the contract to the wei however
+large the rewards indexes grow.
+
+$BYTE rewards are not simulated, they follow $ARENA rewards one to one.
+"""
+
+from scripts.rewards_model import (
+    LEVELS_TO_UPGRADE,
+    RARITY_REWARDS_PER_DAY,
+    REWARDS_DIVISOR,
+    TIER_MULTIPLIERS,
+    TIME_TO_LEVEL_UP,
+)
+import numpy as np
+import time
+
+DAY = 86400
+# Same value as set in initialize()
+ARENA_PRICE_FOR_UPGRADE = 100 * 10**18
+
+# Daily behaviour of the holders in run()
+DEFAULT_BEHAVIOUR = {
+    # Chance an unstaked Arena gets staked
+    "stake_probability": 0.05,
+    # Chance a staked Arena gets unstaked
+    "unstake_probability": 0.005,
+    # Days between two claims of a staked Arena, 0 to never claim
+    "claim_interval": 7,
+    # Chance an Arena with enough levels gets upgraded
+    "upgrade_probability": 0.5,
+    # Highest tier holders upgrade to, tier 4 has no rewards multiplier
+    "max_tier": 3,
+}
+
+# Collection and horizon projected by main()
+simulated_arenas = 1000
+simulated_days = 3 * 365
+# Share of every rarity in the collection, Common to Legendary
+rarity_shares = [0.45, 0.3, 0.15, 0.08, 0.02]
+# Changes to compare against the current config, see ArenaSimulator.__init__()
+proposed_config = {"rarity_rewards": {4: 100 * 10**18}, "time_to_level": 345600}
+
+
+def _object_zeros(shape):
+    return np.full(shape, 0, dtype=object)
+
+
+class ArenaSimulator:
+    """State of a set of Arenas, updated like Metarenas updates it.
+
+    Actions take a selection of rows, either positions or a boolean mask,
+    and apply at the current time. Move the time with `advance()` first.
+
+    Args:
+        rarities (list[int]): the rarity of every simulated Arena.
+
+        start (int): the timestamp the simulation starts at.
+
+        tier_multipliers (dict, optional): tier to rewards multiplier.
+
+        rarity_rewards (dict, optional): rarity to rewards per day.
+
+        levels_to_upgrade (dict, optional): tier to levels needed to upgrade.
+
+        time_to_level (int, optional): seconds staked to gain one level.
+
+        max_tier (int, optional): the highest tier simulated.
+    """
+
+    def __init__(
+        self,
+        rarities,
+        start,
+        tier_multipliers=None,
+        rarity_rewards=None,
+        levels_to_upgrade=None,
+        time_to_level=TIME_TO_LEVEL_UP,
+        max_tier=4,
+    ):
+        n = len(rarities)
+        tiers = max_tier + 1
+        self.max_tier = max_tier
+        self.time_to_level = time_to_level
+        self.now = start
+        self.rarity = np.asarray(rarities, dtype=np.int64)
+        self.tier = np.zeros(n, dtype=np.int64)
+        self.level = np.zeros(n, dtype=np.int64)
+        self.staked = np.zeros(n, dtype=bool)
+        self.time_of_stake = np.zeros(n, dtype=np.int64)
+        self.reward_index = _object_zeros(n)
+        self.unclaimed = _object_zeros(n)
+        self.claimed = _object_zeros(n)
+        self.upgrade_spent = 0
+        multipliers = {**TIER_MULTIPLIERS, **(tier_multipliers or {})}
+        rewards = {**RARITY_REWARDS_PER_DAY, **(rarity_rewards or {})}
+        levels = {**LEVELS_TO_UPGRADE, **(levels_to_upgrade or {})}
+        self.tier_multipliers = np.array(
+            [multipliers.get(tier, 0) for tier in range(tiers)], dtype=object
+        )
+        self.rarity_rewards = np.array(
+            [rewards.get(rarity, 0) for rarity in range(5)], dtype=object
+        )
+        self.levels_to_upgrade = np.array(
+            [levels.get(tier, 0) for tier in range(tiers)], dtype=np.int64
+        )
+        self.rates = np.multiply.outer(self.rarity_rewards, self.tier_multipliers)
+        # Indexes that were never checkpointed grew at their rate since the epoch
+        self.indexes = self.rates * start
+
+    def _rows(self, selection):
+        rows = np.asarray(selection)
+        if rows.dtype == bool:
+            return np.flatnonzero(rows)
+        return rows.astype(np.int64)
+
+    def advance(self, now):
+        """Moves the time to `now`, growing every rewards index."""
+        if now < self.now:
+            raise ValueError("Can't go back in time")
+        self.indexes = self.indexes + self.rates * (now - self.now)
+        self.now = now
+
+    def set_rarity_rewards(self, rarity, rewards):
+        self.rarity_rewards[rarity] = rewards
+        self.rates = np.multiply.outer(self.rarity_rewards, self.tier_multipliers)
+
+    def set_tier_multiplier(self, tier, multiplier):
+        self.tier_multipliers[tier] = multiplier
+        self.rates = np.multiply.outer(self.rarity_rewards, self.tier_multipliers)
+
+    def current_index(self, rows):
+        return self.indexes[self.rarity[rows], self.tier[rows]]
+
+    def levels(self, rows=slice(None)):
+        """Levels at the current time, same as _arenaLevel()."""
+        time_of_stake = self.time_of_stake[rows]
+        return np.where(
+            time_of_stake == 0,
+            self.level[rows],
+            (self.now - time_of_stake) // self.time_to_level + self.level[rows],
+        )
+
+    def pending(self, rows=slice(None)):
+        """Rewards since the last update, same as _pendingRewards()."""
+        rows = np.arange(len(self.rarity))[rows]
+        pending = (
+            self.current_index(rows) // REWARDS_DIVISOR
+            - self.reward_index[rows] // REWARDS_DIVISOR
+        )
+        pending[~self.staked[rows]] = 0
+        return pending
+
+    def available_rewards(self, rows=slice(None)):
+        """$ARENA rewards available to claim, same as availableRewards()."""
+        return self.unclaimed[rows] + self.pending(rows)
+
+    def can_upgrade(self, rows=slice(None)):
+        return self.levels(rows) >= self.levels_to_upgrade[self.tier[rows]]
+
+    def _checkpoint(self, rows):
+        self.reward_index[rows] = self.current_index(rows)
+
+    def stake(self, selection):
+        rows = self._rows(selection)
+        self.staked[rows] = True
+        self.time_of_stake[rows] = self.now
+        self._checkpoint(rows)
+
+    def unstake(self, selection):
+        rows = self._rows(selection)
+        self.unclaimed[rows] += self.pending(rows)
+        self.level[rows] = self.levels(rows)
+        self.staked[rows] = False
+        self.time_of_stake[rows] = 0
+        self._checkpoint(rows)
+
+    def claim(self, selection):
+        """Claims the rewards of the selected Arenas.
+
+        Returns:
+            [int]: the $ARENA rewards claimed.
+        """
+        rows = self._rows(selection)
+        amounts = self.available_rewards(rows)
+        self.claimed[rows] += amounts
+        self.unclaimed[rows] = 0
+        self._checkpoint(rows)
+        return int(amounts.sum()) if len(rows) else 0
+
+    def upgrade(self, selection):
+        """Upgrades the tier of the selected Arenas, paying for the upgrades.
+
+        Raises:
+            ValueError: if an Arena doesn't have the levels to upgrade.
+        """
+        rows = self._rows(selection)
+        if not self.can_upgrade(rows).all():
+            raise ValueError("Not high enough level to upgrade")
+        self.upgrade_spent += int(self.tier[rows].sum()) * ARENA_PRICE_FOR_UPGRADE
+        self.unclaimed[rows] += self.pending(rows)
+        self.tier[rows] += 1
+        self._checkpoint(rows)
+
+    def set_rarity(self, selection, rarity):
+        rows = self._rows(selection)
+        staked = rows[self.staked[rows]]
+        self.unclaimed[staked] += self.pending(staked)
+        self.rarity[rows] = rarity
+        self._checkpoint(staked)
+
+    def increase_level(self, selection, levels):
+        self.level[self._rows(selection)] += levels
+
+    def transfer(self, selection):
+        """Resets the level of the selected Arenas, like a transfer does."""
+        self.level[self._rows(selection)] = 0
+
+    def run(self, days, behaviour=None, seed=0, schedule=None):
+        """Simulates `days` days of holders following `behaviour`.
+
+        Every day the time moves forward by one day, scheduled config
+        changes apply, then upgrades, claims, unstakes and stakes happen, in
+        that order. Claims are spread evenly over the claim interval.
+
+        Args:
+            days (int): the amount of days to simulate.
+
+            behaviour (dict, optional): overrides of `DEFAULT_BEHAVIOUR`.
+
+            seed (int, optional): the seed of the holders' random choices.
+
+            schedule (dict, optional): day to a list of (method, args) pairs,
+            e.g. {30: [("set_rarity_rewards", (4, 100 * 10**18))]}.
+
+        Returns:
+            [dict]: one array per metric with one value per day.
+        """
+        behaviour = dict(DEFAULT_BEHAVIOUR, **(behaviour or {}))
+        schedule = schedule or {}
+        rng = np.random.default_rng(seed)
+        n = len(self.rarity)
+        claim_interval = behaviour["claim_interval"]
+        claim_offsets = np.arange(n) % claim_interval if claim_interval else None
+        history = {
+            "day": [],
+            "staked": [],
+            "emitted": [],
+            "liability": [],
+            "upgrade_spent": [],
+            "tiers": [],
+        }
+        for day in range(1, days + 1):
+            self.advance(self.now + DAY)
+            for method, args in schedule.get(day, []):
+                getattr(self, method)(*args)
+            upgrades = (
+                self.can_upgrade()
+                & (self.tier < min(behaviour["max_tier"], self.max_tier))
+                & (rng.random(n) < behaviour["upgrade_probability"])
+            )
+            self.upgrade(upgrades)
+            emitted = 0
+            if claim_interval:
+                claims = self.staked & (claim_offsets == day % claim_interval)
+                emitted = self.claim(claims)
+            unstakes = self.staked & (rng.random(n) < behaviour["unstake_probability"])
+            stakes = ~self.staked & (rng.random(n) < behaviour["stake_probability"])
+            self.unstake(unstakes)
+            self.stake(stakes)
+            history["day"].append(day)
+            history["staked"].append(int(self.staked.sum()))
+            history["emitted"].append(emitted)
+            history["liability"].append(int(self.available_rewards().sum()))
+            history["upgrade_spent"].append(self.upgrade_spent)
+            history["tiers"].append(np.bincount(self.tier, minlength=self.max_tier + 1))
+        return {
+            metric: np.array(values, dtype=object if metric != "tiers" else np.int64)
+            for metric, values in history.items()
+        }
+
+
+def random_rarities(n, shares=rarity_shares, seed=0):
+    """Draws `n` rarities with the given share of every rarity."""
+    return np.random.default_rng(seed).choice(len(shares), size=n, p=shares)
+
+
+def main():
+    rarities = random_rarities(simulated_arenas)
+    for name, config in [("Current", {}), ("Proposed", proposed_config)]:
+        started = time.perf_counter()
+        simulator = ArenaSimulator(rarities, 0, **config)
+        history = simulator.run(simulated_days)
+        seconds = time.perf_counter() - started
+        print(f"{name} config, simulated in {seconds:.2f}s:")
+        for year in range(0, simulated_days, 365):
+            emitted = sum(history["emitted"][year : year + 365])
+            print(f"  Year {year // 365 + 1}: {emitted / 10**18:,.0f} $ARENA claimed")
+        print(
+            f"  Unclaimed at the end: {history['liability'][-1] / 10**18:,.0f} "
+            f"$ARENA, tiers: {history['tiers'][-1].tolist()}"
+        )
@@ -0,0 +1,367 @@
+from brownie import web3
+from collections import namedtuple
+import aiohttp
+import asyncio
+import eth_abi
+import eth_utils
+import itertools
+import random
+import time
+
+meta_arenas_address = "0x86640CC8C305f10BB88Daa970932d2d48de39811"
+# Leave empty to use the node brownie is connected to
+rpc_url = ""
+# Most HTTP requests waiting for a response at the same time
+max_in_flight = 8
+# Most JSON-RPC calls sent in one batch request
+rpc_batch_size = 100
+# Seconds a call waits for others to fill its batch
+rpc_batch_wait = 0.002
+# Attempts for a batch before giving up
+rpc_retries = 5
+# Seconds waited before the first retry, doubled on every attempt
+rpc_backoff = 0.25
+
+ArenaDetails = namedtuple(
+    "ArenaDetails",
+    ["tier", "level", "rarity", "staked", "can_upgrade", "time_of_stake"],
+)
+Rewards = namedtuple("Rewards", ["arena", "byte"])
+
+# Function name to signature and return types
+FUNCTIONS = {
+    "arenaDetails": (
+        "arenaDetails(uint256)",
+        ["uint256", "uint256", "uint256", "bool", "bool", "uint256"],
+    ),
+    "availableRewards": ("availableRewards(uint256)", ["uint256", "uint256"]),
+    "ownerOf": ("ownerOf(uint256)", ["address"]),
+    "userStakedArenas": ("userStakedArenas(address)", ["uint256[]"]),
+}
+
+# HTTP statuses worth retrying, anything else is returned to the caller
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RpcError(Exception):
+    """A JSON-RPC error returned by the node, e.g. a reverted eth_call."""
+
+    def __init__(self, error):
+        super().__init__(error.get("message", error))
+        self.code = error.get("code")
+        self.data = error.get("data")
+
+
+def encode_call(name, *args):
+    """ABI encodes a call to one of `FUNCTIONS`.
+
+    Returns:
+        [str]: the hex call data.
+    """
+    signature, _ = FUNCTIONS[name]
+    types = signature[signature.index("(") + 1 : -1].split(",")
+    selector = eth_utils.function_signature_to_4byte_selector(signature)
+    return eth_utils.to_hex(selector + eth_abi.encode(types, list(args)))
+
+
+def decode_result(name, data):
+    """ABI decodes the return data of one of `FUNCTIONS`."""
+    _, types = FUNCTIONS[name]
+    return eth_abi.decode(types, eth_utils.to_bytes(hexstr=data))
+
+
+class RpcClient:
+    """Asynchronous JSON-RPC client for read heavy scripts.
+
+    Requests made while a batch is filling up are sent together as one
+    JSON-RPC batch over a pooled HTTP session. Identical eth_calls pinned to
+    the same block share one request, and so do identical calls still
+    waiting for a response.
+
+    Use it as an async context manager:
+
+        async with RpcClient(url) as client:
+            block = await client.block_number()
+
+    Args:
+        url (str): the node's HTTP endpoint.
+
+        max_in_flight (int, optional): most HTTP requests sent at the same time.
+
+        batch_size (int, optional): most calls sent in one batch request.
+
+        batch_wait (float, optional): seconds a call waits for its batch to fill.
+
+        retries (int, optional): attempts for a batch before raising.
+
+        backoff (float, optional): seconds before the first retry, doubled
+        on every attempt.
+
+        timeout (float, optional): seconds before an HTTP request times out.
+    """
+
+    def __init__(
+        self,
+        url,
+        max_in_flight=max_in_flight,
+        batch_size=rpc_batch_size,
+        batch_wait=rpc_batch_wait,
+        retries=rpc_retries,
+        backoff=rpc_backoff,
+        timeout=30,
+    ):
+        self.url = url
+        self.max_in_flight = max_in_flight
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.stats = {"calls": 0, "coalesced": 0, "http_requests": 0, "retries": 0}
+        self._ids = itertools.count()
+        self._session = None
+        self._semaphore = None
+        self._pending = []
+        self._flush_handle = None
+        self._tasks = set()
+        self._in_flight = {}
+        self._block = None
+        self._block_reads = {}
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_in_flight),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._session.close()
+
+    async def request(self, method, params):
+        """Queues one JSON-RPC request and waits for its result.
+
+        Raises:
+            RpcError: if the node answered with an error.
+        """
+        future = asyncio.get_running_loop().create_future()
+        request = {
+            "jsonrpc": "2.0",
+            "id": next(self._ids),
+            "method": method,
+            "params": params,
+        }
+        self._pending.append((request, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self.batch_wait, self._flush
+            )
+        return await future
+
+    async def block_number(self):
+        return int(await self.request("eth_blockNumber", []), 16)
+
+    async def call(self, to, data, block="latest"):
+        """Makes an eth_call, sharing the request with identical calls.
+
+        Args:
+            to (str): the called contract.
+
+            data (str): the hex call data.
+
+            block (int | str, optional): the block to read at. Results of
+            calls pinned to a block number are kept until a call is pinned
+            to another block.
+
+        Returns:
+            [str]: the hex return data.
+        """
+        self.stats["calls"] += 1
+        key = (to.lower(), data, block)
+        if isinstance(block, int):
+            if block != self._block:
+                self._block = block
+                self._block_reads = {}
+            reads = self._block_reads
+            block = hex(block)
+        else:
+            reads = self._in_flight
+        if key in reads:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(reads[key])
+        future = asyncio.ensure_future(
+            self.request("eth_call", [{"to": to, "data": data}, block])
+        )
+        reads[key] = future
+
+        def forget(done):
+            # Failed reads are retried by the next caller
+            if reads is self._in_flight or done.cancelled() or done.exception():
+                reads.pop(key, None)
+
+        future.add_done_callback(forget)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        while self._pending:
+            batch = self._pending[: self.batch_size]
+            self._pending = self._pending[self.batch_size :]
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch):
+        try:
+            responses = await self._post([request for request, _ in batch])
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        if isinstance(responses, dict):
+            # Whole batch rejected, e.g. batches are not supported
+            responses = [dict(responses, id=request["id"]) for request, _ in batch]
+        by_id = {response.get("id"): response for response in responses}
+        for request, future in batch:
+            if future.done():
+                continue
+            response = by_id.get(request["id"])
+            if response is None:
+                future.set_exception(RpcError({"message": "Missing response"}))
+            elif "error" in response:
+                future.set_exception(RpcError(response["error"]))
+            else:
+                future.set_result(response["result"])
+
+    async def _post(self, payload):
+        async with self._semaphore:
+            for attempt in range(self.retries):
+                if attempt:
+                    self.stats["retries"] += 1
+                    delay = self.backoff * 2 ** (attempt - 1)
+                    await asyncio.sleep(delay + random.uniform(0, delay))
+                self.stats["http_requests"] += 1
+                try:
+                    async with self._session.post(self.url, json=payload) as response:
+                        if response.status in RETRY_STATUSES:
+                            continue
+                        response.raise_for_status()
+                        return await response.json(content_type=None)
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    if attempt == self.retries - 1:
+                        raise
+            raise RpcError({"message": f"No response after {self.retries} attempts"})
+
+
+class MetarenasReader:
+    """Decoded Metarenas reads through an `RpcClient`.
+
+    Args:
+        client (RpcClient): an open client.
+
+        address (str): the Metarenas proxy address.
+
+        block (int | str, optional): the block every read is pinned to.
+    """
+
+    def __init__(self, client, address, block="latest"):
+        self.client = client
+        self.address = address
+        self.block = block
+
+    async def pin_block(self):
+        """Pins every following read to the current block."""
+        self.block = await self.client.block_number()
+        return self.block
+
+    async def _read(self, name, *args):
+        data = await self.client.call(
+            self.address, encode_call(name, *args), self.block
+        )
+        return decode_result(name, data)
+
+    async def arena_details(self, token_id):
+        """Returns the `ArenaDetails` of a Metarena."""
+        return ArenaDetails(*await self._read("arenaDetails", token_id))
+
+    async def available_rewards(self, token_id):
+        """Returns the `Rewards` available to claim for a Metarena."""
+        return Rewards(*await self._read("availableRewards", token_id))
+
+    async def owner_of(self, token_id):
+        """Returns the checksummed owner of a Metarena.
+
+        Raises:
+            RpcError: if the token doesn't exist.
+        """
+        (owner,) = await self._read("ownerOf", token_id)
+        return eth_utils.to_checksum_address(owner)
+
+    async def user_staked_arenas(self, user):
+        """Returns the token IDs staked by `user`."""
+        (token_ids,) = await self._read("userStakedArenas", user)
+        return list(token_ids)
+
+    async def many(self, method, args):
+        """Runs one of the helpers for every item of `args` concurrently.
+
+        Returns:
+            [list]: the results, in the order of `args`.
+        """
+        helper = getattr(self, method)
+        return await asyncio.gather(*(helper(arg) for arg in args))
+
+
+async def benchmark_reads(url, address, token_ids, **kwargs):
+    """Times reading arenaDetails() of `token_ids` one at a time, then concurrently.
+
+    The sequential run waits for every response before sending the next
+    request, like a loop of brownie calls. Both runs are pinned to the same
+    block and must return the same details.
+
+    Returns:
+        [dict]: seconds and HTTP requests of both runs, and the details read.
+    """
+    results = {}
+    async with RpcClient(url, max_in_flight=1, batch_size=1, batch_wait=0) as client:
+        reader = MetarenasReader(client, address)
+        block = await reader.pin_block()
+        started = time.perf_counter()
+        sequential = [await reader.arena_details(token_id) for token_id in token_ids]
+        results["sequential_seconds"] = time.perf_counter() - started
+        results["sequential_requests"] = client.stats["http_requests"] - 1
+    async with RpcClient(url, **kwargs) as client:
+        reader = MetarenasReader(client, address, block)
+        started = time.perf_counter()
+        concurrent = await reader.many("arena_details", token_ids)
+        results["concurrent_seconds"] = time.perf_counter() - started
+        results["concurrent_requests"] = client.stats["http_requests"]
+    if sequential != concurrent:
+        raise RuntimeError("Sequential and concurrent reads differ")
+    results["block"] = block
+    results["details"] = concurrent
+    return results
+
+
+def main():
+    url = rpc_url or web3.provider.endpoint_uri
+    results = asyncio.run(
+        benchmark_reads(url, meta_arenas_address, list(range(1, 1001)))
+    )
+    print(
+        f"Sequential: {results['sequential_seconds']:.2f}s in "
+        f"{results['sequential_requests']} requests"
+    )
+    print(
+        f"Concurrent: {results['concurrent_seconds']:.2f}s in "
+        f"{results['concurrent_requests']} requests"
+    )
@@ -0,0 +1,354 @@
+"""Point-in-time snapshots of every Metarena, stored column by column.
+
+Every column is read pinned to the same block, `arenaDetailsRange()` of
+`MetarenasLens` a slice of token IDs at a time and the unclaimed rewards
+through `Multicall`.
+Snapshots are written as one Arrow IPC file when pyarrow is installed, or
+as a folder of `.npy` files otherwise. Both can be memory-mapped, so diffs
+between two snapshots only touch the columns they need.
+
+$BYTE rewards are not exported, they follow $ARENA rewards one to one.
+"""
+
+from brownie import Contract, Metarenas, web3
+from collections import namedtuple
+from scripts.arena_cache import ARENA_FIELDS
+from scripts.arena_indexer import EVENTS, decode_log
+from scripts.helpful_scripts import RARITY_NAMES, get_lens, get_multicall
+import eth_utils
+import json
+import numpy as np
+import os
+import time
+
+meta_arenas_address = "0x86640CC8C305f10BB88Daa970932d2d48de39811"
+# A deployed Multicall and MetarenasLens, only left empty on local networks
+multicall_address = ""
+lens_address = ""
+# Leave as None to snapshot the latest block
+snapshot_block = None
+snapshots_folder = "snapshots"
+# Token IDs per arenaDetailsRange() call, and arenaInfo() calls per Multicall
+details_batch_size = 500
+info_batch_size = 250
+
+# Token IDs of the legacy collection, migrated with the same ID
+LEGACY_SUPPLY = 1000
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+# Rewards are uint256 on chain, stored as two uint64 columns
+REWARD_COLUMNS = ["unclaimed_arena", "pending_arena"]
+COLUMN_TYPES = {
+    "token_id": np.uint32,
+    "owner": "S20",
+    "tier": np.uint16,
+    "level": np.uint32,
+    "rarity": np.uint8,
+    "staked": np.bool_,
+    "time_of_stake": np.uint64,
+}
+for _column in REWARD_COLUMNS:
+    COLUMN_TYPES[f"{_column}_hi"] = np.uint64
+    COLUMN_TYPES[f"{_column}_lo"] = np.uint64
+METADATA_FILE = "snapshot.json"
+
+# A block number and a dict of column name to array, one row per Arena
+Snapshot = namedtuple("Snapshot", ["block", "columns"])
+
+
+def _unpack_details(packed):
+    return {
+        "time_of_stake": packed & (2**64 - 1),
+        "level": (packed >> 64) & (2**64 - 1),
+        "tier": (packed >> 128) & (2**64 - 1),
+        "rarity": (packed >> 192) & (2**8 - 1),
+        "staked": bool((packed >> 200) & 1),
+    }
+
+
+def _token_id_slices(token_ids, batch_size):
+    """Slices `token_ids`, or every token ID from 1 if None, the caller stops."""
+    if token_ids is not None:
+        for start in range(0, len(token_ids), batch_size):
+            yield token_ids[start : start + batch_size]
+        return
+    start = 1
+    while True:
+        yield list(range(start, start + batch_size))
+        start += batch_size
+
+
+def _read_unclaimed(meta_arenas, multicall, token_ids, block, batch_size):
+    unclaimed = []
+    field = ARENA_FIELDS.index("unclaimed_arena")
+    for start in range(0, len(token_ids), batch_size):
+        calls = [
+            (meta_arenas.address, meta_arenas.arenaInfo.encode_input(token_id))
+            for token_id in token_ids[start : start + batch_size]
+        ]
+        _, return_data = multicall.aggregate(calls, block_identifier=block)
+        for data in return_data:
+            unclaimed.append(meta_arenas.arenaInfo.decode_output(data)[field])
+    return unclaimed
+
+
+def export_snapshot(
+    meta_arenas,
+    lens,
+    multicall,
+    block=None,
+    token_ids=None,
+    details_batch=details_batch_size,
+    info_batch=info_batch_size,
+):
+    """Reads the state of every Arena at `block`.
+
+    Args:
+        meta_arenas (brownie.network.contract.Contract): the Metarenas proxy.
+
+        lens (brownie.network.contract.Contract): a deployed MetarenasLens.
+
+        multicall (brownie.network.contract.Contract): a deployed Multicall.
+
+        block (int, optional): the block to read at. Defaults to None, the
+        latest block.
+
+        token_ids (list[int], optional): the token IDs to read. Defaults to
+        None, which reads the legacy IDs then new slices until a slice has
+        no minted Arena.
+
+        details_batch (int, optional): token IDs per arenaDetailsRange() call.
+
+        info_batch (int, optional): arenaInfo() calls per Multicall.
+
+    Returns:
+        [Snapshot]: one row per existing Arena, ordered by token ID.
+    """
+    if block is None:
+        block = web3.eth.block_number
+    rows = []
+    for chunk in _token_id_slices(token_ids, details_batch):
+        if token_ids is None:
+            details = lens.arenaDetailsRange(
+                meta_arenas, chunk[0], len(chunk), block_identifier=block
+            )
+        else:
+            details = lens.arenaDetailsBatch(
+                meta_arenas, chunk, block_identifier=block
+            )
+        packed_details, rewards_arena, _, owners = details
+        minted = 0
+        for token_id, packed, available, owner in zip(
+            chunk, packed_details, rewards_arena, owners
+        ):
+            if owner == ZERO_ADDRESS:
+                continue
+            minted += 1
+            row = _unpack_details(packed)
+            row.update(token_id=token_id, owner=owner, available=available)
+            rows.append(row)
+        if token_ids is None and minted == 0 and chunk[0] > LEGACY_SUPPLY:
+            break
+    rows.sort(key=lambda row: row["token_id"])
+    unclaimed = _read_unclaimed(
+        meta_arenas, multicall, [row["token_id"] for row in rows], block, info_batch
+    )
+    for row, unclaimed_arena in zip(rows, unclaimed):
+        row["unclaimed_arena"] = unclaimed_arena
+        row["pending_arena"] = row["available"] - unclaimed_arena
+        row["owner"] = eth_utils.to_bytes(hexstr=row["owner"])
+    columns = {}
+    for name, dtype in COLUMN_TYPES.items():
+        if name[:-3] in REWARD_COLUMNS:
+            shift = 64 if name.endswith("_hi") else 0
+            values = [(row[name[:-3]] >> shift) & (2**64 - 1) for row in rows]
+        else:
+            values = [row[name] for row in rows]
+        columns[name] = np.array(values, dtype=dtype)
+    return Snapshot(block, columns)
+
+
+def rewards(snapshot, name):
+    """The exact values of a rewards column, as an object array of ints."""
+    hi = snapshot.columns[f"{name}_hi"].astype(object)
+    lo = snapshot.columns[f"{name}_lo"].astype(object)
+    return (hi << 64) + lo
+
+
+def owner_addresses(snapshot):
+    """The owners column as checksum addresses.
+
+    NumPy drops the trailing zero bytes of an "S20" value when reading it.
+    """
+    return [
+        eth_utils.to_checksum_address(owner.ljust(20, b"\0"))
+        for owner in snapshot.columns["owner"]
+    ]
+
+
+def write_snapshot(snapshot, path):
+    """Writes a snapshot as an Arrow IPC file, or a folder of `.npy` files
+    when pyarrow isn't installed.
+
+    Returns:
+        [int]: the size written, in bytes.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        os.makedirs(path, exist_ok=True)
+        for name, values in snapshot.columns.items():
+            np.save(os.path.join(path, f"{name}.npy"), values)
+        with open(os.path.join(path, METADATA_FILE), "w") as metadata:
+            json.dump({"block": snapshot.block}, metadata)
+        return snapshot_size(path)
+    arrays = []
+    for name, values in snapshot.columns.items():
+        if name == "owner":
+            arrays.append(
+                pa.FixedSizeBinaryArray.from_buffers(
+                    pa.binary(20), len(values), [None, pa.py_buffer(values.tobytes())]
+                )
+            )
+        else:
+            arrays.append(pa.array(values))
+    batch = pa.RecordBatch.from_arrays(
+        arrays,
+        names=list(snapshot.columns),
+        metadata={"block": str(snapshot.block)},
+    )
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+    return snapshot_size(path)
+
+
+def read_snapshot(path):
+    """Memory-maps a snapshot written by `write_snapshot()`.
+
+    Returns:
+        [Snapshot]: the snapshot, its columns are read on first access.
+    """
+    if os.path.isdir(path):
+        with open(os.path.join(path, METADATA_FILE)) as metadata:
+            block = json.load(metadata)["block"]
+        columns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in COLUMN_TYPES
+        }
+        return Snapshot(block, columns)
+    import pyarrow as pa
+
+    batch = pa.ipc.open_file(pa.memory_map(path)).get_batch(0)
+    columns = {}
+    for name in COLUMN_TYPES:
+        array = batch.column(name)
+        if name == "owner":
+            columns[name] = np.frombuffer(
+                array.buffers()[1],
+                dtype="S20",
+                count=len(array),
+                offset=array.offset * 20,
+            )
+        else:
+            columns[name] = array.to_numpy(zero_copy_only=False)
+    return Snapshot(int(batch.schema.metadata[b"block"]), columns)
+
+
+def snapshot_size(path):
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)
+        )
+    return os.path.getsize(path)
+
+
+def claimed_between(meta_arenas, from_block, to_block):
+    """Reads the $ARENA claimed by every Arena in blocks `from_block` + 1 to
+    `to_block`, from the RewardsClaimed logs.
+
+    Returns:
+        [dict]: token ID to the $ARENA claimed.
+    """
+    claimed = {}
+    signature = EVENTS["RewardsClaimed"][0]
+    if to_block <= from_block:
+        return claimed
+    logs = web3.eth.get_logs(
+        {
+            "address": meta_arenas.address,
+            "fromBlock": from_block + 1,
+            "toBlock": to_block,
+            "topics": [eth_utils.to_hex(eth_utils.keccak(text=signature))],
+        }
+    )
+    for log in logs:
+        decoded = decode_log(log)
+        if decoded is not None:
+            token_id = decoded[1]["tokenId"]
+            claimed[token_id] = claimed.get(token_id, 0) + decoded[1]["arenaRewards"]
+    return claimed
+
+
+def diff_snapshots(old, new, claimed=None):
+    """Compares two snapshots, per rarity of the Arenas in `new`.
+
+    The $ARENA emitted is the growth of the available rewards plus the
+    rewards claimed in between. Arenas missing from `old` count from zero.
+
+    Args:
+        old (Snapshot): the snapshot at the first block.
+
+        new (Snapshot): the snapshot at the second block.
+
+        claimed (dict, optional): token ID to $ARENA claimed in between, from
+        `claimed_between()`. Defaults to None, nothing claimed.
+
+    Returns:
+        [dict]: rarity name to the Arenas, staked Arenas, levels gained and
+        $ARENA emitted.
+    """
+    token_ids = new.columns["token_id"]
+    positions = np.searchsorted(old.columns["token_id"], token_ids)
+    positions = np.minimum(positions, max(len(old.columns["token_id"]) - 1, 0))
+    in_old = np.zeros(len(token_ids), dtype=bool)
+    if len(old.columns["token_id"]):
+        in_old = old.columns["token_id"][positions] == token_ids
+    available_new = rewards(new, "unclaimed_arena") + rewards(new, "pending_arena")
+    available_old = np.zeros(len(token_ids), dtype=object)
+    old_available = rewards(old, "unclaimed_arena") + rewards(old, "pending_arena")
+    available_old[in_old] = old_available[positions[in_old]]
+    old_level = np.zeros(len(token_ids), dtype=np.int64)
+    old_level[in_old] = old.columns["level"][positions[in_old]]
+    claimed_new = np.zeros(len(token_ids), dtype=object)
+    for token_id, amount in (claimed or {}).items():
+        n = np.searchsorted(token_ids, token_id)
+        if n < len(token_ids) and token_ids[n] == token_id:
+            claimed_new[n] += amount
+    emitted = available_new - available_old + claimed_new
+    levels_gained = new.columns["level"].astype(np.int64) - old_level
+    diff = {}
+    for rarity, name in enumerate(RARITY_NAMES):
+        mask = new.columns["rarity"] == rarity
+        diff[name] = {
+            "arenas": int(mask.sum()),
+            "staked": int(new.columns["staked"][mask].sum()),
+            "levels_gained": int(levels_gained[mask].sum()),
+            "emitted_arena": int(emitted[mask].sum()),
+        }
+    return diff
+
+
+def main():
+    meta_arenas = Contract.from_abi("Metarenas", meta_arenas_address, Metarenas.abi)
+    lens = get_lens(lens_address)
+    multicall = get_multicall(multicall_address)
+    started = time.perf_counter()
+    snapshot = export_snapshot(meta_arenas, lens, multicall, snapshot_block)
+    seconds = time.perf_counter() - started
+    os.makedirs(snapshots_folder, exist_ok=True)
+    path = os.path.join(snapshots_folder, f"metarenas-{snapshot.block}")
+    size = write_snapshot(snapshot, path)
+    print(
+        f"{len(snapshot.columns['token_id'])} Metarenas at block {snapshot.block} "
+        f"exported in {seconds:.2f}s, {size} bytes written to {path}"
+    )
@@ -0,0 +1,344 @@
+"""Storage layout checks for upgrades of the Metarenas proxy.
+
+Layouts come from solc's storage-layout output, normalized so that they don't
+depend on AST IDs, and are cached under build/ by the hash of the sources.
+Only a change to a .sol file calls solc again.
+
+Run it with `python -m scripts.storage_layout` to check every upgrade in
+`UPGRADE_PATH`, it exits with an error if one of them is unsafe.
+"""
+
+from collections import namedtuple
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import yaml
+
+# Compiler used for the layouts, any version matching the pragmas gives the same
+solc_version = "0.8.13"
+layout_cache_folder = os.path.join("build", "storage_layouts")
+# Version of the normalized layouts, bumped to drop layouts cached by an older one
+layout_format = 2
+source_folders = ["contracts", "interfaces"]
+packages_folder = os.path.join(os.path.expanduser("~"), ".brownie", "packages")
+config_path = "brownie-config.yaml"
+# Implementations in the order the proxy goes through them
+UPGRADE_PATH = ["MetarenasV2", "Metarenas"]
+
+LayoutChange = namedtuple(
+    "LayoutChange", ["kind", "label", "slot", "offset", "old_type", "new_type"]
+)
+# Changes that keep every stored value where the new implementation reads it
+SAFE_CHANGES = {"appended", "renamed", "gap_shrunk", "struct_extended"}
+# Upgrades that keep the layout but read variables the old implementation
+# stopped writing, by the labels of those variables
+STALE_UPGRADES = {
+    ("Metarenas", "MetarenasV2"): [
+        "_ownedTokens",
+        "_ownedTokensIndex",
+        "_allTokens",
+        "_allTokensIndex",
+    ],
+}
+
+
+class StorageLayoutError(ValueError):
+    """An upgrade that would read or write stored values at the wrong place."""
+
+    def __init__(self, changes):
+        self.changes = changes
+        super().__init__(
+            "Unsafe storage layout change: "
+            + ", ".join(f"{c.kind} {c.label} at slot {c.slot}" for c in changes)
+        )
+
+
+def _describe(type_id, types):
+    """Canonical type description, without the AST IDs solc puts in type IDs.
+
+    Structs are described by their members only, their `Contract.Name` label
+    changes when an implementation renames or redeclares them.
+    """
+    entry = types[type_id]
+    if "members" in entry:
+        members = ", ".join(
+            f"{_describe(m['type'], types)} {m['label']}@{m['slot']}:{m['offset']}"
+            for m in entry["members"]
+        )
+        return f"struct{{{members}}}"
+    if entry["encoding"] == "mapping":
+        key = _describe(entry["key"], types)
+        return f"mapping({key} => {_describe(entry['value'], types)})"
+    if entry["encoding"] == "dynamic_array":
+        return f"{_describe(entry['base'], types)}[]"
+    if "base" in entry:
+        base_bytes = int(types[entry["base"]]["numberOfBytes"])
+        length = int(entry["numberOfBytes"]) // base_bytes
+        return f"{_describe(entry['base'], types)}[{length}]"
+    return entry["label"]
+
+
+def normalize_layout(storage_layout):
+    """Turns solc's storage-layout output into one dict per variable.
+
+    Returns:
+        [list[dict]]: label, slot, offset, size in bytes and type of every
+        variable, in storage order.
+    """
+    types = storage_layout.get("types") or {}
+    return [
+        {
+            "label": variable["label"],
+            "slot": int(variable["slot"]),
+            "offset": variable["offset"],
+            "bytes": int(types[variable["type"]]["numberOfBytes"]),
+            "type": _describe(variable["type"], types),
+        }
+        for variable in storage_layout["storage"]
+    ]
+
+
+def _end_slot(variable):
+    """First slot after the variable."""
+    return variable["slot"] + max(
+        (variable["offset"] + variable["bytes"] + 31) // 32, 1
+    )
+
+
+def _extends_mapped_struct(old_type, new_type):
+    """Whether `new_type` only appends members to the struct values of the
+    `old_type` mapping. Every value starts at its own hashed slot, so the
+    members stored before keep their place.
+    """
+    if not old_type.startswith("mapping(") or not old_type.rstrip(")").endswith("}"):
+        return False
+    closing = len(old_type) - len(old_type.rstrip(")"))
+    head, tail = old_type[: -closing - 1], "}" + ")" * closing
+    if not new_type.startswith(head + ", ") or not new_type.endswith(tail):
+        return False
+    added = new_type[len(head) + 2 : -len(tail)]
+    return all(
+        added.count(opening) == added.count(closed)
+        for opening, closed in ["{}", "()"]
+    )
+
+
+def diff_layouts(old, new):
+    """Compares two normalized layouts variable by variable.
+
+    Args:
+        old (list[dict]): the layout of the implementation behind the proxy.
+
+        new (list[dict]): the layout of the implementation to upgrade to.
+
+    Returns:
+        [list[LayoutChange]]: every difference, safe or not. Variables are
+        matched by slot and offset, a `__gap` may shrink to make room for the
+        variables declared in front of it, and structs stored in a mapping
+        may get new members at their end.
+    """
+    changes = []
+    new_at = {(v["slot"], v["offset"]): v for v in new}
+    old_positions = {(v["slot"], v["offset"]) for v in old}
+    old_end = _last_slot(old)
+    new_end = _last_slot(new)
+    # Slots old gaps gave away to new variables, and the gaps left
+    given_away = set()
+    shrunk_gaps = set()
+    for variable in old:
+        position = (variable["slot"], variable["offset"])
+        current = new_at.get(position)
+        gap = _shrunk_gap(variable, new)
+        if current is not None and current["type"] == variable["type"]:
+            if current["label"] != variable["label"]:
+                changes.append(
+                    LayoutChange(
+                        "renamed", current["label"], *position, variable["type"], None
+                    )
+                )
+            continue
+        if gap is not None:
+            given_away.update(range(variable["slot"], gap["slot"]))
+            shrunk_gaps.add((gap["slot"], gap["offset"]))
+            kind, new_type = "gap_shrunk", gap["type"]
+        elif current is not None and _extends_mapped_struct(
+            variable["type"], current["type"]
+        ):
+            kind, new_type = "struct_extended", current["type"]
+        elif current is not None:
+            kind, new_type = "retyped", current["type"]
+        elif variable["slot"] >= new_end:
+            kind, new_type = "deleted", None
+        else:
+            kind, new_type = "removed", None
+        changes.append(
+            LayoutChange(kind, variable["label"], *position, variable["type"], new_type)
+        )
+    for variable in new:
+        position = (variable["slot"], variable["offset"])
+        if position in old_positions or position in shrunk_gaps:
+            continue
+        in_gap = set(range(variable["slot"], _end_slot(variable))) <= given_away
+        kind = "appended" if variable["slot"] >= old_end or in_gap else "inserted"
+        changes.append(
+            LayoutChange(kind, variable["label"], *position, None, variable["type"])
+        )
+    return changes
+
+
+def _last_slot(layout):
+    return max((_end_slot(v) for v in layout), default=0)
+
+
+def _shrunk_gap(old_gap, new):
+    """The `__gap` of `new` ending where `old_gap` ends, if it starts later."""
+    if old_gap["label"] != "__gap":
+        return None
+    for variable in new:
+        if (
+            variable["label"] == "__gap"
+            and variable["slot"] > old_gap["slot"]
+            and _end_slot(variable) == _end_slot(old_gap)
+        ):
+            return variable
+    return None
+
+
+def check_layouts(old, new, allow_deletions=False):
+    """Raises if upgrading from `old` to `new` moves or reinterprets stored values.
+
+    Args:
+        allow_deletions (bool, optional): accept variables removed from the end
+        of the layout, their values stay in storage unread.
+
+    Returns:
+        [list[LayoutChange]]: the safe changes.
+
+    Raises:
+        StorageLayoutError: with the unsafe changes.
+    """
+    changes = diff_layouts(old, new)
+    allowed = SAFE_CHANGES | ({"deleted"} if allow_deletions else set())
+    unsafe = [change for change in changes if change.kind not in allowed]
+    if unsafe:
+        raise StorageLayoutError(unsafe)
+    return changes
+
+
+def source_hash(folders=source_folders, version=solc_version):
+    """Hash of every project source, the compiler version, the remappings and
+    `layout_format`.
+    """
+    digest = hashlib.sha256(f"{version}:{layout_format}".encode())
+    for remapping in _remappings():
+        digest.update(remapping.encode())
+    for folder in folders:
+        pattern = os.path.join(folder, "**", "*.sol")
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            digest.update(path.encode())
+            with open(path, "rb") as source:
+                digest.update(source.read())
+    return digest.hexdigest()
+
+
+def _remappings():
+    if not os.path.exists(config_path):
+        return []
+    with open(config_path) as config_file:
+        config = yaml.safe_load(config_file) or {}
+    remappings = config.get("compiler", {}).get("solc", {}).get("remappings", [])
+    return [
+        f"{prefix}={os.path.join(packages_folder, target)}"
+        for prefix, target in (remapping.split("=", 1) for remapping in remappings)
+    ]
+
+
+def find_source(contract_name, folders=source_folders):
+    """Path of the .sol file declaring `contract_name`."""
+    declaration = re.compile(rf"^\s*(abstract\s+)?contract\s+{contract_name}\b", re.M)
+    for folder in folders:
+        for path in glob.glob(os.path.join(folder, "**", "*.sol"), recursive=True):
+            with open(path) as source:
+                if declaration.search(source.read()):
+                    return path
+    raise ValueError(f"No source declares {contract_name}")
+
+
+def compile_layouts(path, version=solc_version):
+    """Compiles `path` with solc and returns the layouts of its contracts."""
+    import solcx
+
+    if version not in [str(v) for v in solcx.get_installed_solc_versions()]:
+        solcx.install_solc(version)
+    output = solcx.compile_files(
+        [path],
+        output_values=["storage-layout"],
+        import_remappings=_remappings(),
+        allow_paths=[os.getcwd(), packages_folder],
+        solc_version=version,
+    )
+    return {
+        key.rsplit(":", 1)[1]: normalize_layout(value["storage-layout"])
+        for key, value in output.items()
+        if key.rsplit(":", 1)[0] == path
+    }
+
+
+def storage_layout(contract_name, cache_folder=layout_cache_folder):
+    """Normalized layout of a contract, compiled only if the sources changed."""
+    key = source_hash()
+    cache_path = os.path.join(cache_folder, f"{contract_name}-{key[:16]}.json")
+    if os.path.exists(cache_path):
+        with open(cache_path) as cached:
+            return json.load(cached)
+    layouts = compile_layouts(find_source(contract_name))
+    os.makedirs(cache_folder, exist_ok=True)
+    for name, layout in layouts.items():
+        with open(os.path.join(cache_folder, f"{name}-{key[:16]}.json"), "w") as file:
+            json.dump(layout, file)
+    return layouts[contract_name]
+
+
+def check_upgrade(old_contract, new_contract, allow_deletions=False):
+    """Same as `check_layouts()`, with the layouts of two contracts by name.
+
+    Also rejects the upgrades in `STALE_UPGRADES`, whatever their layouts.
+    """
+    old = storage_layout(old_contract)
+    stale = STALE_UPGRADES.get((old_contract, new_contract), [])
+    unsafe = [
+        LayoutChange(
+            "stale", v["label"], v["slot"], v["offset"], v["type"], v["type"]
+        )
+        for v in old
+        if v["label"] in stale
+    ]
+    if unsafe:
+        raise StorageLayoutError(unsafe)
+    return check_layouts(old, storage_layout(new_contract), allow_deletions)
+
+
+def main():
+    unsafe = False
+    for old_contract, new_contract in zip(UPGRADE_PATH, UPGRADE_PATH[1:]):
+        try:
+            changes = check_upgrade(old_contract, new_contract)
+        except StorageLayoutError as error:
+            unsafe = True
+            changes = error.changes
+            print(f"{old_contract} -> {new_contract}: unsafe")
+        else:
+            print(f"{old_contract} -> {new_contract}: safe")
+        for change in changes:
+            print(
+                f"  {change.kind} {change.label} at slot {change.slot}:{change.offset}"
+            )
+    if unsafe:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
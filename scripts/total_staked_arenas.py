@@ -4,19 +4,86 @@ from brownie import (
     accounts,
     config,
 )
+from scripts.helpful_scripts import RARITY_NAMES, get_multicall
+import time
 
 meta_arenas_address = "0x86640CC8C305f10BB88Daa970932d2d48de39811"
+# A deployed Multicall, only left empty on local networks
+multicall_address = ""
+# Amount of arenaDetails() calls bundled in one eth_call
+census_batch_size = 250
+
+
+def staking_census(meta_arenas, token_ids, multicall=None, batch_size=census_batch_size):
+    """Reads arenaDetails() for every token and counts the staked Metarenas.
+
+    Args:
+        meta_arenas (brownie.network.contract.Contract): the Metarenas proxy.
+
+        token_ids (list[int]): the token IDs to include in the census.
+
+        multicall (brownie.network.contract.Contract, optional):
+        A deployed Multicall. When given, calls are bundled `batch_size` at a
+        time and pinned to the block of the first batch. Defaults to None,
+        which makes one eth_call per token.
+
+        batch_size (int, optional): calls per Multicall.aggregate() call.
+
+    Returns:
+        [dict]: the staked token IDs, the staked counts per rarity and per
+        tier, the amount of RPC calls made and the wall time in seconds.
+    """
+    started = time.perf_counter()
+    details = []
+    calls_made = 0
+    block_number = None
+    if multicall is None:
+        for token_id in token_ids:
+            details.append(meta_arenas.arenaDetails(token_id))
+            calls_made += 1
+    else:
+        for start in range(0, len(token_ids), batch_size):
+            calls = [
+                (meta_arenas.address, meta_arenas.arenaDetails.encode_input(token_id))
+                for token_id in token_ids[start : start + batch_size]
+            ]
+            block_number, return_data = multicall.aggregate(
+                calls, block_identifier=block_number
+            )
+            calls_made += 1
+            for data in return_data:
+                details.append(meta_arenas.arenaDetails.decode_output(data))
+    staked = []
+    staked_per_rarity = {rarity: 0 for rarity in RARITY_NAMES}
+    staked_per_tier = {}
+    for token_id, arena_details in zip(token_ids, details):
+        if not arena_details[3]:
+            continue
+        staked.append(token_id)
+        staked_per_rarity[RARITY_NAMES[arena_details[2]]] += 1
+        staked_per_tier[arena_details[0]] = staked_per_tier.get(arena_details[0], 0) + 1
+    return {
+        "block": block_number,
+        "staked": staked,
+        "staked_per_rarity": staked_per_rarity,
+        "staked_per_tier": staked_per_tier,
+        "calls": calls_made,
+        "seconds": time.perf_counter() - started,
+    }
 
 
 def main():
     meta_arenas = Contract.from_abi("Metarenas", meta_arenas_address, Metarenas.abi)
+    multicall = get_multicall(multicall_address)
     total_supply = meta_arenas.totalSupply()
-    total_staked_supply = 0
-    for i in range(1, 1001):
-        areana_details = meta_arenas.arenaDetails(i)
-        if areana_details[3]:
-            print(f"Metarena {i} is staked.")
-            total_staked_supply += 1
-        else:
-            print(f"Metarena {i} is not staked.")
-    print(f"Out of {total_supply} Metarenas, {total_staked_supply} are staked.")
+    census = staking_census(meta_arenas, list(range(1, 1001)), multicall)
+    for token_id in census["staked"]:
+        print(f"Metarena {token_id} is staked.")
+    print(
+        f"Out of {total_supply} Metarenas, {len(census['staked'])} are staked."
+    )
+    for rarity, count in census["staked_per_rarity"].items():
+        print(f"{rarity}: {count} staked")
+    for tier, count in sorted(census["staked_per_tier"].items()):
+        print(f"Tier {tier}: {count} staked")
+    print(f"Census made {census['calls']} calls in {census['seconds']:.2f}s")
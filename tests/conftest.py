@@ -0,0 +1,194 @@
+"""Metarenas stack deployed once per session and shared by the tests.
+
+Tests asking for any of the deployment fixtures run between a
+chain.snapshot() and a chain.revert(), so every one of them starts from the
+same freshly deployed stack. Tests that take their own snapshots should
+deploy their own contracts instead, brownie only keeps one snapshot.
+`deploy_proxy` deploys more Metarenas proxies, against the shared contracts
+or against a test's own ones.
+"""
+
+from brownie import (
+    Contract,
+    Metarenas,
+    MetarenasLens,
+    ArenasOld,
+    ArenaTokenMock,
+    MetaPasses,
+    ProxyAdmin,
+    TransparentUpgradeableProxy,
+    accounts,
+    chain,
+)
+from scripts.helpful_scripts import encode_function_data
+import pytest
+
+# Arenas minted, or minted and staked, by default by the parametrized fixtures
+ARENA_COUNTS = [1, 10, 100]
+# First token ID minted after initialize()
+FIRST_TOKEN_ID = 1001
+# Largest mint and setRarity() call made by the fixtures
+MINT_BATCH = 100
+RARITY_BATCH = 200
+
+# Session fixtures restored after every test using them
+DEPLOYMENT_FIXTURES = {
+    "proxy_admin",
+    "arena",
+    "byte",
+    "passes",
+    "old_arenas",
+    "proxy",
+    "meta_arenas",
+    "lens",
+}
+
+
+@pytest.fixture(scope="session")
+def owner():
+    return accounts[0]
+
+
+@pytest.fixture(scope="session")
+def user():
+    return accounts[1]
+
+
+@pytest.fixture(scope="session")
+def proxy_admin(owner):
+    # Deploy Proxi Admin
+    return ProxyAdmin.deploy({"from": owner})
+
+
+@pytest.fixture(scope="session")
+def arena(owner):
+    return ArenaTokenMock.deploy({"from": owner})
+
+
+@pytest.fixture(scope="session")
+def byte(owner):
+    return ArenaTokenMock.deploy({"from": owner})
+
+
+@pytest.fixture(scope="session")
+def passes(owner):
+    return MetaPasses.deploy({"from": owner})
+
+
+@pytest.fixture(scope="session")
+def old_arenas(owner):
+    return ArenasOld.deploy({"from": owner})
+
+
+@pytest.fixture(scope="session")
+def proxy(owner, proxy_admin):
+    # Deploy the first MetaArenas implementation
+    implementation = Metarenas.deploy({"from": owner})
+    # Encode the initializa function
+    encoded_initializer_function = encode_function_data(implementation.initialize)
+    return TransparentUpgradeableProxy.deploy(
+        implementation.address,
+        proxy_admin.address,
+        encoded_initializer_function,
+        {"from": owner},
+    )
+
+
+@pytest.fixture(scope="session")
+def deploy_proxy(owner):
+    """Returns a function deploying a new Metarenas implementation and proxy.
+
+    The function takes the ProxyAdmin, ArenasOld, MetaPasses and ARENA token
+    contracts and returns the proxy, the implementation and the proxy with
+    the Metarenas ABI, unpaused and with one district to mint.
+    """
+
+    def deploy(proxy_admin, old_arenas, passes, arena):
+        implementation = Metarenas.deploy({"from": owner})
+        encoded_initializer_function = encode_function_data(implementation.initialize)
+        proxy = TransparentUpgradeableProxy.deploy(
+            implementation.address,
+            proxy_admin.address,
+            encoded_initializer_function,
+            {"from": owner},
+        )
+        meta_arenas = Contract.from_abi("MetaArenas", proxy.address, Metarenas.abi)
+        meta_arenas.setInterfaces(
+            old_arenas.address, passes.address, arena.address, {"from": owner}
+        )
+        meta_arenas.addDistrict({"from": owner})
+        meta_arenas.setPaused(False, {"from": owner})
+        return proxy, implementation, meta_arenas
+
+    return deploy
+
+
+@pytest.fixture(scope="session")
+def meta_arenas(owner, user, proxy, arena, byte, passes, old_arenas):
+    """The Metarenas proxy, funded, unpaused and with one district to mint."""
+    # Set Proxy ABI same as Implementation ABI
+    meta_arenas = Contract.from_abi("MetaArenas", proxy.address, Metarenas.abi)
+    # Set the Address for interfaces in proxy
+    meta_arenas.setInterfaces(
+        old_arenas.address, passes.address, arena.address, {"from": owner}
+    )
+    meta_arenas.completeArenaStorageMigration({"from": owner})
+    meta_arenas.setByteToken(byte.address, {"from": owner})
+    meta_arenas.setLevelBooster(owner.address, {"from": owner})
+    # Send ARENA and BYTE to Staking SC, and ARENA to the user for upgrades
+    arena.transfer(meta_arenas.address, 10000000 * 10**18, {"from": owner})
+    byte.transfer(meta_arenas.address, 10000000 * 10**18, {"from": owner})
+    arena.transfer(user.address, 10000 * 10**18, {"from": owner})
+    arena.approve(meta_arenas.address, 2**256 - 1, {"from": user})
+    meta_arenas.addDistrict({"from": owner})
+    meta_arenas.setPaused(False, {"from": owner})
+    meta_arenas.setMaxMintAmountPerTx(MINT_BATCH, {"from": owner})
+    return meta_arenas
+
+
+@pytest.fixture(scope="session")
+def lens(owner):
+    return MetarenasLens.deploy({"from": owner})
+
+
+@pytest.fixture(autouse=True)
+def isolation(request):
+    """Reverts the shared deployment to its state before the test."""
+    if DEPLOYMENT_FIXTURES.isdisjoint(request.fixturenames):
+        yield
+        return
+    # Session fixtures are set up before this one, so they are in the snapshot
+    chain.snapshot()
+    yield
+    chain.revert()
+
+
+@pytest.fixture(params=ARENA_COUNTS)
+def minted_arenas(request, meta_arenas, owner, user):
+    """Token IDs of N Arenas minted to `user`, the Arena at position n has
+    rarity n % 5. Pick N with `@pytest.mark.parametrize(..., indirect=True)`.
+    """
+    count = request.param
+    for minted in range(0, count, MINT_BATCH):
+        meta_arenas.mintForAddress(
+            min(MINT_BATCH, count - minted), user.address, {"from": owner}
+        )
+    token_ids = list(range(FIRST_TOKEN_ID, FIRST_TOKEN_ID + count))
+    for start in range(0, count, RARITY_BATCH):
+        chunk = token_ids[start : start + RARITY_BATCH]
+        meta_arenas.setRarity(
+            chunk, [n % 5 for n in range(start, start + len(chunk))], {"from": owner}
+        )
+    return token_ids
+
+
+@pytest.fixture
+def staked_arenas(minted_arenas, meta_arenas, user):
+    """Token IDs of the `minted_arenas`, staked by `user`. N is picked by
+    parametrizing `minted_arenas`.
+    """
+    for start in range(0, len(minted_arenas), MINT_BATCH):
+        meta_arenas.stakeArenas(
+            minted_arenas[start : start + MINT_BATCH], {"from": user}
+        )
+    return minted_arenas
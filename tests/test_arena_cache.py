@@ -0,0 +1,96 @@
+from brownie import accounts, chain
+from scripts.arena_cache import ArenaStateCache
+import pytest
+import random
+
+
+def assert_matches_chain(cache, meta_arenas, token_ids, wallets):
+    cache.sync(chain.height)
+    for i in token_ids:
+        details = meta_arenas.arenaDetails(i, block_identifier=chain.height)
+        rewards = meta_arenas.availableRewards(i, block_identifier=chain.height)
+        assert tuple(cache.arena_details(i)) == tuple(details)
+        assert tuple(cache.available_rewards(i)) == tuple(rewards)
+    for wallet in wallets:
+        assert cache.tokens_of_owner(wallet.address) == list(
+            meta_arenas.tokensOfOwner(wallet.address, block_identifier=chain.height)
+        )
+
+
+@pytest.mark.parametrize("minted_arenas", [20], indirect=True)
+def test_main(meta_arenas, owner, user, minted_arenas):
+    buyer = accounts[2]
+    token_ids = minted_arenas
+    wallets = [user, buyer]
+    holders = {i: user for i in token_ids}
+    rng = random.Random(15)
+    meta_arenas.setRarity(
+        token_ids, [rng.randrange(5) for _ in token_ids], {"from": owner}
+    )
+    meta_arenas.stakeArenas(token_ids[:10], {"from": user})
+    staked = set(token_ids[:10])
+    cache = ArenaStateCache(meta_arenas)
+    assert_matches_chain(cache, meta_arenas, token_ids, wallets)
+    # Simulated time series, mostly blocks where only time passes
+    for _ in range(60):
+        chain.sleep(rng.randint(600, 86400 * 3))
+        action = rng.choice(
+            ["time"] * 6
+            + [
+                "stake",
+                "unstake",
+                "claim",
+                "level",
+                "transfer",
+                "rarity",
+                "rates",
+                "byte",
+            ]
+        )
+        i = rng.choice(token_ids)
+        wallet = holders[i]
+        if action == "stake" and i not in staked:
+            meta_arenas.stakeArena(i, {"from": wallet})
+            staked.add(i)
+        elif action == "unstake" and i in staked:
+            meta_arenas.unstakeArena(i, {"from": wallet})
+            staked.discard(i)
+        elif action == "claim" and i in staked:
+            meta_arenas.claimRewards(i, {"from": wallet})
+        elif action == "level":
+            meta_arenas.increaseLevel(i, 10, {"from": owner})
+            if meta_arenas.arenaDetails(i)[0] == 0:
+                meta_arenas.upgradeArenaTier(i, {"from": wallet})
+        elif action == "transfer" and i not in staked:
+            receiver = buyer if wallet == user else user
+            meta_arenas.transferFrom(wallet, receiver, i, {"from": wallet})
+            holders[i] = receiver
+        elif action == "rarity":
+            meta_arenas.setRarity([i], [rng.randrange(5)], {"from": owner})
+        elif action == "rates":
+            meta_arenas.setRarityRewards(
+                rng.randrange(5), rng.randint(1, 200) * 10**18, {"from": owner}
+            )
+            meta_arenas.setTierMultiplier(
+                rng.randrange(2), rng.randint(1, 40), {"from": owner}
+            )
+        elif action == "byte":
+            meta_arenas.setByteEnabled(
+                not meta_arenas.byteEndabled(), {"from": owner}
+            )
+        else:
+            chain.mine()
+        assert_matches_chain(cache, meta_arenas, token_ids, wallets)
+    report = cache.report()
+    print(
+        f"Hit rate {report['hit_rate']:.1%} with {report['invalidations']} "
+        f"invalidations, hits p50 {report['hit_ms']['p50']:.3f}ms, "
+        f"misses p50 {report['miss_ms']['p50']:.3f}ms"
+    )
+    assert report["hit_rate"] > 0.5
+    assert report["hit_ms"]["p50"] < report["miss_ms"]["p50"]
+    # A cache smaller than the Arenas read evicts, and stays correct
+    small_cache = ArenaStateCache(meta_arenas, max_size=4)
+    assert_matches_chain(small_cache, meta_arenas, token_ids, wallets)
+    assert small_cache.report()["evictions"] > 0
+    assert len(small_cache.arenas) == 4
@@ -0,0 +1,112 @@
+from brownie import (
+    Contract,
+    Metarenas,
+    ArenasOld,
+    ArenaTokenMock,
+    MetaPasses,
+    ProxyAdmin,
+    TransparentUpgradeableProxy,
+    accounts,
+    chain,
+)
+from scripts.helpful_scripts import encode_function_data
+from scripts.arena_indexer import ArenaIndexer, arena_level
+import os
+import tempfile
+
+
+def assert_matches_chain(indexer, meta_arenas, token_ids):
+    now = chain[-1].timestamp
+    for i in token_ids:
+        details = meta_arenas.arenaDetails(i, block_identifier=chain.height)
+        state = indexer.arena(i)
+        assert state["owner"] == meta_arenas.ownerOf(i)
+        assert state["tier"] == details[0]
+        assert arena_level(state, now) == details[1]
+        assert state["staked"] == details[3]
+        assert state["time_of_stake"] == details[5]
+
+
+def test_main():
+    # Deloy
+    owner = accounts[0]
+    user = accounts[1]
+    buyer = accounts[2]
+    # Deploy Proxi Admin
+    proxy_admin = ProxyAdmin.deploy({"from": owner})
+    arena = ArenaTokenMock.deploy({"from": owner})
+    passes = MetaPasses.deploy({"from": owner})
+    old_arenas = ArenasOld.deploy({"from": owner})
+    # Deploy the first MetaArenas implementation
+    implementation = Metarenas.deploy({"from": owner})
+    # Encode the initializa function
+    encoded_initializer_function = encode_function_data(implementation.initialize)
+    proxy = TransparentUpgradeableProxy.deploy(
+        implementation.address,
+        proxy_admin.address,
+        encoded_initializer_function,
+        {"from": owner},
+    )
+    start_block = proxy.tx.block_number
+    # Set Proxy ABI same as Implementation ABI
+    meta_arenas = Contract.from_abi("MetaArenas", proxy.address, Metarenas.abi)
+    # Set the Address for interfaces in proxy
+    meta_arenas.setInterfaces(
+        old_arenas.address, passes.address, arena.address, {"from": owner}
+    )
+    meta_arenas.completeArenaStorageMigration({"from": owner})
+    meta_arenas.setLevelBooster(owner.address, {"from": owner})
+    arena.transfer(meta_arenas.address, 1000000 * 10**18, {"from": owner})
+    arena.transfer(user.address, 10000 * 10**18, {"from": owner})
+    arena.approve(meta_arenas.address, 10000 * 10**18, {"from": user})
+    # Replay a scenario touching every indexed event
+    meta_arenas.addDistrict({"from": owner})
+    meta_arenas.setPaused(False, {"from": owner})
+    meta_arenas.setMaxMintAmountPerTx(10, {"from": owner})
+    meta_arenas.mintForAddress(10, user.address, {"from": owner})
+    token_ids = [118, 188, 216] + list(range(1001, 1011))
+    meta_arenas.stakeArenas([1001, 1002, 1003, 1004], {"from": user})
+    meta_arenas.increaseLevel(1005, 4, {"from": owner})
+    chain.mine(blocks=5, timedelta=86400 * 3)
+    meta_arenas.increaseLevel(1001, 10, {"from": owner})
+    meta_arenas.upgradeArenaTier(1001, {"from": user})
+    meta_arenas.claimAllRewards([1002, 1003], {"from": user})
+    meta_arenas.unstakeArena(1004, {"from": user})
+    meta_arenas.transferFrom(user.address, buyer.address, 1005, {"from": user})
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "metarenas.db")
+        indexer = ArenaIndexer(
+            db_path, meta_arenas.address, start_block=start_block, chunk_size=7
+        )
+        result = indexer.sync()
+        assert result["rolled_back"] == 0
+        assert_matches_chain(indexer, meta_arenas, token_ids)
+        assert indexer.staked_by_owner(user.address) == [1001, 1002, 1003]
+        assert indexer.arenas_with_tier(1) == [1001]
+        claimed = indexer.arena(1002)["claimed_arena"] + indexer.arena(1003)[
+            "claimed_arena"
+        ]
+        assert claimed > 0
+        indexer.close()
+        # Resume from the last synced block in a new process
+        chain.snapshot()
+        meta_arenas.stakeArena(1006, {"from": user})
+        meta_arenas.increaseLevel(1002, 3, {"from": owner})
+        indexer = ArenaIndexer(db_path, meta_arenas.address, start_block=start_block)
+        last_block = indexer.last_block
+        result = indexer.sync()
+        assert result == {"events": 2, "rolled_back": 0}
+        assert indexer.last_block == last_block + 2
+        assert_matches_chain(indexer, meta_arenas, token_ids)
+        # Reorg: drop the last two blocks and mine a different branch
+        chain.revert()
+        chain.sleep(60)
+        meta_arenas.stakeArena(1007, {"from": user})
+        meta_arenas.unstakeArena(1002, {"from": user})
+        chain.mine(blocks=2)
+        result = indexer.sync()
+        assert result["rolled_back"] >= 2
+        assert indexer.arena(1006)["staked"] is False
+        assert_matches_chain(indexer, meta_arenas, token_ids)
+        assert indexer.staked_by_owner(user.address) == [1001, 1003, 1007]
+        indexer.close()
@@ -0,0 +1,47 @@
+from brownie import Contract, MetarenasV2, ERC721ReceiverMock
+from scripts.helpful_scripts import upgrade
+import brownie
+
+BATCH_SIZES = [1, 3, 10, 100]
+
+
+def gas_per_token(meta_arenas, owner, receiver):
+    gas = {}
+    for n in BATCH_SIZES:
+        tx = meta_arenas.mintForAddress(n, receiver, {"from": owner})
+        gas[n] = tx.gas_used // n
+    return gas
+
+
+def test_main(owner, user, proxy_admin, arena, passes, old_arenas, deploy_proxy):
+    stack = (proxy_admin, old_arenas, passes, arena)
+    # V2 runs _safeMint once per token
+    legacy_proxy, _, _ = deploy_proxy(*stack)
+    upgrade(owner, legacy_proxy, MetarenasV2.deploy({"from": owner}), proxy_admin)
+    legacy_arenas = Contract.from_abi(
+        "MetaArenas", legacy_proxy.address, MetarenasV2.abi
+    )
+    legacy_arenas.setMaxMintAmountPerTx(max(BATCH_SIZES), {"from": owner})
+    legacy_gas = gas_per_token(legacy_arenas, owner, user.address)
+    # Batch minting
+    _, _, meta_arenas = deploy_proxy(*stack)
+    meta_arenas.completeArenaStorageMigration({"from": owner})
+    meta_arenas.setMaxMintAmountPerTx(max(BATCH_SIZES), {"from": owner})
+    batch_gas = gas_per_token(meta_arenas, owner, user.address)
+    for n in BATCH_SIZES:
+        print(f"N={n}: {legacy_gas[n]} -> {batch_gas[n]} gas per token")
+        assert batch_gas[n] < legacy_gas[n]
+    # Same owners, balances and supply as minting one by one
+    minted = sum(BATCH_SIZES)
+    assert meta_arenas.balanceOf(user.address) == minted
+    assert meta_arenas.totalSupply() == minted + 3
+    assert meta_arenas.ownerOf(1001) == meta_arenas.ownerOf(1000 + minted) == user
+    # A receiver contract is checked once per token
+    receiver = ERC721ReceiverMock.deploy({"from": owner})
+    meta_arenas.mintForAddress(10, receiver.address, {"from": owner})
+    assert receiver.received() == 10
+    assert meta_arenas.balanceOf(receiver.address) == 10
+    # A contract that can't receive NFTs reverts the whole batch
+    with brownie.reverts("ERC721: transfer to non ERC721Receiver implementer"):
+        meta_arenas.mintForAddress(10, arena.address, {"from": owner})
+    assert meta_arenas.totalSupply() == minted + 13
@@ -0,0 +1,83 @@
+from brownie import (
+    Contract,
+    Metarenas,
+    ArenasOld,
+    ArenaTokenMock,
+    MetaPasses,
+    ProxyAdmin,
+    TransparentUpgradeableProxy,
+    accounts,
+    chain,
+)
+from scripts.helpful_scripts import encode_function_data
+
+BATCH_SIZES = [1, 5, 20, 50]
+
+
+def test_main():
+    # Deloy
+    owner = accounts[0]
+    user = accounts[1]
+    # Deploy Proxi Admin
+    proxy_admin = ProxyAdmin.deploy({"from": owner})
+    arena = ArenaTokenMock.deploy({"from": owner})
+    passes = MetaPasses.deploy({"from": owner})
+    old_arenas = ArenasOld.deploy({"from": owner})
+    # Deploy the first MetaArenas implementation
+    implementation = Metarenas.deploy({"from": owner})
+    # Encode the initializa function
+    encoded_initializer_function = encode_function_data(implementation.initialize)
+    proxy = TransparentUpgradeableProxy.deploy(
+        implementation.address,
+        proxy_admin.address,
+        encoded_initializer_function,
+        {"from": owner},
+    )
+    # Set Proxy ABI same as Implementation ABI
+    meta_arenas = Contract.from_abi("MetaArenas", proxy.address, Metarenas.abi)
+    # Set the Address for interfaces in proxy
+    meta_arenas.setInterfaces(
+        old_arenas.address, passes.address, arena.address, {"from": owner}
+    )
+    # Send ARENA to Staking SC
+    arena.transfer(meta_arenas.address, 1000000 * 10**18, {"from": owner})
+    # Mint 50 Metarenas for single calls and 50 for batched calls
+    meta_arenas.addDistrict({"from": owner})
+    meta_arenas.setPaused(False, {"from": owner})
+    meta_arenas.setMaxMintAmountPerTx(50, {"from": owner})
+    meta_arenas.mintForAddress(50, user.address, {"from": owner})
+    meta_arenas.mintForAddress(50, user.address, {"from": owner})
+    single_ids = list(range(1001, 1051))
+    batch_ids = list(range(1051, 1101))
+    for n in BATCH_SIZES:
+        single = {"stake": 0, "claim": 0, "unstake": 0}
+        batched = {}
+        # Stake
+        for i in single_ids[:n]:
+            single["stake"] += meta_arenas.stakeArena(i, {"from": user}).gas_used
+        batched["stake"] = meta_arenas.stakeArenas(batch_ids[:n], {"from": user}).gas_used
+        chain.mine(blocks=10, timedelta=86400)
+        # Claim
+        balance_before = arena.balanceOf(user.address)
+        for i in single_ids[:n]:
+            single["claim"] += meta_arenas.claimRewards(i, {"from": user}).gas_used
+        claimed_single = arena.balanceOf(user.address) - balance_before
+        tx = meta_arenas.claimAllRewards(batch_ids[:n], {"from": user})
+        batched["claim"] = tx.gas_used
+        claimed_batch = arena.balanceOf(user.address) - balance_before - claimed_single
+        # One ARENA transfer for the whole batch
+        assert len(tx.events["Transfer"]) == 1
+        assert claimed_single > 0
+        assert claimed_batch * 100 >= claimed_single * 99
+        # Unstake
+        for i in single_ids[:n]:
+            single["unstake"] += meta_arenas.unstakeArena(i, {"from": user}).gas_used
+        batched["unstake"] = meta_arenas.unstakeArenas(batch_ids[:n], {"from": user}).gas_used
+        assert len(meta_arenas.userStakedArenas(user.address)) == 0
+        for action in ["stake", "claim", "unstake"]:
+            print(
+                f"N={n} {action}: {single[action]} gas in {n} calls, "
+                f"{batched[action]} gas batched"
+            )
+            if n > 1:
+                assert batched[action] < single[action]
@@ -0,0 +1,88 @@
+from brownie import Contract, MetarenasV2, chain
+from scripts.helpful_scripts import upgrade
+
+# Default RPC gas cap for eth_call on geth based nodes
+NODE_CALL_GAS_CAP = 50_000_000
+
+
+def unpack_arena_details(packed):
+    return (
+        (packed >> 128) & (2**64 - 1),
+        (packed >> 64) & (2**64 - 1),
+        (packed >> 192) & (2**8 - 1),
+        bool((packed >> 200) & 1),
+        bool((packed >> 201) & 1),
+        packed & (2**64 - 1),
+    )
+
+
+def assert_batch_matches_single_reads(lens, meta_arenas, token_ids):
+    # Pin every read to the same block so rewards are comparable
+    block = {"block_identifier": chain.height}
+    details, rewards_arena, rewards_byte, owners = lens.arenaDetailsBatch(
+        meta_arenas, token_ids, **block
+    )
+    batch_rewards = lens.availableRewardsBatch(meta_arenas, token_ids, **block)
+    for n, i in enumerate(token_ids):
+        single_rewards = meta_arenas.availableRewards(i, **block)
+        assert unpack_arena_details(details[n]) == tuple(
+            meta_arenas.arenaDetails(i, **block)
+        )
+        assert (rewards_arena[n], rewards_byte[n]) == single_rewards
+        assert (batch_rewards[0][n], batch_rewards[1][n]) == single_rewards
+        assert owners[n] == meta_arenas.ownerOf(i, **block)
+
+
+def test_main(owner, proxy_admin, arena, passes, old_arenas, lens, deploy_proxy):
+    _, _, meta_arenas = deploy_proxy(proxy_admin, old_arenas, passes, arena)
+    # Mint a full district of 1000 Metarenas
+    meta_arenas.setMaxMintAmountPerTx(50, {"from": owner})
+    for _ in range(20):
+        meta_arenas.mintForAddress(50, owner.address, {"from": owner})
+    sample = list(range(1001, 1021))
+    meta_arenas.setRarity(sample, [i % 5 for i in sample], {"from": owner})
+    for i in sample[::2]:
+        meta_arenas.stakeArena(i, {"from": owner})
+    chain.mine(blocks=10, timedelta=259200 * 4)
+    # Assert batch views match the single token views
+    assert_batch_matches_single_reads(lens, meta_arenas, sample)
+    details = lens.arenaDetailsRange(meta_arenas, 1001, 21)[0]
+    assert list(details[:20]) == list(lens.arenaDetailsBatch(meta_arenas, sample)[0])
+    # Only the rarities set by the owner are flagged
+    assert all((packed >> 202) & 1 for packed in details[:20])
+    assert not (details[20] >> 202) & 1
+    # Non minted token IDs have no owner
+    assert lens.arenaDetailsRange(meta_arenas, 2001, 2)[3] == [
+        "0x0000000000000000000000000000000000000000"
+    ] * 2
+    # Benchmark eth_call gas for growing slices
+    gas_used = {}
+    for count in [100, 250, 500, 1000]:
+        gas_used[count] = lens.arenaDetailsRange.estimate_gas(
+            meta_arenas, 1001, count
+        )
+        print(
+            f"arenaDetailsRange({count}): {gas_used[count]} gas, "
+            f"{count * 4 * 32} bytes of return data"
+        )
+    gas_per_token = (gas_used[1000] - gas_used[100]) / 900
+    base_gas = gas_used[100] - 100 * gas_per_token
+    tokens_per_call = int((NODE_CALL_GAS_CAP - base_gas) / gas_per_token)
+    print(f"{gas_per_token:.0f} gas per token, {tokens_per_call} tokens fit in one call")
+    assert tokens_per_call >= 1000
+    # The lens serves a proxy moved to V2 before any mint the same way
+    legacy_proxy, _, _ = deploy_proxy(proxy_admin, old_arenas, passes, arena)
+    upgrade(owner, legacy_proxy, MetarenasV2.deploy({"from": owner}), proxy_admin)
+    legacy_arenas = Contract.from_abi(
+        "MetaArenas", legacy_proxy.address, MetarenasV2.abi
+    )
+    legacy_arenas.setMaxMintAmountPerTx(50, {"from": owner})
+    legacy_arenas.mintForAddress(20, owner.address, {"from": owner})
+    legacy_arenas.setRarity(sample, [i % 5 for i in sample], {"from": owner})
+    for i in sample[::2]:
+        legacy_arenas.stakeArena(i, {"from": owner})
+    chain.mine(blocks=10, timedelta=259200 * 4)
+    assert_batch_matches_single_reads(lens, legacy_arenas, sample)
+    # V2 has no arenaInfo(), so no rarity is flagged
+    details = lens.arenaDetailsBatch(legacy_arenas, sample)[0]
+    assert not any((packed >> 202) & 1 for packed in details)
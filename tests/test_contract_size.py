@@ -0,0 +1,21 @@
+from brownie import Metarenas, MetarenasLens, Multicall, accounts, web3
+
+# EIP-170 limit on runtime bytecode, enforced by ganache like mainnet
+MAX_CODE_SIZE = 24576
+
+
+def code_size(contract):
+    return len(contract._build["deployedBytecode"].replace("0x", "", 1)) // 2
+
+
+def test_main():
+    for contract in [Metarenas, MetarenasLens, Multicall]:
+        size = code_size(contract)
+        print(
+            f"{contract._name}: {size} bytes of runtime bytecode, "
+            f"{MAX_CODE_SIZE - size} bytes left"
+        )
+        assert size <= MAX_CODE_SIZE
+    # The deployed code is the compiled runtime bytecode
+    implementation = Metarenas.deploy({"from": accounts[0]})
+    assert len(web3.eth.get_code(implementation.address)) == code_size(Metarenas)
@@ -0,0 +1,55 @@
+from brownie import accounts, chain
+from scripts.deploy_pipeline import (
+    DEPLOYMENTS,
+    DeploymentPipeline,
+    load_manifest,
+    save_manifest,
+)
+import brownie
+import os
+import random
+import tempfile
+
+
+def test_main():
+    # Deloy
+    owner = accounts[0]
+    rng = random.Random(19)
+    rarities = [(n, rng.randrange(1, 5)) for n in range(1, 501)]
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "deployments.json")
+        # Fresh environment: six contracts, the proxy initialized with the
+        # configuration, the rarities left out of the initializer and the funding
+        pipeline = DeploymentPipeline(owner, DEPLOYMENTS["test"], path)
+        meta_arenas = pipeline.run(rarities)
+        assert len(pipeline.transactions) <= 10
+        assert meta_arenas.arenaStorageMigrated()
+        assert meta_arenas.owner() == owner.address
+        assert meta_arenas.ownerOf(118) == owner.address
+        assert meta_arenas.arenaToken() != meta_arenas.oldArenas()
+        for token_id, rarity in rarities[::25]:
+            assert meta_arenas.arenaDetails(token_id)[2] == rarity
+        manifest = load_manifest(path)
+        contracts = manifest[str(chain.id)]
+        assert contracts["proxy"]["address"] == meta_arenas.address
+        # The proxy can't be initialized again
+        with brownie.reverts():
+            meta_arenas.initializeWithConfig(
+                owner, owner, owner, owner, 1, b"", {"from": owner}
+            )
+        # Everything is on-chain, nothing to send
+        pipeline = DeploymentPipeline(owner, DEPLOYMENTS["test"], path)
+        assert pipeline.run(rarities).address == meta_arenas.address
+        assert pipeline.transactions == []
+        # A changed implementation is deployed and the proxy upgraded to it
+        manifest = load_manifest(path)
+        manifest[str(chain.id)]["implementation"]["bytecode_hash"] = "0x00"
+        save_manifest(manifest, path)
+        pipeline = DeploymentPipeline(owner, DEPLOYMENTS["test"], path)
+        upgraded = pipeline.run(rarities)
+        assert upgraded.address == meta_arenas.address
+        assert len(pipeline.transactions) == 2
+        implementation = load_manifest(path)[str(chain.id)]["implementation"]
+        assert implementation["address"] != contracts["implementation"]["address"]
+        assert upgraded.ownerOf(118) == owner.address
+        assert upgraded.arenaDetails(rarities[0][0])[2] == rarities[0][1]
@@ -0,0 +1,55 @@
+from brownie import Contract, Metarenas, MetarenasV2, accounts
+from scripts.helpful_scripts import upgrade
+
+
+def mint_and_transfer_gas(meta_arenas, owner, user, buyer, token_id):
+    mint_tx = meta_arenas.mintForAddress(3, user.address, {"from": owner})
+    transfer_tx = meta_arenas.transferFrom(
+        user.address, buyer.address, token_id, {"from": user}
+    )
+    return mint_tx.gas_used, transfer_tx.gas_used
+
+
+def test_main(owner, user, proxy_admin, arena, passes, old_arenas, deploy_proxy):
+    buyer = accounts[2]
+    stack = (proxy_admin, old_arenas, passes, arena)
+    # Proxy running V2, which still writes the enumeration on every mint and transfer
+    legacy_proxy, implementation, _ = deploy_proxy(*stack)
+    upgrade(owner, legacy_proxy, MetarenasV2.deploy({"from": owner}), proxy_admin)
+    legacy_arenas = Contract.from_abi(
+        "MetaArenas", legacy_proxy.address, MetarenasV2.abi
+    )
+    enumerable_gas = mint_and_transfer_gas(legacy_arenas, owner, user, buyer, 1001)
+    legacy_arenas.mintForAddress(3, user.address, {"from": owner})
+    old_arenas.approve(legacy_arenas.address, 4, {"from": owner})
+    legacy_arenas.migrateArena(4, {"from": owner})
+    enumerated_supply = legacy_arenas.totalSupply()
+    # Tokens minted by initialize() are not enumerated here, so skip the owner
+    enumerated_tokens = {
+        wallet: sorted(legacy_arenas.tokensOfOwner(wallet.address))
+        for wallet in [user, buyer]
+    }
+    # Fresh proxy without the enumeration
+    _, _, meta_arenas = deploy_proxy(*stack)
+    meta_arenas.completeArenaStorageMigration({"from": owner})
+    gas = mint_and_transfer_gas(meta_arenas, owner, user, buyer, 1001)
+    print(f"mint 3: {enumerable_gas[0]} -> {gas[0]} gas")
+    print(f"transfer: {enumerable_gas[1]} -> {gas[1]} gas")
+    assert gas[0] < enumerable_gas[0]
+    assert gas[1] < enumerable_gas[1]
+    assert meta_arenas.totalSupply() == 6
+    assert meta_arenas.tokensOfOwner(user.address) == [1002, 1003]
+    assert meta_arenas.tokensOfOwner(owner.address) == [118, 188, 216]
+    # Upgrade the V2 proxy, the enumerable slots keep counting the older tokens
+    upgrade(owner, legacy_proxy, implementation, proxy_admin)
+    meta_arenas = Contract.from_abi("MetaArenas", legacy_proxy.address, Metarenas.abi)
+    # The 3 tokens minted by initialize() were counted by the new counter
+    assert meta_arenas.totalSupply() == enumerated_supply + 3
+    for wallet, token_ids in enumerated_tokens.items():
+        assert sorted(meta_arenas.tokensOfOwner(wallet.address)) == token_ids
+    meta_arenas.mintForAddress(3, user.address, {"from": owner})
+    meta_arenas.transferFrom(user.address, buyer.address, 1002, {"from": user})
+    assert meta_arenas.totalSupply() == enumerated_supply + 6
+    assert meta_arenas.tokensOfOwner(user.address) == [1003, 1004, 1005, 1006, 1007, 1008, 1009]
+    assert meta_arenas.tokensOfOwner(buyer.address) == [1001, 1002]
+    assert meta_arenas.tokensOfOwner(owner.address) == [5, 118, 188, 216]
@@ -0,0 +1,64 @@
+from brownie import Metarenas, MetarenasV2
+from scripts.gas_profile import (
+    CSV_FIELDS,
+    compare_reports,
+    load_report,
+    profile_implementation,
+    write_report,
+)
+import csv
+import tempfile
+
+SWEEPS = {
+    "mint_amount": [1, 3],
+    "staked": [1, 20],
+    "batch_size": [1, 10],
+    "owned": [1, 10],
+}
+
+
+def test_main():
+    reports = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for implementation_contract in [MetarenasV2, Metarenas]:
+            rows = profile_implementation(implementation_contract, SWEEPS)
+            json_path, csv_path = write_report(
+                rows, implementation_contract._name, folder
+            )
+            # JSON and CSV hold the same measurements
+            reports[implementation_contract._name] = load_report(json_path)
+            assert reports[implementation_contract._name] == rows
+            with open(csv_path, newline="") as csv_file:
+                csv_rows = list(csv.DictReader(csv_file))
+            assert list(csv_rows[0].keys()) == CSV_FIELDS
+            assert len(csv_rows) == len(rows)
+    functions = {row["function"] for row in reports["Metarenas"]}
+    for function_name in [
+        "mint",
+        "mintForAddress",
+        "migrateArena",
+        "setRarity",
+        "stakeArena",
+        "claimRewards",
+        "upgradeArenaTier",
+        "unstakeArena",
+        "transferFrom",
+        "stakeArenas",
+        "tokensOfOwner",
+    ]:
+        assert function_name in functions
+    # Batch entry points only exist in the current implementation
+    assert "stakeArenas" not in {row["function"] for row in reports["MetarenasV2"]}
+    # Going back to V2 is flagged: its unstake searches the staked Arenas linearly
+    comparison = compare_reports(reports["Metarenas"], reports["MetarenasV2"])
+    regressions = {
+        (entry["function"], entry["value"])
+        for entry in comparison
+        if entry["regression"]
+    }
+    assert ("unstakeArena", 20) in regressions
+    # The same report never regresses against itself
+    assert not any(
+        entry["regression"]
+        for entry in compare_reports(reports["Metarenas"], reports["Metarenas"])
+    )
@@ -0,0 +1,114 @@
+from brownie import accounts, chain
+import pytest
+import random
+
+ACTIONS = [
+    "stake",
+    "unstake",
+    "claim",
+    "upgrade",
+    "transfer",
+    "rarity",
+    "rarity_rewards",
+    "tier_multiplier",
+    "byte_enabled",
+    "withdraw",
+]
+MAX_UINT256 = 2**256 - 1
+
+
+def assert_totals_match(meta_arenas, arena, byte, token_ids):
+    block = {"block_identifier": chain.height}
+    # Brute force over every Arena
+    staked = {}
+    rate = 0
+    owed = [0, 0]
+    for i in token_ids:
+        tier, _, rarity, is_staked, _, _ = meta_arenas.arenaDetails(i, **block)
+        rewards = meta_arenas.availableRewards(i, **block)
+        owed = [owed[0] + rewards[0], owed[1] + rewards[1]]
+        if is_staked:
+            staked[(rarity, tier)] = staked.get((rarity, tier), 0) + 1
+            rate += meta_arenas.tierRewardsMultiplier(
+                tier, **block
+            ) * meta_arenas.rarityRewardsPerDay(rarity, **block)
+    assert meta_arenas.totalStakedArenas(**block) == sum(staked.values())
+    for (rarity, tier), count in staked.items():
+        assert meta_arenas.stakedArenas(rarity, tier, **block) == count
+    assert meta_arenas.emissionRate(**block) == rate // 864000
+    assert list(meta_arenas.outstandingRewards(**block)) == owed
+    balances = [arena.balanceOf(meta_arenas, **block) - owed[0]]
+    if meta_arenas.byteEndabled(**block):
+        balances.append(byte.balanceOf(meta_arenas, **block) - owed[1])
+    if min(balances) <= 0:
+        runway = 0
+    elif rate == 0:
+        runway = MAX_UINT256
+    else:
+        runway = min(balances) * 864000 // rate
+    assert meta_arenas.solvencyRunway(**block) == runway
+
+
+@pytest.mark.parametrize("minted_arenas", [12], indirect=True)
+@pytest.mark.parametrize("seed", range(3))
+def test_main(meta_arenas, arena, byte, owner, user, minted_arenas, seed):
+    holder = accounts[2]
+    arena.transfer(holder, 10000 * 10**18, {"from": owner})
+    arena.approve(meta_arenas.address, 2**256 - 1, {"from": holder})
+    owners = {i: user for i in minted_arenas}
+    staked = set()
+    rng = random.Random(seed)
+    assert meta_arenas.solvencyRunway() == MAX_UINT256
+    for i in rng.sample(minted_arenas, 6):
+        meta_arenas.stakeArena(i, {"from": user})
+        staked.add(i)
+    assert_totals_match(meta_arenas, arena, byte, minted_arenas)
+    for _ in range(40):
+        chain.sleep(rng.randint(60, 86400 * 3))
+        action = rng.choice(ACTIONS)
+        i = rng.choice(minted_arenas)
+        sender = {"from": owners[i]}
+        if action == "stake" and i not in staked:
+            meta_arenas.stakeArena(i, sender)
+            staked.add(i)
+        elif action == "unstake" and i in staked:
+            meta_arenas.unstakeArena(i, sender)
+            staked.remove(i)
+        elif action == "claim" and 0 < meta_arenas.availableRewards(i)[0]:
+            # Claims can't be paid once too much was withdrawn
+            if meta_arenas.availableRewards(i)[0] <= arena.balanceOf(meta_arenas):
+                meta_arenas.claimRewards(i, sender)
+        elif action == "upgrade":
+            meta_arenas.increaseLevel(i, 100, {"from": owner})
+            meta_arenas.upgradeArenaTier(i, sender)
+        elif action == "transfer" and i not in staked:
+            receiver = holder if owners[i] == user else user
+            meta_arenas.transferFrom(owners[i], receiver, i, sender)
+            owners[i] = receiver
+        elif action == "rarity":
+            meta_arenas.setRarity([i], [rng.randrange(5)], {"from": owner})
+        elif action == "rarity_rewards":
+            rewards = rng.randint(1, 200) * 10**18
+            meta_arenas.setRarityRewards(rng.randrange(5), rewards, {"from": owner})
+        elif action == "tier_multiplier":
+            multiplier = rng.randint(0, 40)
+            meta_arenas.setTierMultiplier(rng.randrange(5), multiplier, {"from": owner})
+        elif action == "byte_enabled":
+            meta_arenas.setByteEnabled(
+                not meta_arenas.byteEndabled(), {"from": owner}
+            )
+        elif action == "withdraw":
+            # Leaves a few days of emissions, or less than the outstanding rewards
+            amount = arena.balanceOf(meta_arenas) // rng.randint(2, 4)
+            meta_arenas.withdraw(amount, 0, {"from": owner})
+        assert_totals_match(meta_arenas, arena, byte, minted_arenas)
+    # Outstanding rewards keep growing between updates, the runway shrinks
+    runway = meta_arenas.solvencyRunway()
+    chain.mine(timedelta=86400)
+    assert_totals_match(meta_arenas, arena, byte, minted_arenas)
+    if 0 < runway < MAX_UINT256:
+        assert meta_arenas.solvencyRunway() < runway
+    # Draining the balance leaves no runway while rewards are owed
+    if meta_arenas.outstandingRewards()[0] > 0:
+        meta_arenas.withdraw(arena.balanceOf(meta_arenas), 0, {"from": owner})
+        assert meta_arenas.solvencyRunway() == 0
@@ -0,0 +1,79 @@
+from brownie import accounts, chain
+from scripts.level_vouchers import (
+    LevelVoucher,
+    VoucherRelayer,
+    sign_voucher,
+    voucher_digest,
+)
+import brownie
+import pytest
+
+BOOSTS = 20
+
+
+@pytest.mark.parametrize("minted_arenas", [BOOSTS * 3 + 2], indirect=True)
+def test_main(meta_arenas, owner, user, minted_arenas):
+    booster = accounts.add()
+    owner.transfer(booster, "10 ether")
+    meta_arenas.setLevelBooster(booster.address, {"from": owner})
+    individual = minted_arenas[:BOOSTS]
+    batched = minted_arenas[BOOSTS : BOOSTS * 2]
+    vouched = minted_arenas[BOOSTS * 2 : BOOSTS * 3]
+    # One transaction per Arena from the booster
+    gas_used = {"increaseLevel": 0}
+    for i in individual:
+        tx = meta_arenas.increaseLevel(i, 3, {"from": booster})
+        gas_used["increaseLevel"] += tx.gas_used
+    # One transaction for the batch from the booster
+    with brownie.reverts():
+        meta_arenas.increaseLevels(batched, [3] * BOOSTS, {"from": user})
+    tx = meta_arenas.increaseLevels(batched, [3] * BOOSTS, {"from": booster})
+    gas_used["increaseLevels"] = tx.gas_used
+    # One voucher signed off-chain, relayed by any account
+    relayer = VoucherRelayer(meta_arenas, booster.private_key)
+    for i in vouched:
+        relayer.boost(i, 3)
+    ((voucher, signature),) = relayer.sign()
+    assert meta_arenas.levelVoucherDigest(voucher) == voucher_digest(
+        voucher, meta_arenas.address, chain.id
+    )
+    assert not meta_arenas.levelVoucherRedeemed(voucher.nonce)
+    (tx,) = relayer.relay(owner)
+    gas_used["redeemLevelVoucher"] = tx.gas_used
+    assert meta_arenas.levelVoucherRedeemed(voucher.nonce)
+    for i in individual + batched + vouched:
+        assert meta_arenas.arenaDetails(i)[1] == 3
+    for function_name, gas in gas_used.items():
+        print(f"{function_name}: {gas} gas for {BOOSTS} boosts, {gas // BOOSTS} each")
+    assert gas_used["increaseLevels"] < gas_used["increaseLevel"]
+    assert gas_used["redeemLevelVoucher"] < gas_used["increaseLevel"]
+    # Replays are rejected, or ignored when redeemed with a stake
+    with brownie.reverts("Voucher already redeemed"):
+        meta_arenas.redeemLevelVoucher(voucher, signature, {"from": user})
+    meta_arenas.stakeArenasWithVoucher(
+        [vouched[0]], voucher, signature, {"from": user}
+    )
+    assert meta_arenas.arenaDetails(vouched[0])[1] == 3
+    assert meta_arenas.arenaDetails(vouched[0])[3]
+    # The holder redeems a fresh voucher in the upgrade transaction
+    i = minted_arenas[-1]
+    relayer.boost(i, 10)
+    ((voucher, signature),) = relayer.sign()
+    assert voucher.nonce == 1
+    assert meta_arenas.arenaDetails(i)[0] == 0
+    meta_arenas.upgradeArenaTierWithVoucher(i, voucher, signature, {"from": user})
+    assert meta_arenas.arenaDetails(i)[0] == 1
+    # Vouchers need the booster's signature and must not be expired
+    forged = LevelVoucher([minted_arenas[-2]], [100], 2, chain.time() + 3600)
+    forged_signature = sign_voucher(
+        forged, accounts.add().private_key, meta_arenas.address, chain.id
+    )
+    with brownie.reverts("Invalid voucher signature"):
+        meta_arenas.redeemLevelVoucher(forged, forged_signature, {"from": user})
+    expired = LevelVoucher([minted_arenas[-2]], [100], 2, chain.time() - 1)
+    expired_signature = sign_voucher(
+        expired, booster.private_key, meta_arenas.address, chain.id
+    )
+    with brownie.reverts("Voucher expired"):
+        meta_arenas.redeemLevelVoucher(expired, expired_signature, {"from": user})
+    assert meta_arenas.arenaDetails(minted_arenas[-2])[1] == 0
@@ -0,0 +1,116 @@
+from brownie import chain, web3
+from scripts.helpful_scripts import RARITY_NAMES
+from scripts.metadata_load_test import load_test
+from scripts.metadata_service import (
+    MetadataService,
+    read_base_metadata,
+    start_server,
+)
+from scripts.rpc_client import RpcClient
+import aiohttp
+import asyncio
+import os
+import pytest
+import tempfile
+
+
+def write_metadata(path, count):
+    with open(path, "w", newline="") as metadata:
+        metadata.write("name,description,image,Map,Weather,b,c,rarity\n")
+        for n in range(count):
+            rarity = RARITY_NAMES[n % 5]
+            metadata.write(f"Arena {n + 1},An Arena,ipfs://{n + 1}.png,Desert,,,,")
+            metadata.write(f"{rarity}\n")
+
+
+def attributes(document):
+    return {
+        attribute["trait_type"]: attribute["value"]
+        for attribute in document["attributes"]
+    }
+
+
+def assert_matches_chain(document, meta_arenas, token_id):
+    tier, level, rarity, staked, _, _ = meta_arenas.arenaDetails(
+        token_id, block_identifier=chain.height
+    )
+    assert attributes(document) == {
+        "Map": "Desert",
+        "Rarity": RARITY_NAMES[rarity],
+        "Tier": tier,
+        "Level": level,
+        "Staked": "Yes" if staked else "No",
+    }
+
+
+async def serve_documents(meta_arenas, owner, user, token_ids, metadata):
+    async with RpcClient(web3.provider.endpoint_uri) as client:
+        service = MetadataService(client, meta_arenas.address, metadata)
+        await service.sync()
+        runner = await start_server(service, port=0)
+        host, port = runner.addresses[0][:2]
+        base_url = f"http://{host}:{port}"
+        try:
+            async with aiohttp.ClientSession() as session:
+
+                async def get(path):
+                    async with session.get(f"{base_url}/{path}") as response:
+                        if response.status != 200:
+                            return response.status
+                        return await response.json()
+
+                documents = [await get(f"{i}.json") for i in token_ids]
+                assert documents[0]["name"] == "Arena 1001"
+                assert documents[0]["image"] == "ipfs://1001.png"
+                for i, document in zip(token_ids, documents):
+                    assert_matches_chain(document, meta_arenas, i)
+                # Served from the cache without any RPC request
+                requests = client.stats["http_requests"]
+                assert [await get(f"{i}.json") for i in token_ids] == documents
+                assert client.stats["http_requests"] == requests
+                assert await get("5000.json") == 404
+                assert await get("arena.json") == 404
+                # Arenas touched by new logs are refreshed together
+                meta_arenas.increaseLevel(token_ids[0], 7, {"from": owner})
+                meta_arenas.stakeArena(token_ids[1], {"from": user})
+                requests = client.stats["http_requests"]
+                assert await service.sync() == 2
+                assert client.stats["http_requests"] - requests <= 3
+                for i in token_ids[:3]:
+                    assert_matches_chain(await get(f"{i}.json"), meta_arenas, i)
+                assert client.stats["http_requests"] - requests <= 3
+                metrics = await get("metrics")
+                assert metrics["refreshed"] == 2
+                assert metrics["hit_rate"] > 0.5
+                assert metrics["not_found"] == 1
+        finally:
+            await runner.cleanup()
+
+
+@pytest.mark.parametrize("minted_arenas", [10], indirect=True)
+def test_main(meta_arenas, owner, user, minted_arenas):
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "metadata.txt")
+        write_metadata(path, 1010)
+        metadata = read_base_metadata(path)
+    assert len(metadata) == 1010
+    assert metadata[1001]["Map"] == "Desert"
+    asyncio.run(serve_documents(meta_arenas, owner, user, minted_arenas, metadata))
+    # Small load test, levels change between the rounds
+    results = asyncio.run(
+        load_test(
+            web3.provider.endpoint_uri,
+            meta_arenas,
+            owner,
+            minted_arenas,
+            rounds=2,
+            requests=200,
+        )
+    )
+    for result in results:
+        print(
+            f"{result['requests_per_second']:.0f} req/s, "
+            f"p50 {result['p50_ms']:.1f}ms, p95 {result['p95_ms']:.1f}ms"
+        )
+        assert result["statuses"] == {200: 200}
+    assert results[-1]["metrics"]["hit_rate"] > 0.9
@@ -0,0 +1,57 @@
+from brownie import Multicall, accounts
+from scripts.migrate_arenas import migrate_arenas, old_arenas_of
+import brownie
+
+MIGRATED_PER_USER = [10, 50]
+
+
+def test_main(meta_arenas, old_arenas, owner):
+    batch_users = accounts[1:3]
+    single_users = accounts[3:5]
+    multicall = Multicall.deploy({"from": owner})
+    # Old Arenas 0-19 belong to the owner, give 10 and 50 more to two pairs of users
+    for user, amount in zip(batch_users + single_users, MIGRATED_PER_USER * 2):
+        for _ in range(amount // 10):
+            old_arenas.mintForAddress(10, user.address, {"from": owner})
+    # approve() and migrateArena() for every token
+    single_gas = {}
+    for user, amount in zip(single_users, MIGRATED_PER_USER):
+        single_gas[amount] = 0
+        for i in old_arenas_of(old_arenas, user.address, multicall):
+            single_gas[amount] += old_arenas.approve(
+                meta_arenas.address, i, {"from": user}
+            ).gas_used
+            single_gas[amount] += meta_arenas.migrateArena(i, {"from": user}).gas_used
+    # One setApprovalForAll() and migrateArenas() per batch
+    batch_gas = {}
+    for user, amount in zip(batch_users, MIGRATED_PER_USER):
+        old_token_ids = old_arenas_of(old_arenas, user.address, multicall)
+        assert len(old_token_ids) == amount
+        transactions = migrate_arenas(meta_arenas, old_arenas, user, multicall)
+        batch_gas[amount] = sum(tx.gas_used for tx in transactions)
+        assert old_arenas.balanceOf(user.address) == 0
+        assert sorted(meta_arenas.tokensOfOwner(user.address)) == [
+            i + 1 for i in old_token_ids
+        ]
+        assert not old_arenas.isApprovedForAll(user.address, meta_arenas.address)
+    for amount in MIGRATED_PER_USER:
+        print(
+            f"Migrating {amount}: {single_gas[amount]} gas in {amount * 2} "
+            f"transactions, {batch_gas[amount]} gas batched"
+        )
+        assert batch_gas[amount] < single_gas[amount]
+    # Only the owner of an old Arena can migrate it, even with an approval in place
+    old_arenas.setApprovalForAll(meta_arenas.address, True, {"from": owner})
+    with brownie.reverts("You don't own this arena!"):
+        meta_arenas.migrateArenas([0, 1], {"from": batch_users[0]})
+    with brownie.reverts("You don't own this arena!"):
+        meta_arenas.migrateArena(0, {"from": batch_users[0]})
+    # Token ID 0 is found even though walletOfOwner() skips it, and burned
+    # Arenas make walletOfOwner() revert, which falls back to the ownerOf() scan
+    with brownie.reverts():
+        old_arenas.walletOfOwner(owner.address)
+    assert old_arenas_of(old_arenas, owner.address, multicall) == list(range(20))
+    assert old_arenas_of(old_arenas, owner.address) == list(range(20))
+    migrate_arenas(meta_arenas, old_arenas, owner, multicall, batch_size=8)
+    assert meta_arenas.ownerOf(1) == owner.address
+    assert meta_arenas.balanceOf(owner.address) == 3 + 20
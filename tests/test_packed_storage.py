@@ -0,0 +1,75 @@
+from brownie import Contract, Metarenas, MetarenasV2, chain
+from scripts.helpful_scripts import upgrade
+
+
+def run_scenario(meta_arenas, owner, user, old_arenas, arena, old_token_id):
+    gas_used = {}
+    gas_used["mintForAddress"] = meta_arenas.mintForAddress(
+        3, user.address, {"from": owner}
+    ).gas_used
+    old_arenas.approve(meta_arenas.address, old_token_id, {"from": owner})
+    gas_used["migrateArena"] = meta_arenas.migrateArena(
+        old_token_id, {"from": owner}
+    ).gas_used
+    gas_used["setRarity"] = meta_arenas.setRarity(
+        [1001, 1002, 1003], [4, 2, 1], {"from": owner}
+    ).gas_used
+    gas_used["stakeArena"] = meta_arenas.stakeArena(1001, {"from": user}).gas_used
+    chain.mine(blocks=10, timedelta=259200 * 5)
+    gas_used["increaseLevel"] = meta_arenas.increaseLevel(
+        1001, 5, {"from": owner}
+    ).gas_used
+    gas_used["claimRewards"] = meta_arenas.claimRewards(1001, {"from": user}).gas_used
+    gas_used["upgradeArenaTier"] = meta_arenas.upgradeArenaTier(
+        1001, {"from": user}
+    ).gas_used
+    chain.mine(blocks=10, timedelta=86400)
+    gas_used["unstakeArena"] = meta_arenas.unstakeArena(1001, {"from": user}).gas_used
+    gas_used["transferFrom"] = meta_arenas.transferFrom(
+        user.address, owner.address, 1001, {"from": user}
+    ).gas_used
+    return gas_used
+
+
+def test_main(owner, user, proxy_admin, arena, passes, old_arenas, deploy_proxy):
+    stack = (proxy_admin, old_arenas, passes, arena)
+    legacy_proxy, implementation, legacy_arenas = deploy_proxy(*stack)
+    _, _, packed_arenas = deploy_proxy(*stack)
+    for meta_arenas in [legacy_arenas, packed_arenas]:
+        meta_arenas.setLevelBooster(owner.address, {"from": owner})
+        arena.transfer(meta_arenas.address, 100000 * 10**18, {"from": owner})
+    # Proxy running the V2 implementation with the unpacked layout
+    implementation2 = MetarenasV2.deploy({"from": owner})
+    upgrade(owner, legacy_proxy, implementation2, proxy_admin)
+    legacy_arenas = Contract.from_abi(
+        "MetaArenas", legacy_proxy.address, MetarenasV2.abi
+    )
+    # Proxy running the packed layout from a fresh deployment
+    packed_arenas.completeArenaStorageMigration({"from": owner})
+    # Run the same scenario on both
+    before = run_scenario(legacy_arenas, owner, user, old_arenas, arena, 0)
+    after = run_scenario(packed_arenas, owner, user, old_arenas, arena, 1)
+    for function_name in before:
+        print(f"{function_name}: {before[function_name]} -> {after[function_name]} gas")
+    for function_name in ["stakeArena", "unstakeArena", "upgradeArenaTier"]:
+        assert after[function_name] < before[function_name]
+    # Upgrade the V2 proxy and assert Arenas are read from the old layout
+    legacy_arenas.stakeArena(1002, {"from": user})
+    legacy_arenas.increaseLevel(1003, 7, {"from": owner})
+    chain.mine(blocks=10, timedelta=86400)
+    token_ids = [1001, 1002, 1003, 2]
+    expected = [legacy_arenas.arenas(i) for i in token_ids]
+    upgrade(owner, legacy_proxy, implementation, proxy_admin)
+    meta_arenas = Contract.from_abi("MetaArenas", legacy_proxy.address, Metarenas.abi)
+    assert [meta_arenas.arenas(i) for i in token_ids] == expected
+    assert not meta_arenas.arenaStorageMigrated()
+    # Migrate to the packed layout and assert nothing changed
+    meta_arenas.migrateArenaStorage(token_ids, {"from": owner})
+    meta_arenas.completeArenaStorageMigration({"from": owner})
+    assert [meta_arenas.arenas(i) for i in token_ids] == expected
+    # Staked Arena keeps accumulating rewards and unstakes after migration
+    chain.mine(blocks=10, timedelta=86400)
+    assert meta_arenas.availableRewards(1002)[0] > 0
+    meta_arenas.unstakeArena(1002, {"from": user})
+    assert meta_arenas.arenaDetails(1002)[3] is False
+    assert meta_arenas.arenaDetails(1003)[1] == 7
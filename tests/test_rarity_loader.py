@@ -0,0 +1,65 @@
+from scripts.helpful_scripts import RARITY_NAMES, read_arena_rarities
+from scripts.load_rarities import load_rarities, onchain_rarities, send_chunk
+import itertools
+import os
+import pytest
+import random
+import tempfile
+
+
+def write_metadata(path, rarities):
+    with open(path, "w", newline="") as metadata:
+        metadata.write("name,description,image,a,b,c,d,rarity\n")
+        for n, rarity in enumerate(rarities):
+            metadata.write(f"Arena {n + 1},,,,,,,{RARITY_NAMES[rarity]}\n")
+
+
+def test_main(meta_arenas, lens, owner):
+    rng = random.Random(9)
+    rarities = [rng.randrange(5) for _ in range(1000)]
+    # Same 100 rarities through both entry points
+    unpacked_tx = meta_arenas.setRarity(
+        list(range(2001, 2101)), rarities[:100], {"from": owner}
+    )
+    packed_tx = meta_arenas.setRarityPacked(2101, bytes(rarities[:100]), {"from": owner})
+    assert onchain_rarities(meta_arenas, lens, 2001, 100) == rarities[:100]
+    assert onchain_rarities(meta_arenas, lens, 2101, 100) == rarities[:100]
+    print(
+        f"setRarity: {len(unpacked_tx.input) // 2} calldata bytes, {unpacked_tx.gas_used} gas"
+    )
+    print(
+        f"setRarityPacked: {len(packed_tx.input) // 2} calldata bytes, {packed_tx.gas_used} gas"
+    )
+    assert len(packed_tx.input) * 10 < len(unpacked_tx.input)
+    assert packed_tx.gas_used < unpacked_tx.gas_used
+    with pytest.raises(Exception):
+        meta_arenas.setRarityPacked(1, bytes([5]), {"from": owner})
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "metadata.txt")
+        write_metadata(path, rarities)
+        assert [r for _, r in read_arena_rarities(path)] == rarities
+        # Rarities never set don't read as Common
+        assert onchain_rarities(meta_arenas, lens, 1, 5) == [None] * 5
+        # Interrupted run that only got through the first 600 rarities
+        first_run = load_rarities(
+            meta_arenas,
+            lens,
+            owner,
+            itertools.islice(read_arena_rarities(path), 600),
+        )
+        assert first_run["written"] == 600
+        assert onchain_rarities(meta_arenas, lens, 1, 600) == rarities[:600]
+        # Resume: only the last 400 are compared as missing
+        second_run = load_rarities(meta_arenas, lens, owner, read_arena_rarities(path))
+        assert second_run["skipped"] >= 600
+        assert second_run["written"] <= 400
+        assert onchain_rarities(meta_arenas, lens, 1, 1000) == rarities
+        for tx in first_run["transactions"] + second_run["transactions"]:
+            assert tx.gas_used < 5_000_000
+        # Nothing left to write
+        third_run = load_rarities(meta_arenas, lens, owner, read_arena_rarities(path))
+        assert third_run["transactions"] == []
+    # A failing chunk is split, the valid half lands and the loader can resume
+    with pytest.raises(RuntimeError):
+        send_chunk(meta_arenas, owner, 3001, bytes([1, 2, 3, 7]))
+    assert onchain_rarities(meta_arenas, lens, 3001, 2) == [1, 2]
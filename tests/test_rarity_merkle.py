@@ -0,0 +1,72 @@
+from brownie import accounts, chain
+from scripts.rarity_merkle import (
+    RarityMerkleTree,
+    load_proofs_binary,
+    stake_with_proofs,
+    upgrade_tier_with_proof,
+    write_proofs_binary,
+)
+import brownie
+import os
+import random
+import tempfile
+
+
+def test_main(meta_arenas, owner, user):
+    meta_arenas.mintForAddress(20, user.address, {"from": owner})
+    # Commit the rarities of a whole district with one root
+    rng = random.Random(10)
+    tree = RarityMerkleTree((1001 + n, rng.randrange(1, 5)) for n in range(1000))
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "rarity_proofs.bin")
+        write_proofs_binary(tree, path)
+        assert os.path.getsize(path) < 1100
+        tree = load_proofs_binary(path)
+    root_tx = meta_arenas.setRarityMerkleRoot(tree.root, {"from": owner})
+    # Rarity is proven and cached when staking
+    stake_with_proofs(meta_arenas, user, [1001], tree)
+    tx = stake_with_proofs(meta_arenas, user, list(range(1002, 1011)), tree)
+    proof_gas = tx.gas_used
+    for i in range(1001, 1011):
+        assert meta_arenas.arenaDetails(i)[2] == tree.rarities[i]
+    # The cached rarity is used for rewards
+    chain.mine(blocks=1, timedelta=86400)
+    rewards = meta_arenas.availableRewards(1002)[0]
+    # Tier 0 earns half of the rarity rewards per day
+    expected_per_day = meta_arenas.rarityRewardsPerDay(tree.rarities[1002]) // 2
+    assert abs(rewards - expected_per_day) < expected_per_day / 1000
+    # Wrong rarity or proof is rejected
+    wrong_rarity = (tree.rarities[1011] + 1) % 5
+    with brownie.reverts("Invalid proof"):
+        meta_arenas.stakeArenaWithProof(
+            1011, wrong_rarity, tree.proof(1011), {"from": user}
+        )
+    with brownie.reverts("Invalid proof"):
+        meta_arenas.stakeArenaWithProof(
+            1011, tree.rarities[1011], tree.proof(1012), {"from": user}
+        )
+    # Rarities set by the Owner are kept, later proofs are ignored
+    meta_arenas.setRarity([1011], [0], {"from": owner})
+    stake_with_proofs(meta_arenas, user, [1011], tree)
+    assert meta_arenas.arenaDetails(1011)[2] == 0
+    # Anyone can prove a rarity without staking
+    meta_arenas.proveRarity(
+        1012, tree.rarities[1012], tree.proof(1012), {"from": accounts[2]}
+    )
+    assert meta_arenas.arenaDetails(1012)[2] == tree.rarities[1012]
+    # Rarity is proven when upgrading the tier
+    meta_arenas.increaseLevel(1013, 10, {"from": owner})
+    upgrade_tier_with_proof(meta_arenas, user, 1013, tree)
+    assert meta_arenas.arenaDetails(1013)[0] == 1
+    assert meta_arenas.arenaDetails(1013)[2] == tree.rarities[1013]
+    # Writing the same 9 rarities the old way
+    set_rarity_tx = meta_arenas.setRarity(
+        list(range(1014, 1023)),
+        [tree.rarities[i] for i in range(1014, 1023)],
+        {"from": owner},
+    )
+    print(
+        f"Root: {root_tx.gas_used} gas for the whole district, "
+        f"setRarity: {set_rarity_tx.gas_used // 9} gas per Arena, "
+        f"staking 9 with proofs: {proof_gas} gas"
+    )
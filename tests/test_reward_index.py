@@ -0,0 +1,77 @@
+from brownie import chain
+from scripts.rewards_model import RewardsModel, piecewise_rewards
+import random
+
+
+def assert_matches_model(meta_arenas, model, token_ids):
+    now = chain[-1].timestamp
+    for i in token_ids:
+        rewards = meta_arenas.availableRewards(i, block_identifier=chain.height)
+        assert rewards[0] == model.available(i, now)[0]
+
+
+def test_main(meta_arenas, arena, owner, user):
+    # Mint one Metarena per rarity and one to upgrade to Tier 1
+    meta_arenas.mintForAddress(6, user.address, {"from": owner})
+    token_ids = list(range(1001, 1007))
+    rarities = [0, 1, 2, 3, 4, 2]
+    meta_arenas.setRarity(token_ids, rarities, {"from": owner})
+    model = RewardsModel()
+    for i, rarity in zip(token_ids, rarities):
+        model.set_rarity(i, rarity, chain[-1].timestamp)
+    stake_times = {}
+    for i in token_ids:
+        tx = meta_arenas.stakeArena(i, {"from": user})
+        model.stake(i, tx.timestamp)
+        stake_times[i] = tx.timestamp
+    # Metarena 1001 is never touched, track the rate of its rarity and tier
+    schedule = [(stake_times[1001], model.rate(0, 0))]
+    # Upgrade 1006 to Tier 1
+    meta_arenas.increaseLevel(1006, 10, {"from": owner})
+    tx = meta_arenas.upgradeArenaTier(1006, {"from": user})
+    model.upgrade_tier(1006, tx.timestamp)
+    assert_matches_model(meta_arenas, model, token_ids)
+    # Randomized time and rate schedule
+    rng = random.Random(1006)
+    for _ in range(40):
+        chain.sleep(rng.randint(3600, 86400 * 5))
+        action = rng.choice(
+            ["rarity_rewards", "tier_multiplier", "claim", "restake", "rarity"]
+        )
+        if action == "rarity_rewards":
+            rarity = rng.randrange(5)
+            rewards = rng.randint(1, 200) * 10**18
+            tx = meta_arenas.setRarityRewards(rarity, rewards, {"from": owner})
+            model.set_rarity_rewards(rarity, rewards, tx.timestamp)
+        elif action == "tier_multiplier":
+            tier = rng.randrange(2)
+            multiplier = rng.randint(1, 40)
+            tx = meta_arenas.setTierMultiplier(tier, multiplier, {"from": owner})
+            model.set_tier_multiplier(tier, multiplier, tx.timestamp)
+        elif action == "claim":
+            i = rng.choice(token_ids[1:])
+            balance_before = arena.balanceOf(user.address)
+            tx = meta_arenas.claimRewards(i, {"from": user})
+            claimed = model.claim(i, tx.timestamp)[0]
+            assert arena.balanceOf(user.address) - balance_before == claimed
+        elif action == "restake":
+            i = rng.choice(token_ids[1:])
+            tx = meta_arenas.unstakeArena(i, {"from": user})
+            model.unstake(i, tx.timestamp)
+            chain.sleep(rng.randint(60, 86400))
+            tx = meta_arenas.stakeArena(i, {"from": user})
+            model.stake(i, tx.timestamp)
+        else:
+            i = rng.choice(token_ids[1:])
+            rarity = rng.randrange(5)
+            tx = meta_arenas.setRarity([i], [rarity], {"from": owner})
+            model.set_rarity(i, rarity, tx.timestamp)
+        if schedule[-1][1] != model.rate(0, 0):
+            schedule.append((tx.timestamp, model.rate(0, 0)))
+        assert_matches_model(meta_arenas, model, token_ids)
+    # Metarena 1001 earned the exact integral of its rate schedule, the indexes
+    # at both ends are rounded down so it can be one wei more
+    now = chain[-1].timestamp
+    rewards = meta_arenas.availableRewards(1001, block_identifier=chain.height)[0]
+    expected = piecewise_rewards(schedule, stake_times[1001], now)
+    assert expected <= rewards <= expected + 1
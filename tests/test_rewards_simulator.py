@@ -0,0 +1,102 @@
+from brownie import chain
+from scripts.rewards_simulator import ArenaSimulator, random_rarities
+import pytest
+import random
+import time
+
+
+def assert_matches_simulator(meta_arenas, simulator, token_ids):
+    simulator.advance(chain[-1].timestamp)
+    levels = simulator.levels()
+    # arenaDetails() derives canUpgrade_ from the stored level
+    can_upgrade = simulator.level >= simulator.levels_to_upgrade[simulator.tier]
+    rewards = simulator.available_rewards()
+    for row, i in enumerate(token_ids):
+        details = meta_arenas.arenaDetails(i, block_identifier=chain.height)
+        assert details[0] == simulator.tier[row]
+        assert details[1] == levels[row]
+        assert details[2] == simulator.rarity[row]
+        assert details[3] == simulator.staked[row]
+        assert details[4] == can_upgrade[row]
+        assert details[5] == simulator.time_of_stake[row]
+        assert (
+            meta_arenas.availableRewards(i, block_identifier=chain.height)[0]
+            == rewards[row]
+        )
+    for rarity in range(5):
+        for tier in range(3):
+            assert (
+                meta_arenas.rewardIndex(rarity, tier, block_identifier=chain.height)[0]
+                == simulator.indexes[rarity, tier]
+            )
+
+
+@pytest.mark.parametrize("minted_arenas", [10], indirect=True)
+def test_main(meta_arenas, arena, owner, user, minted_arenas):
+    token_ids = minted_arenas
+    rarities = [row % 5 for row in range(10)]
+    simulator = ArenaSimulator(rarities, chain[-1].timestamp)
+    # Replay random actions, the simulator runs at the timestamps of the transactions
+    rng = random.Random(16)
+    for _ in range(50):
+        chain.sleep(rng.randint(3600, 86400 * 4))
+        row = rng.randrange(10)
+        i = token_ids[row]
+        action = rng.choice(
+            ["stake", "claim", "level", "upgrade", "rarity", "rates", "transfer"]
+        )
+        if action == "stake" and not simulator.staked[row]:
+            tx = meta_arenas.stakeArena(i, {"from": user})
+            simulator.advance(tx.timestamp)
+            simulator.stake([row])
+        elif action == "stake":
+            tx = meta_arenas.unstakeArena(i, {"from": user})
+            simulator.advance(tx.timestamp)
+            simulator.unstake([row])
+        elif action == "claim" and simulator.staked[row]:
+            balance = arena.balanceOf(user.address)
+            tx = meta_arenas.claimRewards(i, {"from": user})
+            simulator.advance(tx.timestamp)
+            claimed = simulator.claim([row])
+            assert arena.balanceOf(user.address) - balance == claimed
+        elif action == "level":
+            levels = rng.randint(1, 30)
+            tx = meta_arenas.increaseLevel(i, levels, {"from": owner})
+            simulator.advance(tx.timestamp)
+            simulator.increase_level([row], levels)
+        elif action == "upgrade" and meta_arenas.arenaDetails(i)[4]:
+            if simulator.tier[row] < 2:
+                tx = meta_arenas.upgradeArenaTier(i, {"from": user})
+                simulator.advance(tx.timestamp)
+                simulator.upgrade([row])
+        elif action == "rarity":
+            rarity = rng.randrange(5)
+            tx = meta_arenas.setRarity([i], [rarity], {"from": owner})
+            simulator.advance(tx.timestamp)
+            simulator.set_rarity([row], rarity)
+        elif action == "rates":
+            rarity, rewards = rng.randrange(5), rng.randint(1, 200) * 10**18
+            tx = meta_arenas.setRarityRewards(rarity, rewards, {"from": owner})
+            simulator.advance(tx.timestamp)
+            simulator.set_rarity_rewards(rarity, rewards)
+            tier, multiplier = rng.randrange(3), rng.randint(1, 40)
+            tx = meta_arenas.setTierMultiplier(tier, multiplier, {"from": owner})
+            simulator.advance(tx.timestamp)
+            simulator.set_tier_multiplier(tier, multiplier)
+        elif action == "transfer" and not simulator.staked[row]:
+            tx = meta_arenas.transferFrom(user, user, i, {"from": user})
+            simulator.advance(tx.timestamp)
+            simulator.transfer([row])
+        assert_matches_simulator(meta_arenas, simulator, token_ids)
+    # The whole collection over three years at day resolution
+    started = time.perf_counter()
+    simulator = ArenaSimulator(random_rarities(4000), chain[-1].timestamp)
+    history = simulator.run(3 * 365)
+    seconds = time.perf_counter() - started
+    print(
+        f"4000 Arenas over 3 years in {seconds:.2f}s, "
+        f"{sum(history['emitted']) / 10**18:,.0f} $ARENA claimed"
+    )
+    assert seconds < 60
+    assert len(history["day"]) == 3 * 365
+    assert sum(history["emitted"]) == sum(simulator.claimed)
@@ -0,0 +1,58 @@
+from brownie import chain, web3
+from scripts.rpc_client import (
+    MetarenasReader,
+    RpcClient,
+    RpcError,
+    benchmark_reads,
+)
+import asyncio
+import pytest
+
+
+async def read_arenas(url, address, token_ids, user):
+    async with RpcClient(url) as client:
+        reader = MetarenasReader(client, address)
+        await reader.pin_block()
+        details = await reader.many("arena_details", token_ids)
+        rewards = await reader.many("available_rewards", token_ids)
+        owners = await reader.many("owner_of", token_ids)
+        staked = await reader.user_staked_arenas(user)
+        # Duplicate reads in the same block share one request
+        requests = client.stats["http_requests"]
+        await reader.many("arena_details", token_ids[:10] * 10)
+        assert client.stats["http_requests"] == requests
+        with pytest.raises(RpcError):
+            await reader.owner_of(5000)
+        return details, rewards, owners, staked, client.stats
+
+
+@pytest.mark.parametrize("minted_arenas", [1000], indirect=True)
+def test_main(meta_arenas, user, minted_arenas):
+    # A full district of 1000 Arenas, some of them staked
+    token_ids = minted_arenas
+    meta_arenas.stakeArenas(token_ids[:20], {"from": user})
+    chain.mine(blocks=1, timedelta=86400)
+    url = web3.provider.endpoint_uri
+    details, rewards, owners, staked, stats = asyncio.run(
+        read_arenas(url, meta_arenas.address, token_ids, user.address)
+    )
+    # Same values as brownie's one by one calls
+    for n in range(0, 1000, 37):
+        assert tuple(details[n]) == tuple(meta_arenas.arenaDetails(token_ids[n]))
+        assert tuple(rewards[n]) == tuple(meta_arenas.availableRewards(token_ids[n]))
+        assert owners[n] == meta_arenas.ownerOf(token_ids[n])
+    assert sorted(staked) == token_ids[:20]
+    assert [d.staked for d in details] == [True] * 20 + [False] * 980
+    # 3000 calls in a few batch requests
+    assert stats["http_requests"] < 50
+    # Sequential against concurrent reads of the whole district
+    results = asyncio.run(benchmark_reads(url, meta_arenas.address, token_ids))
+    print(
+        f"1000 arenaDetails(): {results['sequential_seconds']:.2f}s in "
+        f"{results['sequential_requests']} requests sequentially, "
+        f"{results['concurrent_seconds']:.2f}s in "
+        f"{results['concurrent_requests']} requests concurrently"
+    )
+    assert results["details"] == details
+    assert results["concurrent_requests"] < results["sequential_requests"]
+    assert results["concurrent_seconds"] < results["sequential_seconds"]
@@ -0,0 +1,109 @@
+from brownie import Multicall, chain
+from scripts.helpful_scripts import RARITY_NAMES
+from scripts.snapshot_exporter import (
+    claimed_between,
+    diff_snapshots,
+    export_snapshot,
+    owner_addresses,
+    read_snapshot,
+    rewards,
+    write_snapshot,
+)
+import os
+import pytest
+import tempfile
+import time
+
+# Minted to the owner by initialize(), without a rarity
+INITIALIZER_ARENAS = [118, 188, 216]
+
+
+def timed_export(meta_arenas, lens, multicall, folder, block=None):
+    started = time.perf_counter()
+    snapshot = export_snapshot(meta_arenas, lens, multicall, block)
+    seconds = time.perf_counter() - started
+    path = os.path.join(folder, f"metarenas-{snapshot.block}")
+    size = write_snapshot(snapshot, path)
+    print(
+        f"{len(snapshot.columns['token_id'])} Metarenas exported in "
+        f"{seconds:.2f}s, {size} bytes"
+    )
+    return read_snapshot(path)
+
+
+def assert_matches_chain(snapshot, meta_arenas, token_ids):
+    block = {"block_identifier": snapshot.block}
+    columns = snapshot.columns
+    unclaimed = rewards(snapshot, "unclaimed_arena")
+    pending = rewards(snapshot, "pending_arena")
+    owners = owner_addresses(snapshot)
+    for n, i in enumerate(columns["token_id"].tolist()):
+        if i not in token_ids:
+            continue
+        tier, level, rarity, staked, _, time_of_stake = meta_arenas.arenaDetails(
+            i, **block
+        )
+        assert (columns["tier"][n], columns["level"][n]) == (tier, level)
+        assert (columns["rarity"][n], columns["staked"][n]) == (rarity, staked)
+        assert columns["time_of_stake"][n] == time_of_stake
+        assert owners[n] == meta_arenas.ownerOf(i, **block)
+        assert unclaimed[n] == meta_arenas.arenaInfo(i, **block)[6]
+        assert unclaimed[n] + pending[n] == meta_arenas.availableRewards(i, **block)[0]
+
+
+@pytest.mark.parametrize("minted_arenas", [1000], indirect=True)
+def test_main(meta_arenas, lens, owner, user, minted_arenas):
+    multicall = Multicall.deploy({"from": owner})
+    meta_arenas.stakeArenas(minted_arenas[:100], {"from": user})
+    meta_arenas.stakeArenas(minted_arenas[500:600], {"from": user})
+    chain.mine(timedelta=86400 * 3)
+    with tempfile.TemporaryDirectory() as folder:
+        first = timed_export(meta_arenas, lens, multicall, folder)
+        assert first.columns["token_id"].tolist() == INITIALIZER_ARENAS + minted_arenas
+        assert int(first.columns["staked"].sum()) == 200
+        sample = set(minted_arenas[95:105] + minted_arenas[595:605])
+        assert_matches_chain(first, meta_arenas, sample)
+        # Rewards are claimed and accrue, levels grow until the second block
+        meta_arenas.claimAllRewards(minted_arenas[:50], {"from": user})
+        meta_arenas.unstakeArenas(minted_arenas[500:520], {"from": user})
+        meta_arenas.increaseLevel(minted_arenas[1], 4, {"from": owner})
+        chain.mine(timedelta=86400 * 2)
+        second = timed_export(meta_arenas, lens, multicall, folder)
+        assert_matches_chain(second, meta_arenas, sample)
+        # Exports pinned to a past block don't see the later changes
+        pinned = export_snapshot(meta_arenas, lens, multicall, first.block)
+        for name, values in first.columns.items():
+            assert pinned.columns[name].tolist() == values.tolist()
+        # Emissions per rarity between both blocks
+        claimed = claimed_between(meta_arenas, first.block, second.block)
+        assert sorted(claimed) == minted_arenas[:50]
+        diff = diff_snapshots(first, second, claimed)
+        staked_ids = set(minted_arenas[:100] + minted_arenas[520:600])
+        # Staked until the unstake, so they earned part of the interval
+        earning_ids = staked_ids | set(minted_arenas[500:520])
+        for rarity, name in enumerate(RARITY_NAMES):
+            arenas = [i for i in minted_arenas if (i - minted_arenas[0]) % 5 == rarity]
+            emitted = sum(
+                meta_arenas.availableRewards(i, block_identifier=second.block)[0]
+                - meta_arenas.availableRewards(i, block_identifier=first.block)[0]
+                + claimed.get(i, 0)
+                for i in arenas
+                if i in earning_ids
+            )
+            # The initializer Arenas count as Common
+            expected = len(arenas) + (len(INITIALIZER_ARENAS) if rarity == 0 else 0)
+            assert diff[name]["arenas"] == expected
+            assert diff[name]["staked"] == len(staked_ids.intersection(arenas))
+            assert diff[name]["emitted_arena"] == emitted > 0
+        assert sum(stats["levels_gained"] for stats in diff.values()) >= 4
+        # Grow the collection to 4000 Arenas
+        for _ in range(3):
+            meta_arenas.addDistrict({"from": owner})
+        for _ in range(30):
+            meta_arenas.mintForAddress(100, user.address, {"from": owner})
+        full = timed_export(meta_arenas, lens, multicall, folder)
+        total = len(INITIALIZER_ARENAS) + 4000
+        assert len(full.columns["token_id"]) == total
+        assert full.columns["token_id"][-1] == minted_arenas[0] + 3999
+        diff = diff_snapshots(second, full)
+        assert sum(stats["arenas"] for stats in diff.values()) == total
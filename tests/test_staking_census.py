@@ -0,0 +1,34 @@
+from brownie import Multicall
+from scripts.total_staked_arenas import staking_census
+import pytest
+
+
+@pytest.mark.parametrize("minted_arenas", [1000], indirect=True)
+def test_main(meta_arenas, owner, user, minted_arenas):
+    # Deploy Multicall next to Metarenas
+    multicall = Multicall.deploy({"from": owner})
+    # A full district of 1000 Metarenas, the fixture sets rarities in turn
+    token_ids = minted_arenas
+    rarities = {i: n % 5 for n, i in enumerate(token_ids)}
+    # Stake every third Metarena
+    staked = token_ids[::3]
+    for i in staked:
+        meta_arenas.stakeArena(i, {"from": user})
+    # Run the census one token at a time and batched
+    sequential = staking_census(meta_arenas, token_ids)
+    batched = staking_census(meta_arenas, token_ids, multicall, 250)
+    print(
+        f"Sequential census: {sequential['calls']} calls in {sequential['seconds']:.2f}s"
+    )
+    print(f"Batched census: {batched['calls']} calls in {batched['seconds']:.2f}s")
+    # Assert both modes agree
+    assert sequential["calls"] == 1000
+    assert batched["calls"] == 4
+    assert batched["staked"] == sequential["staked"] == staked
+    assert batched["staked_per_rarity"] == sequential["staked_per_rarity"]
+    assert batched["staked_per_tier"] == sequential["staked_per_tier"] == {0: len(staked)}
+    for rarity, name in enumerate(
+        ["Common", "Uncommon", "Rare", "Epic", "Legendary"]
+    ):
+        expected = len([i for i in staked if rarities[i] == rarity])
+        assert batched["staked_per_rarity"][name] == expected
@@ -0,0 +1,194 @@
+from brownie import (
+    Contract,
+    MetarenasV2,
+    ArenasOld,
+    ArenaTokenMock,
+    MetaPasses,
+    ProxyAdmin,
+    accounts,
+    chain,
+)
+from brownie.exceptions import VirtualMachineError
+from brownie.test import strategy
+from scripts.helpful_scripts import upgrade
+from scripts.rewards_model import RewardsModel
+import brownie
+
+TOKEN_IDS = list(range(1001, 1007))
+RARITIES = [0, 1, 2, 3, 4, 2]
+# Sequences run and steps per sequence, the chain is reverted between sequences
+FUZZ_SETTINGS = {"max_examples": 200, "stateful_step_count": 20}
+
+
+class StateMachine:
+    """Random Arena actions against Metarenas, MetarenasV2 and one model per proxy.
+
+    Rewards rates never change here, so the rewards index of Metarenas and the
+    per-Arena timestamps of MetarenasV2 must give the same rewards, up to the
+    rounding of each.
+    """
+
+    token = strategy("uint256", min_value=0, max_value=len(TOKEN_IDS) - 1)
+    levels = strategy("uint256", min_value=1, max_value=40)
+    seconds = strategy("uint256", min_value=1, max_value=86400 * 10)
+
+    def __init__(cls, proxies, owner, holders, arena):
+        cls.proxies = proxies
+        cls.owner = owner
+        cls.holders = holders
+        cls.arena = arena
+
+    def setup(self):
+        # MetarenasV2 is the second proxy
+        self.models = [
+            RewardsModel(),
+            RewardsModel(legacy_rounding=True, legacy_can_upgrade=True),
+        ]
+        for model in self.models:
+            for i, rarity in zip(TOKEN_IDS, RARITIES):
+                model.set_rarity(i, rarity, chain[-1].timestamp)
+        self.owners = {i: self.holders[0] for i in TOKEN_IDS}
+
+    def _expect(self, succeeds, function, *args):
+        """Sends the call to every proxy, expecting it to pass or revert on all."""
+        transactions = []
+        for meta_arenas in self.proxies:
+            if succeeds:
+                transactions.append(getattr(meta_arenas, function)(*args))
+            else:
+                with brownie.reverts():
+                    getattr(meta_arenas, function)(*args)
+        return transactions
+
+    def rule_stake(self, token):
+        i = TOKEN_IDS[token]
+        staked = self.models[0].arena(i)["staked"]
+        for tx, model in zip(
+            self._expect(not staked, "stakeArena", i, {"from": self.owners[i]}),
+            self.models,
+        ):
+            model.stake(i, tx.timestamp)
+
+    def rule_unstake(self, token):
+        i = TOKEN_IDS[token]
+        staked = self.models[0].arena(i)["staked"]
+        for tx, model in zip(
+            self._expect(staked, "unstakeArena", i, {"from": self.owners[i]}),
+            self.models,
+        ):
+            model.unstake(i, tx.timestamp)
+
+    def rule_claim(self, token):
+        i = TOKEN_IDS[token]
+        holder = self.owners[i]
+        for meta_arenas, model in zip(self.proxies, self.models):
+            # Rewards are only known once the transaction has a timestamp
+            balance = self.arena.balanceOf(holder)
+            try:
+                tx = meta_arenas.claimRewards(i, {"from": holder})
+            except VirtualMachineError:
+                assert model.available(i, chain[-1].timestamp)[0] == 0
+                continue
+            claimed = model.claim(i, tx.timestamp)[0]
+            assert claimed > 0
+            assert self.arena.balanceOf(holder) - balance == claimed
+
+    def rule_increase_level(self, token, levels):
+        i = TOKEN_IDS[token]
+        self._expect(True, "increaseLevel", i, levels, {"from": self.owner})
+        for model in self.models:
+            model.increase_level(i, levels)
+
+    def rule_upgrade(self, token):
+        i = TOKEN_IDS[token]
+        holder = self.owners[i]
+        for meta_arenas, model in zip(self.proxies, self.models):
+            try:
+                tx = meta_arenas.upgradeArenaTier(i, {"from": holder})
+            except VirtualMachineError:
+                assert not model.can_upgrade(i, chain[-1].timestamp)
+                continue
+            assert model.can_upgrade(i, tx.timestamp)
+            model.upgrade_tier(i, tx.timestamp)
+
+    def rule_transfer(self, token):
+        i = TOKEN_IDS[token]
+        sender = self.owners[i]
+        receiver = self.holders[1] if sender == self.holders[0] else self.holders[0]
+        staked = self.models[0].arena(i)["staked"]
+        self._expect(
+            not staked, "transferFrom", sender, receiver, i, {"from": sender}
+        )
+        if not staked:
+            self.owners[i] = receiver
+            for model in self.models:
+                model.transfer(i)
+
+    def rule_time_jump(self, seconds):
+        chain.mine(timedelta=seconds)
+
+    def invariant_views(self):
+        now = chain[-1].timestamp
+        for meta_arenas, model in zip(self.proxies, self.models):
+            for i in TOKEN_IDS:
+                assert tuple(meta_arenas.arenaDetails(i)) == model.details(i, now)
+                assert meta_arenas.availableRewards(i)[0] == model.available(i, now)[0]
+                assert meta_arenas.ownerOf(i) == self.owners[i]
+
+    def invariant_staked_arenas(self):
+        meta_arenas, model = self.proxies[0], self.models[0]
+        for holder in self.holders:
+            staked = [
+                i
+                for i in TOKEN_IDS
+                if self.owners[i] == holder and model.arena(i)["staked"]
+            ]
+            assert sorted(meta_arenas.userStakedArenas(holder)) == staked
+
+    def invariant_totals(self):
+        meta_arenas, model = self.proxies[0], self.models[0]
+        now = chain[-1].timestamp
+        staked = [i for i in TOKEN_IDS if model.arena(i)["staked"]]
+        rate = sum(
+            model.rate(model.arena(i)["rarity"], model.arena(i)["tier"])
+            for i in staked
+        )
+        assert meta_arenas.totalStakedArenas() == len(staked)
+        assert meta_arenas.emissionRate() == rate // 864000
+        assert meta_arenas.outstandingRewards()[0] == sum(
+            model.available(i, now)[0] for i in TOKEN_IDS
+        )
+
+
+def test_main(state_machine, owner, deploy_proxy):
+    holders = [accounts[1], accounts[2]]
+    # The state machine takes its own snapshots, so deploy a separate stack
+    proxy_admin = ProxyAdmin.deploy({"from": owner})
+    arena = ArenaTokenMock.deploy({"from": owner})
+    passes = MetaPasses.deploy({"from": owner})
+    old_arenas = ArenasOld.deploy({"from": owner})
+    stack = (proxy_admin, old_arenas, passes, arena)
+    _, _, meta_arenas = deploy_proxy(*stack)
+    meta_arenas.completeArenaStorageMigration({"from": owner})
+    # Same setup on MetarenasV2
+    legacy_proxy, _, legacy_arenas = deploy_proxy(*stack)
+    for proxy in [meta_arenas, legacy_arenas]:
+        proxy.setLevelBooster(owner.address, {"from": owner})
+        arena.transfer(proxy.address, 10000000 * 10**18, {"from": owner})
+    upgrade(owner, legacy_proxy, MetarenasV2.deploy({"from": owner}), proxy_admin)
+    legacy_arenas = Contract.from_abi(
+        "MetaArenas", legacy_proxy.address, MetarenasV2.abi
+    )
+    proxies = [meta_arenas, legacy_arenas]
+    for proxy in proxies:
+        proxy.setMaxMintAmountPerTx(len(TOKEN_IDS), {"from": owner})
+        proxy.mintForAddress(len(TOKEN_IDS), holders[0].address, {"from": owner})
+        proxy.setRarity(TOKEN_IDS, RARITIES, {"from": owner})
+    # Upgrades cost $ARENA from Tier 1 on
+    for holder in holders:
+        arena.transfer(holder, 10000000 * 10**18, {"from": owner})
+        for proxy in proxies:
+            arena.approve(proxy.address, 2**256 - 1, {"from": holder})
+    state_machine(
+        StateMachine, proxies, owner, holders, arena, settings=FUZZ_SETTINGS
+    )
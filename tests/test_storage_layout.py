@@ -0,0 +1,167 @@
+from brownie import (
+    Contract,
+    Metarenas,
+    MetarenasV2,
+    ArenasOld,
+    ArenaTokenMock,
+    MetaPasses,
+    ProxyAdmin,
+    TransparentUpgradeableProxy,
+    accounts,
+)
+from scripts.helpful_scripts import encode_function_data, upgrade
+from scripts.storage_layout import (
+    StorageLayoutError,
+    check_layouts,
+    check_upgrade,
+    normalize_layout,
+    storage_layout,
+)
+import pytest
+import tempfile
+import time
+
+
+def variable(label, slot, type_, size=32, offset=0):
+    return {
+        "label": label,
+        "slot": slot,
+        "offset": offset,
+        "bytes": size,
+        "type": type_,
+    }
+
+
+def solc_layout(label, struct_label, ast_id):
+    """solc's storage-layout output of a mapping to a two member struct."""
+    struct_id = f"t_struct({struct_label.split('.')[-1]}){ast_id}_storage"
+    mapping_id = f"t_mapping(t_uint256,{struct_id})"
+    return {
+        "storage": [{"label": label, "slot": "5", "offset": 0, "type": mapping_id}],
+        "types": {
+            "t_bool": {"encoding": "inplace", "label": "bool", "numberOfBytes": "1"},
+            "t_uint256": {
+                "encoding": "inplace",
+                "label": "uint256",
+                "numberOfBytes": "32",
+            },
+            mapping_id: {
+                "encoding": "mapping",
+                "key": "t_uint256",
+                "label": f"mapping(uint256 => {struct_label})",
+                "numberOfBytes": "32",
+                "value": struct_id,
+            },
+            struct_id: {
+                "encoding": "inplace",
+                "label": struct_label,
+                "members": [
+                    {"label": "staked", "offset": 0, "slot": "0", "type": "t_bool"},
+                    {"label": "tier", "offset": 0, "slot": "1", "type": "t_uint256"},
+                ],
+                "numberOfBytes": "64",
+            },
+        },
+    }
+
+
+def test_main():
+    # Diffs of hand written layouts
+    old = [
+        variable("owner", 0, "address", 20),
+        variable("paused", 0, "bool", 1, 20),
+        variable("__gap", 1, "uint256[10]", 320),
+        variable("arenas", 11, "mapping(uint256 => uint256)"),
+    ]
+    safe = [
+        variable("owner", 0, "address", 20),
+        variable("mintPaused", 0, "bool", 1, 20),
+        variable("admin", 1, "address", 20),
+        variable("__gap", 2, "uint256[9]", 288),
+        variable("arenas", 11, "mapping(uint256 => uint256)"),
+        variable("supply", 12, "uint256"),
+    ]
+    kinds = [change.kind for change in check_layouts(old, safe)]
+    assert sorted(kinds) == ["appended", "gap_shrunk", "renamed"]
+    inserted = old[:2] + [variable("supply", 1, "uint256")] + [
+        dict(v, slot=v["slot"] + 1) for v in old[2:]
+    ]
+    with pytest.raises(StorageLayoutError):
+        check_layouts(old, inserted)
+    retyped = old[:3] + [variable("arenas", 11, "mapping(uint256 => address)")]
+    with pytest.raises(StorageLayoutError):
+        check_layouts(old, retyped)
+    with pytest.raises(StorageLayoutError):
+        check_layouts(old, old[:3])
+    # Members appended to a struct stored in a mapping keep their slots
+    mapped = "mapping(uint256 => struct A{bool staked@0:0, uint8 tier@0:1})"
+    extended = mapped.replace("}", ", bool indexed@0:2}")
+    changes = check_layouts(
+        [variable("arenas", 0, mapped)], [variable("arenas", 0, extended)]
+    )
+    assert [change.kind for change in changes] == ["struct_extended"]
+    # A struct renamed in another contract is the same type
+    changes = check_layouts(
+        normalize_layout(solc_layout("arenas", "struct MetarenasV2.Arena", 103)),
+        normalize_layout(
+            solc_layout("legacyArenas", "struct Metarenas.LegacyArena", 106)
+        ),
+    )
+    assert [change.kind for change in changes] == ["renamed"]
+    reordered = "mapping(uint256 => struct A{uint8 tier@0:1, bool staked@0:0})"
+    with pytest.raises(StorageLayoutError):
+        check_layouts(
+            [variable("arenas", 0, mapped)], [variable("arenas", 0, reordered)]
+        )
+    with pytest.raises(StorageLayoutError):
+        check_layouts(
+            [variable("arena", 0, "struct A{bool staked@0:0}")],
+            [variable("arena", 0, "struct A{bool staked@0:0, bool indexed@0:1}")],
+        )
+    assert check_layouts(old, old[:3], allow_deletions=True)[0].kind == "deleted"
+    # MetarenasV2 to Metarenas only appends, the enumerable slots are kept
+    with tempfile.TemporaryDirectory() as folder:
+        started = time.perf_counter()
+        v2 = storage_layout("MetarenasV2", folder)
+        compiled = time.perf_counter() - started
+        started = time.perf_counter()
+        assert storage_layout("MetarenasV2", folder) == v2
+        cached = time.perf_counter() - started
+        print(f"Layout compiled in {compiled:.2f}s, read from cache in {cached:.4f}s")
+        assert cached < 0.5
+        changes = check_layouts(v2, storage_layout("Metarenas", folder))
+        assert "appended" in [change.kind for change in changes]
+    # Downgrading to the enumerable implementation reads stale slots
+    with pytest.raises(StorageLayoutError) as error:
+        check_upgrade("Metarenas", "MetarenasV2", allow_deletions=True)
+    assert {change.kind for change in error.value.changes} == {"stale"}
+    assert "_allTokens" in [change.label for change in error.value.changes]
+    # An unsafe upgrade is rejected before anything is sent
+    owner = accounts[0]
+    proxy_admin = ProxyAdmin.deploy({"from": owner})
+    arena = ArenaTokenMock.deploy({"from": owner})
+    passes = MetaPasses.deploy({"from": owner})
+    old_arenas = ArenasOld.deploy({"from": owner})
+    implementation = Metarenas.deploy({"from": owner})
+    proxy = TransparentUpgradeableProxy.deploy(
+        implementation.address,
+        proxy_admin.address,
+        encode_function_data(implementation.initialize),
+        {"from": owner},
+    )
+    meta_arenas = Contract.from_abi("MetaArenas", proxy.address, Metarenas.abi)
+    meta_arenas.setInterfaces(
+        old_arenas.address, passes.address, arena.address, {"from": owner}
+    )
+    implementation2 = MetarenasV2.deploy({"from": owner})
+    nonce = owner.nonce
+    with pytest.raises(StorageLayoutError):
+        upgrade(
+            owner,
+            proxy,
+            implementation2,
+            proxy_admin,
+            layouts=("Metarenas", "MetarenasV2"),
+        )
+    assert owner.nonce == nonce
+    assert proxy_admin.getProxyImplementation(proxy) == implementation.address
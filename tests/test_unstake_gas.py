@@ -0,0 +1,81 @@
+from brownie import Contract, Metarenas, MetarenasV2, accounts
+from scripts.helpful_scripts import upgrade
+
+STAKED_PER_USER = [1, 10, 50]
+
+
+def stake_all(meta_arenas, users, owned):
+    # V2 only enumerates tokens minted by itself, so track the owned token IDs here
+    for user in users:
+        for i in owned[user]:
+            if not meta_arenas.arenaDetails(i)[3]:
+                meta_arenas.stakeArena(i, {"from": user})
+
+
+def unstake_first_gas(meta_arenas, users):
+    gas_used = {}
+    for user in users:
+        # The first staked Arena was the worst case for the linear search
+        first_staked = meta_arenas.userStakedArenas(user.address)[0]
+        tx = meta_arenas.unstakeArena(first_staked, {"from": user})
+        gas_used[len(meta_arenas.userStakedArenas(user.address)) + 1] = tx.gas_used
+    return gas_used
+
+
+def mint_to_users(meta_arenas, owner, users):
+    # Mint 1, 10 and 50 Metarenas to three users
+    owned = {}
+    next_token_id = 1001
+    for user, amount in zip(users, STAKED_PER_USER):
+        meta_arenas.mintForAddress(amount, user.address, {"from": owner})
+        owned[user] = list(range(next_token_id, next_token_id + amount))
+        next_token_id += amount
+    return owned
+
+
+def test_main(owner, proxy_admin, arena, passes, old_arenas, deploy_proxy):
+    users = accounts[1:4]
+    stack = (proxy_admin, old_arenas, passes, arena)
+    # Stake and unstake with the indexed implementation
+    _, implementation, meta_arenas = deploy_proxy(*stack)
+    meta_arenas.setMaxMintAmountPerTx(50, {"from": owner})
+    owned = mint_to_users(meta_arenas, owner, users)
+    stake_all(meta_arenas, users, owned)
+    indexed_gas = unstake_first_gas(meta_arenas, users)
+    print(f"Indexed unstake gas: {indexed_gas}")
+    # Swap and pop costs the same no matter how many Arenas are staked
+    assert abs(indexed_gas[50] - indexed_gas[10]) < 1000
+    assert indexed_gas[1] <= indexed_gas[50]
+    # Stake with the V2 implementation that has no position index, on a proxy
+    # moved to V2 before any Arena was minted or staked
+    legacy_proxy, _, _ = deploy_proxy(*stack)
+    upgrade(owner, legacy_proxy, MetarenasV2.deploy({"from": owner}), proxy_admin)
+    legacy_arenas = Contract.from_abi(
+        "MetaArenas", legacy_proxy.address, MetarenasV2.abi
+    )
+    legacy_arenas.setMaxMintAmountPerTx(50, {"from": owner})
+    owned = mint_to_users(legacy_arenas, owner, users)
+    stake_all(legacy_arenas, users, owned)
+    legacy_gas = unstake_first_gas(legacy_arenas, users)
+    print(f"Linear search unstake gas: {legacy_gas}")
+    assert legacy_gas[50] > indexed_gas[50]
+    stake_all(legacy_arenas, users, owned)
+    # Upgrade to V3, unindexed Arenas still unstake through the fallback search
+    upgrade(owner, legacy_proxy, implementation, proxy_admin)
+    meta_arenas = Contract.from_abi("MetaArenas", legacy_proxy.address, Metarenas.abi)
+    staked_before = list(meta_arenas.userStakedArenas(users[2].address))
+    assert len(staked_before) == 50
+    meta_arenas.unstakeArena(staked_before[0], {"from": users[2]})
+    assert sorted(meta_arenas.userStakedArenas(users[2].address)) == sorted(
+        staked_before[1:]
+    )
+    # Migrate the remaining stakers and assert flat unstake gas again
+    meta_arenas.indexStakedArenas([user.address for user in users], {"from": owner})
+    migrated_gas = unstake_first_gas(meta_arenas, users[1:])
+    print(f"Migrated unstake gas: {migrated_gas}")
+    assert abs(migrated_gas[49] - migrated_gas[10]) < 1000
+    for user in users:
+        staked = meta_arenas.userStakedArenas(user.address)
+        for i in staked:
+            meta_arenas.unstakeArena(i, {"from": user})
+        assert len(meta_arenas.userStakedArenas(user.address)) == 0
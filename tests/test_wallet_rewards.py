@@ -0,0 +1,78 @@
+from brownie import accounts, chain
+import pytest
+import random
+
+ACTIONS = [
+    "stake",
+    "unstake",
+    "claim",
+    "upgrade",
+    "transfer",
+    "rarity",
+    "rarity_rewards",
+    "tier_multiplier",
+    "byte_enabled",
+]
+
+
+def assert_wallets_match(meta_arenas, wallets):
+    height = chain.height
+    for wallet in wallets:
+        expected = [0, 0]
+        for i in meta_arenas.tokensOfOwner(wallet, block_identifier=height):
+            rewards = meta_arenas.availableRewards(i, block_identifier=height)
+            expected = [expected[0] + rewards[0], expected[1] + rewards[1]]
+        rewards = meta_arenas.walletRewards(wallet, block_identifier=height)
+        assert list(rewards) == expected
+
+
+@pytest.mark.parametrize("minted_arenas", [12], indirect=True)
+@pytest.mark.parametrize("seed", range(3))
+def test_main(meta_arenas, arena, owner, user, minted_arenas, seed):
+    holder = accounts[2]
+    wallets = [user, holder]
+    arena.transfer(holder, 10000 * 10**18, {"from": owner})
+    arena.approve(meta_arenas.address, 2**256 - 1, {"from": holder})
+    owners = {i: user for i in minted_arenas}
+    staked = set()
+    rng = random.Random(seed)
+    for i in rng.sample(minted_arenas, 6):
+        meta_arenas.stakeArena(i, {"from": user})
+        staked.add(i)
+    assert_wallets_match(meta_arenas, wallets)
+    for _ in range(40):
+        chain.sleep(rng.randint(60, 86400 * 3))
+        action = rng.choice(ACTIONS)
+        i = rng.choice(minted_arenas)
+        sender = {"from": owners[i]}
+        if action == "stake" and i not in staked:
+            meta_arenas.stakeArena(i, sender)
+            staked.add(i)
+        elif action == "unstake" and i in staked:
+            meta_arenas.unstakeArena(i, sender)
+            staked.remove(i)
+        elif action == "claim" and meta_arenas.availableRewards(i)[0] > 0:
+            meta_arenas.claimRewards(i, sender)
+        elif action == "upgrade":
+            meta_arenas.increaseLevel(i, 100, {"from": owner})
+            meta_arenas.upgradeArenaTier(i, sender)
+        elif action == "transfer" and i not in staked:
+            receiver = holder if owners[i] == user else user
+            meta_arenas.transferFrom(owners[i], receiver, i, sender)
+            owners[i] = receiver
+        elif action == "rarity":
+            meta_arenas.setRarity([i], [rng.randrange(5)], {"from": owner})
+        elif action == "rarity_rewards":
+            rewards = rng.randint(1, 200) * 10**18
+            meta_arenas.setRarityRewards(rng.randrange(5), rewards, {"from": owner})
+        elif action == "tier_multiplier":
+            multiplier = rng.randint(0, 40)
+            meta_arenas.setTierMultiplier(rng.randrange(5), multiplier, {"from": owner})
+        elif action == "byte_enabled":
+            meta_arenas.setByteEnabled(
+                not meta_arenas.byteEndabled(), {"from": owner}
+            )
+        assert_wallets_match(meta_arenas, wallets)
+    # Rewards keep growing between updates
+    chain.mine(timedelta=86400)
+    assert_wallets_match(meta_arenas, wallets)